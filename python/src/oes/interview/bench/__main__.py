@@ -0,0 +1,3 @@
+from oes.interview.bench.suite import main
+
+main()
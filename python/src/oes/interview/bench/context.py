@@ -0,0 +1,83 @@
+"""Template context benchmark.
+
+Compares building the merged template context for every evaluation with re-using the
+cached template context, for one pass over 200 steps.
+
+Run with ``python -m oes.interview.bench.context``.
+"""
+import argparse
+import timeit
+from collections.abc import Sequence
+from typing import Any, Optional, cast
+
+from attrs import evolve
+from oes.interview.config.step import Eval, StepOrBlock
+from oes.interview.parsing.template import default_jinja2_env
+from oes.interview.serialization import converter
+from oes.interview.state import InterviewState
+from oes.template import Expression, jinja2_env_context
+
+
+def make_steps(count: int) -> list[Eval]:
+    """Make ``count`` ``eval`` steps with ``when`` conditions."""
+    return converter.structure(
+        [{"eval": f"value_{i}", "when": f"value_{i} is defined"} for i in range(count)],
+        list[StepOrBlock],
+    )
+
+
+def make_state(count: int) -> InterviewState:
+    """Make a state with ``count`` values."""
+    return InterviewState.create(
+        interview_id="bench",
+        interview_version="1",
+        target_url="",
+        context={f"context_{i}": i for i in range(10)},
+        data={f"value_{i}": i for i in range(count)},
+    )
+
+
+def _merged_context(state: InterviewState) -> dict[str, Any]:
+    return {**state.data, **state.context}
+
+
+def run_pass_merged(steps: Sequence[Eval], state: InterviewState):
+    """Evaluate the steps, merging the context for every evaluation."""
+    for step in steps:
+        if step.when_matches(**_merged_context(state)):
+            cast(Expression, step.eval).evaluate(**_merged_context(state))
+
+
+def run_pass_cached(steps: Sequence[Eval], state: InterviewState):
+    """Evaluate the steps, re-using the cached template context."""
+    for step in steps:
+        if step.when_matches_context(state.template_context):
+            cast(Expression, step.eval).evaluate(**state.template_context)
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--steps", type=int, default=200, help="the number of steps")
+    parser.add_argument("--number", type=int, default=100, help="passes per run")
+    args = parser.parse_args(argv)
+
+    jinja2_env_context.set(default_jinja2_env)
+    steps = make_steps(args.steps)
+    state = make_state(args.steps)
+
+    merged = min(
+        timeit.repeat(lambda: run_pass_merged(steps, state), number=args.number)
+    )
+    # use a new state for each pass so the context is built once per pass
+    cached = min(
+        timeit.repeat(lambda: run_pass_cached(steps, evolve(state)), number=args.number)
+    )
+
+    print(f"steps:  {args.steps}")
+    print(f"merged: {merged / args.number * 1e6:.0f} us/pass")
+    print(f"cached: {cached / args.number * 1e6:.0f} us/pass")
+    print(f"speedup: {merged / cached:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
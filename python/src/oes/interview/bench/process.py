@@ -0,0 +1,98 @@
+"""Step processing benchmark.
+
+Compares restarting from the first step after every change with resuming from the
+step after the change, on an interview where every ``set`` step changes the state.
+
+Run with ``python -m oes.interview.bench.process``.
+"""
+import argparse
+import asyncio
+import time
+from collections.abc import Sequence
+from typing import Optional
+
+from oes.interview.config.interview import InterviewConfig, interviews_context
+from oes.interview.config.step import StepResultStatus
+from oes.interview.parsing.template import default_jinja2_env
+from oes.interview.process import advance_interview_state
+from oes.interview.serialization import converter
+from oes.interview.state import InterviewState
+from oes.template import jinja2_env_context
+
+INTERVIEW_ID = "bench"
+
+
+def make_interview_config(steps: int) -> InterviewConfig:
+    """Make a config with an interview of ``steps`` ``set`` steps."""
+    return converter.structure(
+        {
+            "interviews": [
+                {
+                    "id": INTERVIEW_ID,
+                    "steps": [
+                        {"set": f"value_{i}", "value": str(i)} for i in range(steps)
+                    ],
+                }
+            ]
+        },
+        InterviewConfig,
+    )
+
+
+async def run_interview(
+    config: InterviewConfig, resume: bool, compiled: bool = False
+) -> InterviewState:
+    """Advance a new state of the benchmark interview until it is complete."""
+    interview = config.get_interview(INTERVIEW_ID)
+    assert interview is not None
+    state = InterviewState.create(
+        interview_id=INTERVIEW_ID, interview_version="1", target_url=""
+    )
+    state, result = await advance_interview_state(
+        state, interview.question_bank, resume=resume, compiled=compiled
+    )
+    assert result is StepResultStatus.completed
+    return state
+
+
+def time_interview(
+    config: InterviewConfig, resume: bool, repeat: int, compiled: bool = False
+) -> float:
+    """Return the best time in seconds to complete the interview."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        asyncio.run(run_interview(config, resume, compiled))
+        times.append(time.perf_counter() - start)
+
+    return min(times)
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--steps", type=int, default=500, help="the number of steps")
+    parser.add_argument("--repeat", type=int, default=3, help="the number of runs")
+    parser.add_argument(
+        "--compiled", action="store_true", help="run the compiled interview plan"
+    )
+    args = parser.parse_args(argv)
+
+    jinja2_env_context.set(default_jinja2_env)
+    config = make_interview_config(args.steps)
+    interviews_context.set(config)
+
+    restart_state = asyncio.run(run_interview(config, False, args.compiled))
+    resume_state = asyncio.run(run_interview(config, True, args.compiled))
+    assert restart_state.data == resume_state.data
+
+    restart = time_interview(config, False, args.repeat, args.compiled)
+    resume = time_interview(config, True, args.repeat, args.compiled)
+
+    print(f"steps:   {args.steps}")
+    print(f"restart: {restart * 1000:.1f} ms")
+    print(f"resume:  {resume * 1000:.1f} ms")
+    print(f"speedup: {restart / resume:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
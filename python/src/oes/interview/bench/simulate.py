@@ -0,0 +1,328 @@
+"""Headless load simulator.
+
+Simulates users completing a synthetic interview, answering each question with
+values that are valid for its fields, and reports the number of requests per second,
+the latency percentiles, the latency of the first request compared with the later
+ones, and the memory allocated per request.
+
+Run with ``python -m oes.interview.bench.simulate``.
+"""
+import argparse
+import asyncio
+import random
+import re
+import statistics
+import string
+import time
+import tracemalloc
+from collections.abc import Callable, Sequence
+from datetime import date, timedelta
+from typing import Any, Optional
+
+from attrs import define, field
+from oes.interview.bench.synthetic import (
+    INTERVIEW_ID,
+    add_arguments,
+    get_options,
+    make_synthetic_config,
+)
+from oes.interview.config.field import AskField
+from oes.interview.config.fields.bool import BoolAskField
+from oes.interview.config.fields.date import DateAskField
+from oes.interview.config.fields.email import EmailAskField
+from oes.interview.config.fields.number import NumberAskField
+from oes.interview.config.fields.select import SelectAskField
+from oes.interview.config.fields.text import TextAskField
+from oes.interview.config.interview import Interview, interviews_context
+from oes.interview.parsing.template import default_jinja2_env
+from oes.interview.process import advance_interview_state
+from oes.interview.response import AskResult
+from oes.interview.serialization import warm_up_converters
+from oes.interview.state import InterviewState
+from oes.template import jinja2_env_context
+
+_CHARACTER_SETS = (string.ascii_lowercase, string.ascii_letters, string.digits)
+
+
+def _make_text(field: TextAskField, rng: random.Random) -> str:
+    length = rng.randint(max(field.min, 1), max(field.min, min(field.max, 20)))
+    regex = re.compile(field.regex) if field.regex else None
+    for chars in _CHARACTER_SETS:
+        value = "".join(rng.choices(chars, k=length))
+        if regex is None or regex.search(value):
+            return value
+    raise ValueError(f"No value found for regex {field.regex!r}")
+
+
+def _make_number(field: NumberAskField, rng: random.Random) -> Any:
+    low = field.min if field.min is not None else 0
+    high = field.max if field.max is not None else low + 100
+    if field.integer:
+        return rng.randint(int(low), int(high))
+    else:
+        return rng.uniform(low, high)
+
+
+def _make_date(field: DateAskField, rng: random.Random) -> str:
+    low = field.min or date(2000, 1, 1)
+    high = field.max or low + timedelta(days=365 * 30)
+    return (low + timedelta(days=rng.randint(0, (high - low).days))).isoformat()
+
+
+def _make_select(field: SelectAskField, rng: random.Random) -> Any:
+    count = rng.randint(field.min, min(field.max, len(field.options)))
+    selected = rng.sample(range(len(field.options)), count)
+    if field.max == 1:
+        return selected[0] if selected else None
+    else:
+        return selected
+
+
+def _make_bool(field: BoolAskField, rng: random.Random) -> bool:
+    return rng.random() < 0.5
+
+
+def _make_email(field: EmailAskField, rng: random.Random) -> str:
+    return f"user{rng.randrange(1000000)}@example.com"
+
+
+_makers: dict[type, Callable[[Any, random.Random], Any]] = {
+    TextAskField: _make_text,
+    NumberAskField: _make_number,
+    SelectAskField: _make_select,
+    BoolAskField: _make_bool,
+    DateAskField: _make_date,
+    EmailAskField: _make_email,
+}
+
+
+def make_field_response(field: AskField, rng: random.Random) -> Any:
+    """Make a valid response value for an :class:`AskField`."""
+    if field.require_value is not None:
+        return field.require_value
+
+    maker = _makers.get(type(field))
+    return maker(field, rng) if maker is not None else field.default
+
+
+def make_responses(result: AskResult, rng: random.Random) -> dict[str, Any]:
+    """Make valid responses for the fields of an :class:`AskResult`."""
+    return {
+        name: make_field_response(field, rng) for name, field in result.fields.items()
+    }
+
+
+def get_default_button(result: AskResult) -> Optional[int]:
+    """Get the index of the default button of an :class:`AskResult`, if any."""
+    if not result.buttons:
+        return None
+    return next((i for i, b in enumerate(result.buttons) if b.default), 0)
+
+
+@define
+class SimulationStats:
+    """Request timings collected by a simulation."""
+
+    latencies: list[float] = field(factory=list)
+    """The time of each request in seconds."""
+
+    allocations: list[int] = field(factory=list)
+    """The peak memory allocated by each request in bytes, if traced."""
+
+    elapsed: float = 0.0
+    """The total time in seconds."""
+
+    @property
+    def requests(self) -> int:
+        """The number of requests."""
+        return len(self.latencies)
+
+    @property
+    def requests_per_second(self) -> float:
+        """The number of requests per second."""
+        return self.requests / self.elapsed if self.elapsed else 0.0
+
+    def get_percentile(self, percent: int) -> float:
+        """Get the latency in seconds that ``percent`` of requests completed in."""
+        if len(self.latencies) < 2:
+            return self.latencies[0] if self.latencies else 0.0
+        return statistics.quantiles(self.latencies, n=100)[percent - 1]
+
+    @property
+    def first_latency(self) -> float:
+        """The time of the first request in seconds."""
+        return self.latencies[0] if self.latencies else 0.0
+
+    @property
+    def later_latency(self) -> float:
+        """The median time of the requests after the first in seconds."""
+        return statistics.median(self.latencies[1:]) if self.requests > 1 else 0.0
+
+
+async def _request(
+    interview: Interview,
+    state: InterviewState,
+    responses: Optional[dict[str, Any]],
+    button: Optional[int],
+    key: Optional[bytes],
+    options: dict[str, Any],
+) -> tuple[InterviewState, Any]:
+    if key is not None:
+        state = InterviewState.decrypt(state.encrypt(key=key), key=key)
+    return await advance_interview_state(
+        state, interview.question_bank, responses, button, **options
+    )
+
+
+async def simulate_user(
+    interview: Interview,
+    rng: random.Random,
+    stats: SimulationStats,
+    *,
+    key: Optional[bytes] = None,
+    trace: bool = False,
+    **options: Any,
+) -> InterviewState:
+    """Simulate a user completing an interview, recording each request's timing.
+
+    Args:
+        interview: The :class:`Interview`.
+        rng: The random number generator for responses.
+        stats: The :class:`SimulationStats` to record timings in.
+        key: Encrypt and decrypt the state around each request with this key.
+        trace: Record the peak memory allocated by each request with
+            :mod:`tracemalloc`, which must be started.
+        **options: Keyword arguments for :func:`advance_interview_state`.
+
+    Returns:
+        The final state.
+    """
+    state = InterviewState.create(
+        interview_id=interview.id, interview_version="1", target_url=""
+    )
+    responses = None
+    button = None
+    while True:
+        if trace:
+            base = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        state, result = await _request(
+            interview, state, responses, button, key, options
+        )
+        stats.latencies.append(time.perf_counter() - start)
+        if trace:
+            stats.allocations.append(tracemalloc.get_traced_memory()[1] - base)
+
+        if not isinstance(result, AskResult):
+            return state
+
+        responses = make_responses(result, rng)
+        button = get_default_button(result)
+
+
+async def simulate(
+    interview: Interview,
+    users: int,
+    *,
+    seed: int = 0,
+    **options: Any,
+) -> SimulationStats:
+    """Simulate ``users`` users completing an interview, one after another.
+
+    Args:
+        interview: The :class:`Interview`.
+        users: The number of users.
+        seed: The random seed for responses.
+        **options: Keyword arguments for :func:`simulate_user`.
+
+    Returns:
+        The :class:`SimulationStats`.
+    """
+    rng = random.Random(seed)
+    stats = SimulationStats()
+    start = time.perf_counter()
+    for _ in range(users):
+        state = await simulate_user(interview, rng, stats, **options)
+        if not state.complete:
+            raise RuntimeError("Interview did not complete")
+    stats.elapsed = time.perf_counter() - start
+    return stats
+
+
+def _trace_allocations(interview: Interview, users: int, options: dict[str, Any]):
+    tracemalloc.start()
+    try:
+        return asyncio.run(simulate(interview, users, trace=True, **options))
+    finally:
+        tracemalloc.stop()
+
+
+def _print_stats(stats: SimulationStats, allocations: Sequence[int]):
+    print(f"requests: {stats.requests}")
+    print(f"time:     {stats.elapsed:.2f} s")
+    print(f"rps:      {stats.requests_per_second:.1f}")
+    for percent in (50, 90, 99):
+        print(f"p{percent}:      {stats.get_percentile(percent) * 1000:.2f} ms")
+    print(f"max:      {max(stats.latencies) * 1000:.2f} ms")
+    print(f"first:    {stats.first_latency * 1000:.2f} ms")
+    print(f"later:    {stats.later_latency * 1000:.2f} ms median")
+    if allocations:
+        print(f"alloc:    {statistics.mean(allocations) / 1024:.1f} KiB mean peak")
+        print(f"          {max(allocations) / 1024:.1f} KiB max peak")
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_arguments(parser)
+    parser.add_argument("--users", type=int, default=20, help="the number of users")
+    parser.add_argument("--seed", type=int, default=0, help="the random seed")
+    parser.add_argument(
+        "--encrypt", action="store_true", help="encrypt the state between requests"
+    )
+    parser.add_argument(
+        "--resume", action="store_true", help="resume processing after changes"
+    )
+    parser.add_argument(
+        "--compiled", action="store_true", help="run the compiled interview plan"
+    )
+    parser.add_argument(
+        "--no-trace", action="store_true", help="skip measuring allocations"
+    )
+    parser.add_argument(
+        "--warm-up",
+        action="store_true",
+        help="generate the converter hooks before the first request",
+    )
+    args = parser.parse_args(argv)
+
+    jinja2_env_context.set(default_jinja2_env)
+    config = make_synthetic_config(**get_options(args))
+    interviews_context.set(config)
+    interview = config.get_interview(INTERVIEW_ID)
+    assert interview is not None
+    if args.warm_up:
+        warm_up_converters(config)
+
+    options: dict[str, Any] = {
+        "seed": args.seed,
+        "key": bytes(32) if args.encrypt else None,
+        "resume": args.resume,
+        "compiled": args.compiled,
+    }
+
+    # the timed run is separate, tracing allocations slows every request
+    stats = asyncio.run(simulate(interview, args.users, **options))
+    traced = (
+        _trace_allocations(interview, args.users, options)
+        if not args.no_trace
+        else None
+    )
+
+    print(f"steps:    {len(interview.flattened_steps)}")
+    print(f"users:    {args.users}")
+    _print_stats(stats, traced.allocations if traced else [])
+
+
+if __name__ == "__main__":
+    main()
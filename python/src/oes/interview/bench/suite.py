@@ -0,0 +1,457 @@
+"""Benchmark suite.
+
+Times the interview engine, state encryption, location parsing, question lookup,
+response parsing and the update view, and stores the results as JSON so runs can be
+compared.
+
+Run with ``python -m oes.interview.bench run -o results.json`` and compare two runs
+with ``python -m oes.interview.bench compare old.json new.json``.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import base64
+import contextlib
+import fnmatch
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import timeit
+from collections.abc import Awaitable, Callable, Iterator, Sequence
+from pathlib import Path
+from typing import Any, ContextManager, Optional
+
+import orjson
+from attrs import frozen
+from oes.interview.bench.simulate import SimulationStats, simulate_user
+from oes.interview.bench.synthetic import (
+    INTERVIEW_ID,
+    make_synthetic_config,
+    make_synthetic_interview,
+)
+from oes.interview.bench.tokens import (
+    make_registration_dictionaries,
+    make_registration_state,
+)
+from oes.interview.config.interview import InterviewConfig, interviews_context
+from oes.interview.config.question import Question
+from oes.interview.parsing.location import Location
+from oes.interview.parsing.template import default_jinja2_env
+from oes.interview.serialization import converter
+from oes.interview.state import InterviewState
+from oes.template import jinja2_env_context
+
+RESULTS_VERSION = 1
+"""The version of the results file format."""
+
+DEFAULT_REPEAT = 5
+"""The default number of timed runs of each case."""
+
+DEFAULT_THRESHOLD = 0.1
+"""The default relative slowdown reported as a regression."""
+
+ENGINE_SIZES = {
+    "small": {"steps": 20, "questions": 20, "asked": 5, "depth": 1, "people": 1},
+    "medium": {"steps": 200, "questions": 500, "asked": 10, "depth": 3, "people": 3},
+    "huge": {"steps": 1000, "questions": 5000, "asked": 20, "depth": 5, "people": 10},
+}
+"""The synthetic interview options for each engine case."""
+
+ENGINE_OPTIONS = {"resume": True, "compiled": True}
+"""The advance options of the engine cases.
+
+Restarting from the first step after every change makes the larger cases take
+minutes per call, so only ``engine.small.restart`` times that mode.
+"""
+
+STATE_SIZES = {"1kb": 1 << 10, "10kb": 10 << 10, "100kb": 100 << 10, "1mb": 1 << 20}
+"""The approximate serialized size of the state for each crypto case."""
+
+LOCATIONS = (
+    "value",
+    "person.name",
+    "people[0].name",
+    "people[index].address.city",
+    "a.b[c[d]].e[0]",
+)
+"""The locations to parse and evaluate."""
+
+KEY = bytes(32)
+
+BenchFunc = Callable[[], Any]
+"""A function to time."""
+
+
+@frozen
+class BenchmarkCase:
+    """A benchmark case."""
+
+    name: str
+    """The case name."""
+
+    setup: Callable[[], ContextManager[BenchFunc]]
+    """A context manager that prepares and returns the function to time."""
+
+
+@frozen
+class BenchmarkResult:
+    """The timing of a case."""
+
+    best: float
+    """The fastest time per call in seconds."""
+
+    median: float
+    """The median time per call in seconds."""
+
+    number: int
+    """The number of calls in each run."""
+
+    repeat: int
+    """The number of runs."""
+
+
+@contextlib.contextmanager
+def _interview_context(config: InterviewConfig) -> Iterator[None]:
+    jinja_token = jinja2_env_context.set(default_jinja2_env)
+    token = interviews_context.set(config)
+    try:
+        yield
+    finally:
+        interviews_context.reset(token)
+        jinja2_env_context.reset(jinja_token)
+
+
+@contextlib.contextmanager
+def _run_async(func: Callable[[], Awaitable[Any]]) -> Iterator[BenchFunc]:
+    loop = asyncio.new_event_loop()
+    try:
+        yield lambda: loop.run_until_complete(func())
+    finally:
+        loop.close()
+
+
+def _make_engine_case(
+    size: str, name: Optional[str] = None, **options: Any
+) -> BenchmarkCase:
+    @contextlib.contextmanager
+    def setup() -> Iterator[BenchFunc]:
+        config = make_synthetic_config(**ENGINE_SIZES[size])
+        interview = config.get_interview(INTERVIEW_ID)
+        assert interview is not None
+
+        async def run():
+            await simulate_user(
+                interview, random.Random(0), SimulationStats(), **options
+            )
+
+        with _interview_context(config), _run_async(run) as func:
+            yield func
+
+    return BenchmarkCase(name or f"engine.{size}", setup)
+
+
+def _make_state(size: int) -> InterviewState:
+    """Make a state whose data serializes to about ``size`` bytes."""
+    return InterviewState.create(
+        interview_id=INTERVIEW_ID,
+        interview_version="1",
+        target_url="",
+        data={f"value_{i}": "x" * 80 for i in range(max(1, size // 100))},
+    )
+
+
+def _make_encrypt_case(label: str) -> BenchmarkCase:
+    @contextlib.contextmanager
+    def setup() -> Iterator[BenchFunc]:
+        state = _make_state(STATE_SIZES[label])
+        yield lambda: state.encrypt(key=KEY)
+
+    return BenchmarkCase(f"state.encrypt.{label}", setup)
+
+
+def _make_decrypt_case(label: str) -> BenchmarkCase:
+    @contextlib.contextmanager
+    def setup() -> Iterator[BenchFunc]:
+        encrypted = _make_state(STATE_SIZES[label]).encrypt(key=KEY)
+        yield lambda: InterviewState.decrypt(encrypted, key=KEY)
+
+    return BenchmarkCase(f"state.decrypt.{label}", setup)
+
+
+@contextlib.contextmanager
+def _setup_encrypt_dict() -> Iterator[BenchFunc]:
+    rng = random.Random(0)
+    dictionaries = make_registration_dictionaries(rng, 200)
+    state = make_registration_state(rng)
+    yield lambda: state.encrypt(key=KEY, dictionaries=dictionaries)
+
+
+@contextlib.contextmanager
+def _setup_decrypt_dict() -> Iterator[BenchFunc]:
+    rng = random.Random(0)
+    dictionaries = make_registration_dictionaries(rng, 200)
+    encrypted = make_registration_state(rng).encrypt(key=KEY, dictionaries=dictionaries)
+    yield lambda: InterviewState.decrypt(encrypted, key=KEY, dictionaries=dictionaries)
+
+
+@contextlib.contextmanager
+def _setup_location_parse() -> Iterator[BenchFunc]:
+    def run():
+        for loc in LOCATIONS:
+            Location.parse(loc)
+
+    yield run
+
+
+@contextlib.contextmanager
+def _setup_location_evaluate() -> Iterator[BenchFunc]:
+    locations = [Location.parse(loc) for loc in LOCATIONS]
+    context = {
+        "value": 1,
+        "person": {"name": "A"},
+        "people": [{"name": "A", "address": {"city": "B"}}],
+        "index": 0,
+        "a": {"b": {"c": {"e": [1]}}},
+        "c": {"d": "c"},
+        "d": "d",
+    }
+
+    def run():
+        for loc in locations:
+            loc.evaluate(**context)
+
+    yield run
+
+
+@contextlib.contextmanager
+def _setup_question_lookup() -> Iterator[BenchFunc]:
+    config = make_synthetic_config(**ENGINE_SIZES["huge"])
+    interview = config.get_interview(INTERVIEW_ID)
+    assert interview is not None
+    bank = interview.question_bank
+    locations = [Location.parse("value_2500"), Location.parse("people[5].name")]
+    context = {"index_5": 5, "people": [{}] * 10}
+
+    def run():
+        for loc in locations:
+            list(bank.get_questions_providing_variable(loc, context))
+
+    with _interview_context(config):
+        yield run
+
+
+@contextlib.contextmanager
+def _setup_parse_response() -> Iterator[BenchFunc]:
+    # one question with each field type of the synthetic interview
+    fields = [
+        q["fields"][0]
+        for q in make_synthetic_interview(questions=6, people=0)["questions"]
+    ]
+    with _interview_context(InterviewConfig([])):
+        question = converter.structure({"id": "fields", "fields": fields}, Question)
+        responses = {
+            "field_0": "abcdef",
+            "field_1": 50,
+            "field_2": 3,
+            "field_3": True,
+            "field_4": "2020-01-01",
+            "field_5": "user@example.com",
+        }
+        yield lambda: question.parse_response(responses)
+
+
+@contextlib.contextmanager
+def _set_environ(values: dict[str, str]) -> Iterator[None]:
+    old = {k: os.environ.get(k) for k in values}
+    os.environ.update(values)
+    try:
+        yield
+    finally:
+        for k, v in old.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
+
+
+@contextlib.contextmanager
+def _write_server_files() -> Iterator[dict[str, str]]:
+    with tempfile.TemporaryDirectory() as tmp:
+        config_path = Path(tmp) / "interviews.yml"
+        key_path = Path(tmp) / "encryption_key"
+        interview = make_synthetic_interview(**ENGINE_SIZES["medium"])
+        config_path.write_bytes(orjson.dumps({"interviews": [interview]}))
+        key_path.write_bytes(base64.b64encode(KEY))
+        yield {
+            "OES_INTERVIEW_CONFIG_FILE": str(config_path),
+            "OES_INTERVIEW_ENCRYPTION_KEY_FILE": str(key_path),
+        }
+
+
+@contextlib.contextmanager
+def _setup_update_view() -> Iterator[BenchFunc]:
+    from blacksheep import Content
+    from blacksheep.testing import TestClient
+    from oes.interview.server.app import app
+
+    state = InterviewState.create(
+        interview_id=INTERVIEW_ID, interview_version="1", target_url=""
+    )
+    body = orjson.dumps({"state": state.encrypt(key=KEY)})
+    client = TestClient(app)
+
+    async def run():
+        res = await client.post("/update", content=Content(b"application/json", body))
+        assert res.status == 200
+        await res.read()
+
+    loop = asyncio.new_event_loop()
+    try:
+        with _write_server_files() as env, _set_environ(env):
+            loop.run_until_complete(app.start())
+            try:
+                yield lambda: loop.run_until_complete(run())
+            finally:
+                loop.run_until_complete(app.stop())
+    finally:
+        loop.close()
+
+
+def get_cases() -> list[BenchmarkCase]:
+    """Get all the benchmark cases."""
+    return [
+        *(_make_engine_case(size, **ENGINE_OPTIONS) for size in ENGINE_SIZES),
+        _make_engine_case("small", "engine.small.restart"),
+        *(_make_encrypt_case(label) for label in STATE_SIZES),
+        *(_make_decrypt_case(label) for label in STATE_SIZES),
+        BenchmarkCase("state.encrypt.dict", _setup_encrypt_dict),
+        BenchmarkCase("state.decrypt.dict", _setup_decrypt_dict),
+        BenchmarkCase("location.parse", _setup_location_parse),
+        BenchmarkCase("location.evaluate", _setup_location_evaluate),
+        BenchmarkCase("question_bank.get_questions", _setup_question_lookup),
+        BenchmarkCase("question.parse_response", _setup_parse_response),
+        BenchmarkCase("server.update", _setup_update_view),
+    ]
+
+
+def run_case(case: BenchmarkCase, repeat: int = DEFAULT_REPEAT) -> BenchmarkResult:
+    """Time a case.
+
+    The number of calls per run is chosen so that a run takes at least 0.2 seconds.
+    """
+    with case.setup() as func:
+        timer = timeit.Timer(func)
+        number, _ = timer.autorange()
+        times = [t / number for t in timer.repeat(repeat=repeat, number=number)]
+    return BenchmarkResult(min(times), statistics.median(times), number, repeat)
+
+
+def run_cases(
+    cases: Sequence[BenchmarkCase], repeat: int = DEFAULT_REPEAT
+) -> Iterator[tuple[str, BenchmarkResult]]:
+    """Time each case, yielding the name and the result."""
+    for case in cases:
+        yield case.name, run_case(case, repeat)
+
+
+def _format_time(seconds: float) -> str:
+    if seconds >= 1:
+        return f"{seconds:.2f} s"
+    elif seconds >= 1e-3:
+        return f"{seconds * 1e3:.2f} ms"
+    else:
+        return f"{seconds * 1e6:.2f} us"
+
+
+def _filter_cases(cases: list[BenchmarkCase], patterns: Sequence[str]):
+    if not patterns:
+        return cases
+    return [c for c in cases if any(fnmatch.fnmatch(c.name, p) for p in patterns)]
+
+
+def run(args: argparse.Namespace):
+    cases = _filter_cases(get_cases(), args.cases)
+    results = {}
+    for name, result in run_cases(cases, args.repeat):
+        print(f"{name:36} {_format_time(result.best):>12}", file=sys.stderr)
+        results[name] = converter.unstructure(result)
+
+    doc = {
+        "version": RESULTS_VERSION,
+        "label": args.label,
+        "time": time.time(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    if args.output:
+        args.output.write_bytes(orjson.dumps(doc, option=orjson.OPT_INDENT_2))
+
+
+def compare_results(
+    old: dict[str, Any], new: dict[str, Any], threshold: float = DEFAULT_THRESHOLD
+) -> tuple[list[str], list[str]]:
+    """Compare two results documents.
+
+    Returns:
+        A tuple of the report lines, and the names of the cases that are slower by
+        more than ``threshold``.
+    """
+    lines = [f"{'case':36} {'old':>12} {'new':>12} {'change':>8}"]
+    regressions = []
+    for name in sorted(old["results"].keys() & new["results"].keys()):
+        old_best = old["results"][name]["best"]
+        new_best = new["results"][name]["best"]
+        change = new_best / old_best - 1
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = " !"
+        lines.append(
+            f"{name:36} {_format_time(old_best):>12} {_format_time(new_best):>12} "
+            f"{change:>+8.1%}{flag}"
+        )
+    return lines, regressions
+
+
+def compare(args: argparse.Namespace) -> int:
+    old = orjson.loads(args.old.read_bytes())
+    new = orjson.loads(args.new.read_bytes())
+    lines, regressions = compare_results(old, new, args.threshold)
+    print("\n".join(lines))
+    return 1 if regressions else 0
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="run the benchmarks")
+    run_parser.add_argument(
+        "cases", nargs="*", help="glob patterns of the cases to run, e.g. 'state.*'"
+    )
+    run_parser.add_argument("-o", "--output", type=Path, help="the results file")
+    run_parser.add_argument(
+        "--repeat", type=int, default=DEFAULT_REPEAT, help="the number of runs"
+    )
+    run_parser.add_argument("--label", help="a label to store with the results")
+    run_parser.set_defaults(func=run)
+
+    compare_parser = subparsers.add_parser("compare", help="compare two results")
+    compare_parser.add_argument("old", type=Path, help="the old results file")
+    compare_parser.add_argument("new", type=Path, help="the new results file")
+    compare_parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help="the relative slowdown reported as a regression",
+    )
+    compare_parser.set_defaults(func=compare)
+
+    args = parser.parse_args(argv)
+    sys.exit(args.func(args))
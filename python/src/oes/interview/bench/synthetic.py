@@ -0,0 +1,183 @@
+"""Synthetic interview generator.
+
+Makes large interview configs with many steps, nested blocks, thousands of questions
+and indexed locations like ``people[index_0].name``.
+
+Run with ``python -m oes.interview.bench.synthetic`` to print a config as JSON, which
+can be loaded as YAML.
+"""
+import argparse
+import sys
+from collections.abc import Sequence
+from typing import Any, Optional
+
+import orjson
+from oes.interview.config.interview import InterviewConfig
+from oes.interview.serialization import converter
+
+INTERVIEW_ID = "synthetic"
+
+FIELD_TYPES = ("text", "number", "select", "bool", "date", "email")
+"""The field types of the generated questions, in order."""
+
+
+def _make_field(index: int) -> dict[str, Any]:
+    type_ = FIELD_TYPES[index % len(FIELD_TYPES)]
+    field: dict[str, Any] = {"type": type_, "set": f"value_{index}"}
+    if type_ == "text":
+        field.update(min=2, max=12, regex="^[a-z]+$")
+    elif type_ == "number":
+        field.update(min=0, max=100, integer=True)
+    elif type_ == "select":
+        field["options"] = [{"value": f"option_{i}"} for i in range(5)]
+    return field
+
+
+def _make_question(index: int) -> dict[str, Any]:
+    return {
+        "id": f"question_{index}",
+        "title": f"Question {index}",
+        "fields": [_make_field(index)],
+    }
+
+
+def _make_person_question(index: int) -> dict[str, Any]:
+    return {
+        "id": f"person_{index}",
+        "title": f"Person {index}",
+        "fields": [
+            {"type": "text", "set": f"people[index_{index}].name", "min": 1},
+            {
+                "type": "number",
+                "set": f"people[index_{index}].age",
+                "min": 0,
+                "max": 120,
+                "integer": True,
+            },
+        ],
+    }
+
+
+def _make_people_steps(people: int) -> list[dict[str, Any]]:
+    # finding the question for people[i] evaluates the locations of every person
+    # question, so all the indexes are set first
+    steps: list[dict[str, Any]] = [
+        {"set": "people", "value": "[" + ", ".join(["{}"] * people) + "]"},
+        *({"set": f"index_{i}", "value": i} for i in range(people)),
+    ]
+    for i in range(people):
+        steps.append({"eval": [f"people[{i}].name", f"people[{i}].age"]})
+    return steps
+
+
+def _make_value_steps(count: int, asked: int) -> list[dict[str, Any]]:
+    # the conditional steps share ``asked`` results, so only that many of them change
+    # the state, otherwise restarting after each change makes an advance quadratic
+    steps: list[dict[str, Any]] = []
+    for i in range(count):
+        value = f"value_{i % asked}"
+        if i < asked:
+            steps.append({"eval": value})
+        else:
+            steps.append(
+                {
+                    "set": f"result_{i % asked}",
+                    "value": f"{value} is defined",
+                    "when": value,
+                }
+            )
+    return steps
+
+
+def _nest_steps(steps: list[dict[str, Any]], depth: int) -> list[dict[str, Any]]:
+    for level in range(depth, 0, -1):
+        steps = [{"block": steps, "when": f"depth >= {level}"}]
+    return [{"set": "depth", "value": depth}, *steps]
+
+
+def make_synthetic_interview(
+    *,
+    steps: int = 1000,
+    questions: int = 2000,
+    asked: int = 50,
+    depth: int = 5,
+    people: int = 5,
+) -> dict[str, Any]:
+    """Make an unstructured synthetic interview.
+
+    Args:
+        steps: The number of steps, besides the ones for ``people``.
+        questions: The number of questions in the question bank.
+        asked: The number of questions that are asked.
+        depth: The number of nested blocks around the steps.
+        people: The number of entries in ``people``, each asked with a question.
+
+    Returns:
+        The interview, as it would appear in a config file.
+    """
+    asked = max(1, min(asked, questions, steps))
+    return {
+        "id": INTERVIEW_ID,
+        "title": "Synthetic",
+        "questions": [
+            *(_make_question(i) for i in range(questions)),
+            *(_make_person_question(i) for i in range(people)),
+        ],
+        "steps": _nest_steps(
+            _make_people_steps(people) + _make_value_steps(steps, asked), depth
+        ),
+    }
+
+
+def make_synthetic_config(**options: Any) -> InterviewConfig:
+    """Make an :class:`InterviewConfig` with a synthetic interview.
+
+    Args:
+        **options: Keyword arguments for :func:`make_synthetic_interview`.
+    """
+    return converter.structure(
+        {"interviews": [make_synthetic_interview(**options)]}, InterviewConfig
+    )
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """Add the synthetic interview options to ``parser``."""
+    parser.add_argument("--steps", type=int, default=1000, help="the number of steps")
+    parser.add_argument(
+        "--questions", type=int, default=2000, help="the number of questions"
+    )
+    parser.add_argument(
+        "--asked", type=int, default=50, help="the number of questions asked"
+    )
+    parser.add_argument(
+        "--depth", type=int, default=5, help="the number of nested blocks"
+    )
+    parser.add_argument(
+        "--people", type=int, default=5, help="the number of indexed people"
+    )
+
+
+def get_options(args: argparse.Namespace) -> dict[str, Any]:
+    """Get the :func:`make_synthetic_interview` options from parsed arguments."""
+    return {
+        "steps": args.steps,
+        "questions": args.questions,
+        "asked": args.asked,
+        "depth": args.depth,
+        "people": args.people,
+    }
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    interview = make_synthetic_interview(**get_options(args))
+    sys.stdout.buffer.write(
+        orjson.dumps({"interviews": [interview]}, option=orjson.OPT_APPEND_NEWLINE)
+    )
+
+
+if __name__ == "__main__":
+    main()
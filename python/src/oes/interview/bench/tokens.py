@@ -0,0 +1,197 @@
+"""State token size benchmark.
+
+Encrypts realistic registration states with each state encoding and reports the mean
+token size and the time to encrypt and decrypt, comparing the legacy JSON encoding,
+the packed encoding, and compression with and without a trained dictionary.
+
+Run with ``python -m oes.interview.bench.tokens``.
+"""
+import argparse
+import base64
+import random
+import statistics
+import time
+import uuid
+from collections.abc import Callable, Sequence
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Optional
+
+from nacl.secret import SecretBox
+from oes.interview.dictionary import (
+    DEFAULT_DICTIONARY_SIZE,
+    CompressionDictionary,
+    StateDictionaries,
+    train_dictionary,
+)
+from oes.interview.state import InterviewState, state_converter
+
+INTERVIEW_ID = "registration"
+
+KEY = bytes(32)
+
+_FIRST_NAMES = ("Alex", "Sam", "Jordan", "Taylor", "Morgan", "Casey", "Riley", "Jamie")
+_LAST_NAMES = ("Smith", "Johnson", "Lee", "Garcia", "Brown", "Nguyen", "Miller")
+_CITIES = (
+    ("Boston", "MA"),
+    ("Providence", "RI"),
+    ("Hartford", "CT"),
+    ("Portland", "ME"),
+    ("Burlington", "VT"),
+)
+_LEVELS = ("basic", "sponsor", "supersponsor", "child", "staff")
+_OPTIONS = ("hotel", "parking", "dinner", "workshop", "shirt")
+_SIZES = ("S", "M", "L", "XL", "2XL")
+_DIETS = ("vegetarian", "vegan", "gluten-free", "nut allergy")
+_SOURCES = ("friend", "social media", "website", "previous year")
+_QUESTIONS = (
+    "name",
+    "contact",
+    "birth_date",
+    "address",
+    "badge",
+    "level",
+    "options",
+    "shirt",
+    "emergency_contact",
+    "dietary",
+    "policies",
+    "survey",
+)
+
+
+def _make_person(rng: random.Random) -> dict[str, Any]:
+    first = rng.choice(_FIRST_NAMES)
+    last = rng.choice(_LAST_NAMES)
+    return {
+        "first_name": first,
+        "last_name": last,
+        "email": f"{first.lower()}.{last.lower()}{rng.randrange(1000)}@example.com",
+        "phone": f"+1 401 555 {rng.randrange(10000):04d}",
+    }
+
+
+def make_registration_state(
+    rng: random.Random, *, interview_id: str = INTERVIEW_ID
+) -> InterviewState:
+    """Make a state like one partway through a registration interview."""
+    person = _make_person(rng)
+    contact = _make_person(rng)
+    city, state = rng.choice(_CITIES)
+    birth_date = date(1950, 1, 1) + timedelta(days=rng.randrange(365 * 60))
+    answered = _QUESTIONS[: rng.randint(4, len(_QUESTIONS))]
+    data: dict[str, Any] = {
+        **person,
+        "preferred_name": rng.choice((None, person["first_name"][:3])),
+        "birth_date": birth_date.isoformat(),
+        "address": {
+            "street": f"{rng.randrange(1, 999)} Main St",
+            "city": city,
+            "state": state,
+            "postal_code": f"0{rng.randrange(1000, 9999)}",
+            "country": "US",
+        },
+        "badge_name": person["first_name"] + rng.choice(("", "!", " the Great")),
+        "level": rng.choice(_LEVELS),
+        "options": rng.sample(_OPTIONS, rng.randint(0, 3)),
+        "shirt_size": rng.choice(_SIZES),
+        "emergency_contact": {
+            "name": f"{contact['first_name']} {contact['last_name']}",
+            "phone": contact["phone"],
+            "relationship": rng.choice(("parent", "partner", "friend", "sibling")),
+        },
+        "dietary": rng.sample(_DIETS, rng.randint(0, 2)),
+        "agree_code_of_conduct": True,
+        "agree_photo_policy": rng.random() < 0.9,
+        "newsletter": rng.random() < 0.5,
+        "how_did_you_hear": rng.choice(_SOURCES),
+    }
+    return InterviewState(
+        submission_id=str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+        interview_id=interview_id,
+        interview_version="3",
+        expiration_date=datetime.now(tz=timezone.utc) + timedelta(minutes=30),
+        target_url="https://registration.example.com/events/example-2026/checkout",
+        context={
+            "event_id": "example-2026",
+            "registration_id": str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+            "email": person["email"],
+            "access_code": None,
+        },
+        answered_question_ids=frozenset(answered),
+        question_id=answered[-1],
+        data=data,
+    )
+
+
+def make_registration_dictionaries(
+    rng: random.Random, samples: int, size: int = DEFAULT_DICTIONARY_SIZE
+) -> StateDictionaries:
+    """Train a dictionary on ``samples`` registration states."""
+    data = [make_registration_state(rng).pack(compress=False) for _ in range(samples)]
+    dictionaries = StateDictionaries()
+    dictionaries.add(CompressionDictionary(train_dictionary(data, size)), INTERVIEW_ID)
+    return dictionaries
+
+
+def _encrypt_json(state: InterviewState) -> str:
+    enc_bytes = SecretBox(KEY).encrypt(state_converter.dumps(state))
+    return base64.urlsafe_b64encode(enc_bytes).decode()
+
+
+def _get_encoders(
+    dictionaries: StateDictionaries,
+) -> dict[str, Callable[[InterviewState], str]]:
+    empty = StateDictionaries()
+    return {
+        "json": _encrypt_json,
+        "packed": lambda s: s.encrypt(key=KEY, compress=False),
+        "packed+zlib": lambda s: s.encrypt(key=KEY, dictionaries=empty),
+        "packed+dict": lambda s: s.encrypt(key=KEY, dictionaries=dictionaries),
+    }
+
+
+def _time_per_call(func: Callable[[Any], Any], values: Sequence[Any]) -> float:
+    start = time.perf_counter()
+    for value in values:
+        func(value)
+    return (time.perf_counter() - start) / len(values)
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--states", type=int, default=1000, help="the number of states to encrypt"
+    )
+    parser.add_argument(
+        "--train", type=int, default=500, help="the number of states to train on"
+    )
+    parser.add_argument(
+        "--size",
+        type=int,
+        default=DEFAULT_DICTIONARY_SIZE,
+        help="the dictionary size in bytes",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="the random seed")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    dictionaries = make_registration_dictionaries(rng, args.train, args.size)
+    states = [make_registration_state(rng) for _ in range(args.states)]
+
+    print(f"{'encoding':<12} {'bytes':>8} {'encrypt':>10} {'decrypt':>10}")
+    for name, encode in _get_encoders(dictionaries).items():
+        tokens = [encode(state) for state in states]
+        size = statistics.mean(len(t) for t in tokens)
+        encrypt_time = _time_per_call(encode, states)
+        decrypt_time = _time_per_call(
+            lambda t: InterviewState.decrypt(t, key=KEY, dictionaries=dictionaries),
+            tokens,
+        )
+        print(
+            f"{name:<12} {size:>8.0f} {encrypt_time * 1e6:>8.1f}us "
+            f"{decrypt_time * 1e6:>8.1f}us"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,563 @@
+"""Bulk interview runner.
+
+Runs each record of a CSV or JSONL file through an interview without a client.
+Questions are answered with the record values at the locations their fields set, and
+one JSON line is written per record with the final data, the exit result, or the
+question that needs input.
+
+Run with ``python -m oes.interview.bulk``.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import csv
+import os
+from collections import deque
+from collections.abc import Iterable, Iterator, Mapping, Sequence
+from concurrent.futures import Future, ProcessPoolExecutor
+from enum import Enum
+from itertools import islice
+from pathlib import Path
+from typing import IO, Any, Optional
+
+import orjson
+from attrs import define, evolve, frozen
+from cattrs import BaseValidationError
+from cattrs.gen import make_dict_unstructure_fn
+from oes.interview.config.field import AbstractField, get_field_name
+from oes.interview.config.fields.bool import BoolField
+from oes.interview.config.fields.select import SelectField
+from oes.interview.config.interview import (
+    Interview,
+    InterviewConfig,
+    interviews_context,
+    load_interview_config,
+)
+from oes.interview.config.question import Question
+from oes.interview.config.step import StepResult
+from oes.interview.parsing.location import Location, UndefinedError, evaluate_indexes
+from oes.interview.parsing.template import default_jinja2_env
+from oes.interview.process import advance_interview_state
+from oes.interview.response import AskResult, ExitResult
+from oes.interview.serialization import converter
+from oes.interview.state import InterviewState
+from oes.template import jinja2_env_context
+
+DEFAULT_CHUNK_SIZE = 100
+"""The default number of records to run together."""
+
+TRUE_VALUES = frozenset(("true", "yes", "y", "1"))
+"""Strings that are read as ``True`` for a ``bool`` field."""
+
+FALSE_VALUES = frozenset(("false", "no", "n", "0"))
+"""Strings that are read as ``False`` for a ``bool`` field."""
+
+
+class RecordFormat(str, Enum):
+    """Input file formats."""
+
+    csv = "csv"
+    jsonl = "jsonl"
+
+
+class BulkStatus(str, Enum):
+    """How running a record ended."""
+
+    complete = "complete"
+    exit = "exit"
+    needs_input = "needs_input"
+    error = "error"
+
+
+@frozen
+class BulkResult:
+    """The result of running a record through an interview."""
+
+    status: BulkStatus
+    """How the interview ended."""
+
+    data: dict[str, Any]
+    """The interview data."""
+
+    exit: Optional[ExitResult] = None
+    """The exit result, if the interview exited."""
+
+    question_id: Optional[str] = None
+    """The ID of the question that needs input."""
+
+    missing: Sequence[str] = ()
+    """The locations the record has no value for."""
+
+    error: Optional[str] = None
+    """A description of the invalid values or the error."""
+
+
+converter.register_unstructure_hook(
+    BulkResult,
+    make_dict_unstructure_fn(BulkResult, converter, _cattrs_omit_if_default=True),
+)
+
+
+class NeedsInputError(ValueError):
+    """Raised when a record does not have valid values to answer a question."""
+
+    def __init__(self, message: str, missing: Sequence[str] = ()):
+        super().__init__(message)
+        self.missing = missing
+
+
+def _read_csv(file: IO[str]) -> Iterator[dict[str, Any]]:
+    for row in csv.DictReader(file):
+        # empty cells are values that were left blank
+        yield {k: v if v != "" else None for k, v in row.items()}
+
+
+def _read_jsonl(file: IO[str]) -> Iterator[dict[str, Any]]:
+    for line in file:
+        if line.strip():
+            yield orjson.loads(line)
+
+
+def read_records(file: IO[str], format: RecordFormat) -> Iterator[dict[str, Any]]:
+    """Read records one at a time from a CSV or JSONL file.
+
+    CSV columns are named by location, like ``person.name`` or ``people[0].name``.
+    JSONL records may use the same names or nested objects.
+    """
+    if format == RecordFormat.csv:
+        return _read_csv(file)
+    else:
+        return _read_jsonl(file)
+
+
+def dump_result(result: BulkResult) -> bytes:
+    """Serialize a :class:`BulkResult` as a JSON line."""
+    return orjson.dumps(
+        converter.unstructure(result),
+        option=orjson.OPT_APPEND_NEWLINE | orjson.OPT_NON_STR_KEYS,
+    )
+
+
+def _get_record_value(record: Mapping[str, Any], location: Location) -> Any:
+    key = str(location)
+    if key in record:
+        return record[key]
+
+    try:
+        return location.evaluate(**record)
+    except UndefinedError:
+        raise NeedsInputError(f"No value for {key}", [key])
+
+
+def _get_option_index(values: Sequence[Any], value: Any) -> int:
+    for i, option in enumerate(values):
+        # CSV values are always strings
+        if option == value or (isinstance(value, str) and str(option) == value):
+            return i
+    raise ValueError(f"Not a valid option: {value}")
+
+
+def _get_select_value(field: SelectField, value: Any) -> Any:
+    values = [opt.value for opt in field.options]
+    if field.max == 1:
+        return _get_option_index(values, value)
+    elif isinstance(value, (list, tuple)):
+        return [_get_option_index(values, v) for v in value]
+    else:
+        return [_get_option_index(values, value)]
+
+
+def _get_bool_value(value: str) -> Any:
+    lower = value.strip().lower()
+    if lower in TRUE_VALUES:
+        return True
+    elif lower in FALSE_VALUES:
+        return False
+    else:
+        return value
+
+
+def _get_response_value(field: AbstractField, value: Any) -> Any:
+    """Convert a record value into the value a client would submit."""
+    if value is None:
+        return None
+    elif isinstance(field, SelectField):
+        return _get_select_value(field, value)
+    elif isinstance(field, BoolField) and isinstance(value, str):
+        return _get_bool_value(value)
+    else:
+        return value
+
+
+def _get_field_value(
+    field: AbstractField,
+    location: Location,
+    record: Mapping[str, Any],
+    context: dict[str, Any],
+) -> Any:
+    try:
+        value = _get_record_value(record, evaluate_indexes(location, context))
+    except NeedsInputError:
+        if not field.optional:
+            raise
+        value = None
+
+    return _get_response_value(field, value)
+
+
+def get_record_responses(
+    question: Question, record: Mapping[str, Any], context: dict[str, Any]
+) -> dict[str, Any]:
+    """Get the responses to ``question`` from a record.
+
+    Optional fields without a value in the record are submitted empty.
+
+    Raises:
+        NeedsInputError: If the record has no value for a required field.
+        ValueError: If a value is not a valid option.
+    """
+    responses = {}
+    missing = []
+    for i, field in enumerate(question.fields):
+        if field.set is None:
+            continue
+
+        try:
+            value = _get_field_value(field, field.set, record, context)
+        except NeedsInputError as e:
+            missing.extend(e.missing)
+        else:
+            responses[get_field_name(i, field)] = value
+
+    if missing:
+        raise NeedsInputError(f"No value for {', '.join(missing)}", missing)
+
+    return responses
+
+
+def get_record_button(
+    question: Question, record: Mapping[str, Any], context: dict[str, Any]
+) -> Optional[int]:
+    """Get the button to choose for ``question`` from a record.
+
+    Without a ``buttons_set`` location, the default button is chosen.
+
+    Raises:
+        NeedsInputError: If the record has no value for ``buttons_set``.
+        ValueError: If the value is not a button value.
+    """
+    if question.buttons is None:
+        return None
+    elif question.buttons_set is None:
+        return next((i for i, b in enumerate(question.buttons) if b.default), 0)
+
+    location = evaluate_indexes(question.buttons_set, context)
+    value = _get_record_value(record, location)
+    return _get_option_index([b.value for b in question.buttons], value)
+
+
+def _get_error_message(exc: Exception) -> str:
+    if isinstance(exc, BaseValidationError):
+        return "; ".join(str(e) for e in exc.exceptions)
+    else:
+        return str(exc)
+
+
+def answer_question(
+    state: InterviewState, question: Question, record: Mapping[str, Any]
+) -> InterviewState:
+    """Answer the current question with the values in ``record``.
+
+    Raises:
+        NeedsInputError: If a value is missing or invalid.
+    """
+    context = state.template_context
+    try:
+        responses = get_record_responses(question, record, context)
+        button = get_record_button(question, record, context)
+        values = question.parse_response(responses, button)
+    except NeedsInputError:
+        raise
+    except (BaseValidationError, ValueError) as e:
+        raise NeedsInputError(_get_error_message(e)) from e
+
+    new_data = state.data
+    for path, val in values.items():
+        new_data = path.assign(val, new_data)
+
+    return evolve(state, data=new_data, question_id=None)
+
+
+@define
+class _RecordRun:
+    """A record being run through an interview."""
+
+    interview: Interview
+    record: Mapping[str, Any]
+    state: InterviewState
+    options: dict[str, Any]
+
+    async def advance(self) -> StepResult:
+        """Advance the state, answering questions until one can't be answered."""
+        bank = self.interview.question_bank
+        self.state, result = await advance_interview_state(
+            self.state, bank, **self.options
+        )
+        while isinstance(result, AskResult) and self.state.question_id is not None:
+            question = bank.get_question(self.state.question_id)
+            if question is None:
+                raise LookupError(f"Question not found: {self.state.question_id}")
+            self.state = answer_question(self.state, question, self.record)
+            self.state, result = await advance_interview_state(
+                self.state, bank, **self.options
+            )
+
+        return result
+
+
+async def run_record(
+    interview: Interview,
+    record: Mapping[str, Any],
+    *,
+    context: Optional[dict[str, Any]] = None,
+    **options: Any,
+) -> BulkResult:
+    """Run a record through an interview.
+
+    Args:
+        interview: The :class:`Interview`.
+        record: The values to answer questions with.
+        context: Context data for the interview state.
+        **options: Keyword arguments for :func:`advance_interview_state`.
+
+    Returns:
+        A :class:`BulkResult`. Exceptions are reported in the result.
+    """
+    state = InterviewState.create(
+        interview_id=interview.id,
+        interview_version="1",
+        target_url="",
+        context=context,
+    )
+    run = _RecordRun(interview, record, state, options)
+
+    try:
+        result = await run.advance()
+    except NeedsInputError as e:
+        return BulkResult(
+            BulkStatus.needs_input,
+            run.state.data,
+            question_id=run.state.question_id,
+            missing=e.missing,
+            error=str(e),
+        )
+    except Exception as e:
+        return BulkResult(BulkStatus.error, run.state.data, error=_get_error_message(e))
+
+    if isinstance(result, ExitResult):
+        return BulkResult(BulkStatus.exit, run.state.data, exit=result)
+    else:
+        return BulkResult(BulkStatus.complete, run.state.data)
+
+
+async def _run_chunk_async(
+    config: InterviewConfig,
+    interview: Interview,
+    records: Sequence[Mapping[str, Any]],
+    options: dict[str, Any],
+) -> list[BulkResult]:
+    # asyncio.run() copies the context, these are reset when it returns
+    jinja2_env_context.set(default_jinja2_env)
+    interviews_context.set(config)
+    return list(
+        await asyncio.gather(
+            *(run_record(interview, record, **options) for record in records)
+        )
+    )
+
+
+def _get_chunks(
+    records: Iterable[Mapping[str, Any]], size: int
+) -> Iterator[list[Mapping[str, Any]]]:
+    it = iter(records)
+    chunk = list(islice(it, size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(it, size))
+
+
+def _get_interview(config: InterviewConfig, interview_id: str) -> Interview:
+    interview = config.get_interview(interview_id)
+    if interview is None:
+        raise LookupError(f"Interview not found: {interview_id}")
+    return interview
+
+
+def run_records(
+    config: InterviewConfig,
+    interview_id: str,
+    records: Iterable[Mapping[str, Any]],
+    *,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    **options: Any,
+) -> Iterator[BulkResult]:
+    """Run records through an interview in this process.
+
+    Records are read from ``records`` and run ``chunk_size`` at a time, so only one
+    chunk is held in memory.
+
+    Args:
+        config: The :class:`InterviewConfig`.
+        interview_id: The interview ID.
+        records: The records.
+        chunk_size: The number of records to run at once.
+        **options: Keyword arguments for :func:`advance_interview_state`.
+
+    Yields:
+        A :class:`BulkResult` for each record, in order.
+
+    Raises:
+        LookupError: If the interview is not found.
+    """
+    interview = _get_interview(config, interview_id)
+    for chunk in _get_chunks(records, chunk_size):
+        yield from asyncio.run(_run_chunk_async(config, interview, chunk, options))
+
+
+_worker_config: Optional[InterviewConfig] = None
+"""The config loaded by a worker process."""
+
+
+def _init_worker(config_path: Path):
+    global _worker_config
+    _worker_config = load_interview_config(config_path)
+
+
+def _run_chunk(
+    interview_id: str, records: Sequence[Mapping[str, Any]], options: dict[str, Any]
+) -> list[BulkResult]:
+    assert _worker_config is not None
+    interview = _get_interview(_worker_config, interview_id)
+    return asyncio.run(_run_chunk_async(_worker_config, interview, records, options))
+
+
+def run_records_parallel(
+    config_path: Path,
+    interview_id: str,
+    records: Iterable[Mapping[str, Any]],
+    *,
+    processes: Optional[int] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    **options: Any,
+) -> Iterator[BulkResult]:
+    """Run records through an interview in a pool of processes.
+
+    Each process loads the config itself. At most two chunks per process are queued
+    at a time, so memory use does not grow with the number of records.
+
+    Args:
+        config_path: The path to the interview config file.
+        interview_id: The interview ID.
+        records: The records.
+        processes: The number of processes, defaults to the number of CPUs.
+        chunk_size: The number of records to send to a process at once.
+        **options: Keyword arguments for :func:`advance_interview_state`.
+
+    Yields:
+        A :class:`BulkResult` for each record, in order.
+    """
+    processes = processes or os.cpu_count() or 1
+    max_pending = processes * 2
+    with ProcessPoolExecutor(
+        processes, initializer=_init_worker, initargs=(config_path,)
+    ) as executor:
+        pending: deque[Future[list[BulkResult]]] = deque()
+        for chunk in _get_chunks(records, chunk_size):
+            pending.append(executor.submit(_run_chunk, interview_id, chunk, options))
+            if len(pending) >= max_pending:
+                yield from pending.popleft().result()
+
+        while pending:
+            yield from pending.popleft().result()
+
+
+def _get_format(path: str, format: Optional[str]) -> RecordFormat:
+    if format is not None:
+        return RecordFormat(format)
+    elif path.lower().endswith(".csv"):
+        return RecordFormat.csv
+    else:
+        return RecordFormat.jsonl
+
+
+def _run(args: argparse.Namespace, input: IO[str], output: IO[bytes]):
+    records = read_records(input, _get_format(input.name, args.format))
+    options = {"resume": args.resume, "compiled": args.compiled}
+
+    if args.processes == 1:
+        config = load_interview_config(args.config)
+        results = run_records(
+            config, args.interview_id, records, chunk_size=args.chunk_size, **options
+        )
+    else:
+        results = run_records_parallel(
+            args.config,
+            args.interview_id,
+            records,
+            processes=args.processes,
+            chunk_size=args.chunk_size,
+            **options,
+        )
+
+    for result in results:
+        output.write(dump_result(result))
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("config", type=Path, help="the interview config file")
+    parser.add_argument("interview_id", help="the interview ID")
+    parser.add_argument(
+        "input",
+        type=argparse.FileType("r", encoding="utf-8"),
+        help="the CSV or JSONL input file, or - for stdin",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        type=argparse.FileType("wb"),
+        default="-",
+        help="the JSONL output file, defaults to stdout",
+    )
+    parser.add_argument(
+        "--format",
+        choices=[f.value for f in RecordFormat],
+        help="the input format, detected from the file name by default",
+    )
+    parser.add_argument(
+        "--processes",
+        type=int,
+        default=1,
+        help="the number of processes, 0 to use every CPU",
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=DEFAULT_CHUNK_SIZE,
+        help="the number of records to run at once",
+    )
+    parser.add_argument(
+        "--resume", action="store_true", help="resume processing after changes"
+    )
+    parser.add_argument(
+        "--compiled", action="store_true", help="run the compiled interview plan"
+    )
+    args = parser.parse_args(argv)
+    args.processes = args.processes or None
+
+    _run(args, args.input, args.output)
+
+
+if __name__ == "__main__":
+    main()
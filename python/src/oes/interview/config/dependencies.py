@@ -0,0 +1,248 @@
+"""Dependency analysis module.
+
+Finds the variable locations read and written by each step and question, so only the
+steps affected by a change need to be processed again.
+
+Print the dependencies of the interviews in a config file with
+``python -m oes.interview.config.dependencies interviews.yml [interview_id]``.
+"""
+from __future__ import annotations
+
+import argparse
+from collections.abc import Iterable, Sequence
+from pathlib import Path
+from typing import Optional
+
+import attrs
+from attrs import Factory, field, frozen
+from oes.interview.config.field import AbstractField
+from oes.interview.config.question import Question
+from oes.interview.config.question_bank import QuestionBank
+from oes.interview.config.step import Eval, Hook, Set, Step
+from oes.interview.parsing.location import Location
+from oes.interview.parsing.references import Path as LocationPath
+from oes.interview.parsing.references import (
+    any_paths_overlap,
+    get_location_path,
+    get_location_references,
+    get_references,
+)
+
+
+def _get_read_paths(obj) -> Optional[frozenset[LocationPath]]:
+    if obj.reads is None:
+        return None
+    return frozenset(get_location_path(loc) for loc in obj.reads)
+
+
+@frozen
+class StepDependencies:
+    """The locations read and written by a step."""
+
+    index: int
+    """The index in the flattened steps."""
+
+    step: Step
+
+    reads: Optional[frozenset[Location]]
+    """Locations read when handling the step, or ``None`` if unknown.
+
+    Does not include locations only read when the step returns a result.
+    """
+
+    writes: Optional[frozenset[Location]]
+    """Locations the step may set, or ``None`` if unknown."""
+
+    read_paths: Optional[frozenset[LocationPath]] = field(
+        init=False, eq=False, default=Factory(_get_read_paths, takes_self=True)
+    )
+    """The paths of :attr:`reads`."""
+
+
+@frozen
+class QuestionDependencies:
+    """The locations read and provided by a question."""
+
+    question: Question
+
+    reads: Optional[frozenset[Location]]
+    """Locations read when asking the question, or ``None`` if unknown."""
+
+    provides: frozenset[Location]
+    """Locations the question provides."""
+
+
+def get_step_references(step: Step) -> Optional[frozenset[Location]]:
+    """Get the locations read when handling a step, or ``None`` if unknown."""
+    if isinstance(step, Hook):
+        return None
+    elif isinstance(step, Set):
+        return get_references((step.when, step.set, step.value))
+    elif isinstance(step, Eval):
+        return get_references((step.when, step.eval))
+    else:
+        return get_references(step.when)
+
+
+def get_step_writes(step: Step) -> Optional[frozenset[Location]]:
+    """Get the locations a step may set, or ``None`` if unknown."""
+    if isinstance(step, Hook):
+        return None
+    elif isinstance(step, Set):
+        return frozenset({step.set})
+    else:
+        return frozenset()
+
+
+def _get_field_references(field: AbstractField) -> Optional[frozenset[Location]]:
+    if not attrs.has(type(field)):
+        return None
+
+    # the location being set is not read, but its indexes are
+    set_refs = (
+        get_location_references(field.set) - {field.set}
+        if field.set is not None
+        else frozenset()
+    )
+    values = [
+        getattr(field, a.name)
+        for a in attrs.fields(type(field))
+        if a.init and a.name != "set"
+    ]
+    return get_references((*values, set_refs))
+
+
+def get_question_references(question: Question) -> Optional[frozenset[Location]]:
+    """Get the locations read when asking a question, or ``None`` if unknown."""
+    refs = get_references(
+        (question.when, question.title, question.description, question.buttons)
+    )
+    if refs is None:
+        return None
+
+    result = set(refs)
+    for question_field in question.fields:
+        field_refs = _get_field_references(question_field)
+        if field_refs is None:
+            return None
+        result.update(field_refs)
+
+    return frozenset(result)
+
+
+@frozen
+class DependencyGraph:
+    """The dependencies between an interview's steps and questions."""
+
+    steps: Sequence[StepDependencies]
+    questions: Sequence[QuestionDependencies]
+
+    def get_step_providers(self, loc: Location) -> Iterable[StepDependencies]:
+        """Get the steps that may set a value read at ``loc``."""
+        path = get_location_path(loc)
+        for step in self.steps:
+            if step.writes is None or any_paths_overlap(
+                [path], (get_location_path(w) for w in step.writes)
+            ):
+                yield step
+
+    def get_question_providers(self, loc: Location) -> Iterable[QuestionDependencies]:
+        """Get the questions that may provide a value read at ``loc``."""
+        path = get_location_path(loc)
+        for question in self.questions:
+            if any_paths_overlap(
+                [path], (get_location_path(p) for p in question.provides)
+            ):
+                yield question
+
+    def format(self) -> str:
+        """Format the graph as text, for debugging."""
+        lines = ["steps:"]
+        for step in self.steps:
+            lines.append(f"  {step.index}: {_describe_step(step.step)}")
+            lines.extend(self._format_reads(step.reads))
+            lines.append(f"    writes: {_format_locations(step.writes)}")
+
+        lines.append("questions:")
+        for question in self.questions:
+            lines.append(f"  {question.question.id}:")
+            lines.extend(self._format_reads(question.reads))
+            lines.append(f"    provides: {_format_locations(question.provides)}")
+
+        return "\n".join(lines)
+
+    def _format_reads(self, reads: Optional[frozenset[Location]]) -> list[str]:
+        if reads is None:
+            return ["    reads: (unknown)"]
+
+        lines = ["    reads:"]
+        for loc in sorted(reads, key=str):
+            providers = [
+                *(f"step {s.index}" for s in self.get_step_providers(loc)),
+                *(
+                    f"question {q.question.id}"
+                    for q in self.get_question_providers(loc)
+                ),
+            ]
+            lines.append(f"      {loc} <- {', '.join(providers) or '(none)'}")
+        return lines
+
+
+def _describe_step(step: Step) -> str:
+    step_type = type(step).__name__.lower()
+    if isinstance(step, Set):
+        return f"{step_type} {step.set}"
+    elif isinstance(step, Hook):
+        return step_type
+    else:
+        return f"{step_type} {getattr(step, step_type, '')}"
+
+
+def _format_locations(locs: Optional[Iterable[Location]]) -> str:
+    if locs is None:
+        return "(unknown)"
+    return ", ".join(sorted(str(loc) for loc in locs)) or "(none)"
+
+
+def build_dependency_graph(
+    steps: Sequence[Step], question_bank: QuestionBank
+) -> DependencyGraph:
+    """Build a :class:`DependencyGraph` for flattened steps and a question bank."""
+    return DependencyGraph(
+        steps=tuple(
+            StepDependencies(
+                index=i,
+                step=step,
+                reads=get_step_references(step),
+                writes=get_step_writes(step),
+            )
+            for i, step in enumerate(steps)
+        ),
+        questions=tuple(
+            QuestionDependencies(
+                question=q,
+                reads=get_question_references(q),
+                provides=q.provides,
+            )
+            for q in question_bank.questions
+        ),
+    )
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    from oes.interview.config.interview import load_interview_config
+
+    parser = argparse.ArgumentParser(description="Show interview dependencies.")
+    parser.add_argument("config", type=Path, help="the interview config file")
+    parser.add_argument("interview_id", nargs="?", help="only show this interview")
+    args = parser.parse_args(argv)
+
+    config = load_interview_config(args.config)
+    for interview in config:
+        if args.interview_id is None or interview.id == args.interview_id:
+            print(f"{interview.id}:")
+            print(interview.dependency_graph.format())
+
+
+if __name__ == "__main__":
+    main()
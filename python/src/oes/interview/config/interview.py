@@ -1,17 +1,27 @@
 """Interview module."""
 from __future__ import annotations
 
-from collections.abc import Iterable, Iterator, Sequence
+import hashlib
+from collections.abc import Iterable, Iterator, Mapping, Sequence
 from contextvars import ContextVar
 from pathlib import Path
-from typing import Optional, Union
+from typing import Any, Optional, Union
 
+import orjson
 from attrs import Factory, field, frozen
 from cattrs import Converter
 from loguru import logger
+from oes.interview.config.dependencies import DependencyGraph, build_dependency_graph
+from oes.interview.config.plan import InterviewPlan, compile_plan
 from oes.interview.config.question import Question
 from oes.interview.config.question_bank import QuestionBank
-from oes.interview.config.step import Ask, Step, StepOrBlock, flatten_steps
+from oes.interview.config.step import (
+    Ask,
+    BlockRange,
+    Step,
+    StepOrBlock,
+    flatten_steps_with_blocks,
+)
 from oes.interview.parsing.template import default_jinja2_env
 from oes.interview.parsing.types import validate_identifier
 from oes.template import jinja2_env_context
@@ -48,8 +58,28 @@ def _build_question_bank(interview: Interview):
     return QuestionBank(questions)
 
 
-def _build_flattened_steps(interview: Interview):
-    return flatten_steps(interview.steps)
+def _build_flattened(interview: Interview):
+    return flatten_steps_with_blocks(interview.steps)
+
+
+def _get_flattened_steps(interview: Interview):
+    return interview._flattened[0]
+
+
+def _get_block_ranges(interview: Interview):
+    by_start: dict[int, list[BlockRange]] = {}
+    for block in interview._flattened[1]:
+        by_start.setdefault(block.start, []).append(block)
+
+    return {start: tuple(blocks) for start, blocks in by_start.items()}
+
+
+def _build_plan(interview: Interview):
+    return compile_plan(interview.flattened_steps, interview.question_bank)
+
+
+def _build_dependency_graph(interview: Interview):
+    return build_dependency_graph(interview.flattened_steps, interview.question_bank)
 
 
 @frozen
@@ -63,9 +93,53 @@ class Interview:
         init=False, eq=False, default=Factory(_build_question_bank, takes_self=True)
     )
     steps: Sequence[StepOrBlock] = ()
+    _flattened: tuple[list[Step], list[BlockRange]] = field(
+        init=False,
+        eq=False,
+        repr=False,
+        default=Factory(_build_flattened, takes_self=True),
+    )
     flattened_steps: Sequence[Step] = field(
-        init=False, eq=False, default=Factory(_build_flattened_steps, takes_self=True)
+        init=False, eq=False, default=Factory(_get_flattened_steps, takes_self=True)
+    )
+    block_ranges: Mapping[int, Sequence[BlockRange]] = field(
+        init=False, eq=False, default=Factory(_get_block_ranges, takes_self=True)
     )
+    """The ranges of flattened steps from blocks, by start index, outermost first."""
+    _plan: Optional[InterviewPlan] = field(
+        init=False, eq=False, repr=False, default=None
+    )
+    _dependency_graph: Optional[DependencyGraph] = field(
+        init=False, eq=False, repr=False, default=None
+    )
+    _digest: Optional[str] = field(init=False, eq=False, repr=False, default=None)
+
+    @property
+    def plan(self) -> InterviewPlan:
+        """The compiled flattened steps, built on first access."""
+        if self._plan is None:
+            object.__setattr__(self, "_plan", _build_plan(self))
+        return self._plan
+
+    @property
+    def dependency_graph(self) -> DependencyGraph:
+        """The :class:`DependencyGraph` of the steps, built on first access."""
+        if self._dependency_graph is None:
+            object.__setattr__(self, "_dependency_graph", _build_dependency_graph(self))
+        return self._dependency_graph
+
+    @property
+    def digest(self) -> str:
+        """A digest of the interview definition, which changes when it is edited.
+
+        Interviews loaded from a config use a digest of the config. Otherwise, the
+        digest is computed from the questions and steps on first access.
+        """
+        if self._digest is None:
+            object.__setattr__(
+                self, "_digest", get_config_digest(repr((self.questions, self.steps)))
+            )
+        return self._digest
 
     def __attrs_post_init__(self):
         # Check that all questions are found
@@ -74,6 +148,12 @@ class Interview:
                 raise ValueError(f"Question ID not found: {step.ask}")
 
 
+def get_config_digest(data: Any) -> str:
+    """Get a digest of the unstructured config of an interview."""
+    encoded = orjson.dumps(data, default=str, option=orjson.OPT_SORT_KEYS)
+    return hashlib.blake2b(encoded, digest_size=16).hexdigest()
+
+
 InterviewEntry: TypeAlias = Union[Interview, Path]
 
 
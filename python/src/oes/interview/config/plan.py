@@ -0,0 +1,145 @@
+"""Compiled interview plan module."""
+from __future__ import annotations
+
+from collections.abc import Awaitable, Callable, Sequence
+from typing import Any
+
+from attrs import frozen
+from oes.interview.config.question_bank import QuestionBank
+from oes.interview.config.step import (
+    Ask,
+    Eval,
+    Set,
+    Step,
+    StepResult,
+    StepResultStatus,
+    set_value,
+)
+from oes.interview.parsing.condition import ConditionCache
+from oes.interview.parsing.undefined import Undefined
+from oes.interview.response import AskResult
+from oes.interview.state import InterviewState
+from oes.template import Condition, Evaluable
+from typing_extensions import TypeAlias
+
+StepFunc: TypeAlias = Callable[
+    [InterviewState, ConditionCache], Awaitable[tuple[InterviewState, StepResult]]
+]
+"""A compiled step, which is called with the state and a :class:`ConditionCache`."""
+
+
+@frozen
+class InterviewPlan:
+    """An interview's flattened steps, compiled into functions."""
+
+    steps: Sequence[StepFunc]
+    """The compiled steps, in the same order as the flattened steps."""
+
+
+async def _not_changed(
+    state: InterviewState, conditions: ConditionCache
+) -> tuple[InterviewState, StepResult]:
+    return state, StepResultStatus.not_changed
+
+
+def _compile_value(value: Any) -> Callable[..., Any]:
+    if isinstance(value, Evaluable):
+        return value.evaluate
+    else:
+        return lambda **context: value
+
+
+def _compile_set(step: Set, bank: QuestionBank) -> StepFunc:
+    location = step.set
+    always = step.always
+    get_value = _compile_value(step.value)
+
+    async def handle_set(
+        state: InterviewState, conditions: ConditionCache
+    ) -> tuple[InterviewState, StepResult]:
+        return set_value(state, location, get_value, always=always)
+
+    return handle_set
+
+
+def _compile_ask(step: Ask, bank: QuestionBank) -> StepFunc:
+    question = bank.get_question(step.ask)
+    if question is None:
+        # report the missing question when the step is handled
+        return _compile_other(step, bank)
+
+    async def handle_ask(
+        state: InterviewState, conditions: ConditionCache
+    ) -> tuple[InterviewState, StepResult]:
+        if question.id in state.answered_question_ids:
+            return state, StepResultStatus.not_changed
+        ask = AskResult.create_from_question(question, state)
+        return state.update_with_question(question.id), ask
+
+    return handle_ask
+
+
+def _compile_eval(step: Eval, bank: QuestionBank) -> StepFunc:
+    values = step.eval if isinstance(step.eval, (list, tuple)) else [step.eval]
+    evaluables = tuple(v for v in values if isinstance(v, Evaluable))
+
+    async def handle_eval(
+        state: InterviewState, conditions: ConditionCache
+    ) -> tuple[InterviewState, StepResult]:
+        context = state.template_context
+        for evaluable in evaluables:
+            res = evaluable.evaluate(**context)
+            if isinstance(res, Undefined):
+                res._fail_with_undefined_error()
+        return state, StepResultStatus.not_changed
+
+    return handle_eval
+
+
+def _compile_other(step: Step, bank: QuestionBank) -> StepFunc:
+    handle = step.handle
+
+    async def handle_step(
+        state: InterviewState, conditions: ConditionCache
+    ) -> tuple[InterviewState, StepResult]:
+        return await handle(state)
+
+    return handle_step
+
+
+_compilers: dict[type, Callable[[Any, QuestionBank], StepFunc]] = {
+    Set: _compile_set,
+    Ask: _compile_ask,
+    Eval: _compile_eval,
+}
+
+
+def _compile_when(when: Condition, func: StepFunc) -> StepFunc:
+    if when is False:
+        return _not_changed
+    elif when == ():
+        return func
+
+    async def check_when(
+        state: InterviewState, conditions: ConditionCache
+    ) -> tuple[InterviewState, StepResult]:
+        if not conditions.evaluate(when, state.template_context):
+            return state, StepResultStatus.not_changed
+        return await func(state, conditions)
+
+    return check_when
+
+
+def compile_step(step: Step, bank: QuestionBank) -> StepFunc:
+    """Compile a flattened step into a :class:`StepFunc`."""
+    compiler = _compilers.get(type(step), _compile_other)
+    return _compile_when(step.when, compiler(step, bank))
+
+
+def compile_plan(steps: Sequence[Step], bank: QuestionBank) -> InterviewPlan:
+    """Compile flattened steps into an :class:`InterviewPlan`.
+
+    Questions are looked up in ``bank`` when compiling, instead of when the steps are
+    handled.
+    """
+    return InterviewPlan(tuple(compile_step(step, bank) for step in steps))
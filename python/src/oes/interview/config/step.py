@@ -2,7 +2,7 @@
 from __future__ import annotations
 
 import asyncio
-import copy
+import time
 from abc import abstractmethod
 from collections.abc import Awaitable, Callable, Iterable, Sequence
 from contextvars import ContextVar
@@ -24,12 +24,14 @@ from oes.hook import (
 )
 from oes.interview.config.question import Question
 from oes.interview.config.question_bank import question_bank_context
+from oes.interview.observer import observer_ctx
+from oes.interview.parsing.condition import get_constant_condition
 from oes.interview.parsing.location import Location, UndefinedError
 from oes.interview.parsing.types import Whenable, validate_identifier
 from oes.interview.parsing.undefined import Undefined
 from oes.interview.response import AskResult, ExitResult
 from oes.interview.state import InterviewState
-from oes.template import Condition, Evaluable, Expression, LogicAnd, Template
+from oes.template import Condition, Evaluable, Expression, Template
 from typing_extensions import Protocol, TypeAlias
 
 Value: TypeAlias = Union[None, str, int, float, bool, dict, list, tuple]
@@ -37,6 +39,8 @@ Value: TypeAlias = Union[None, str, int, float, bool, dict, list, tuple]
 
 ValueTypes = (str, int, float, bool, dict, list, tuple)
 
+_undefined = object()
+
 ValueOrExpression: TypeAlias = Union[Value, Expression]
 """A literal value type, or a template expression."""
 
@@ -62,6 +66,11 @@ http_func_ctx: ContextVar[
 ] = ContextVar("http_func_ctx")
 """Context var for the HTTP hook function"""
 
+hook_semaphore_ctx: ContextVar[Optional[asyncio.Semaphore]] = ContextVar(
+    "hook_semaphore_ctx", default=None
+)
+"""Context var for a semaphore limiting the number of hooks running at once."""
+
 
 class AbstractStep(Whenable, Protocol):
     """Step base class."""
@@ -91,26 +100,51 @@ class Set(AbstractStep):
 
     when: Condition = ()
 
-    def _check_defined(self, context: dict[str, Any]):
-        try:
-            self.set.evaluate(**context)
-            return True
-        except UndefinedError:
-            return False
+    def _evaluate_value(self, **context: Any) -> Any:
+        if isinstance(self.value, Evaluable):
+            return self.value.evaluate(**context)
+        else:
+            return self.value
 
     async def handle(self, state: InterviewState) -> tuple[InterviewState, StepResult]:
-        if self._check_defined(state.template_context) and not self.always:
-            return state, StepResultStatus.not_changed  # skip if already defined
+        return set_value(state, self.set, self._evaluate_value, always=self.always)
+
+
+def set_value(
+    state: InterviewState,
+    location: Location,
+    get_value: Callable[..., Any],
+    *,
+    always: bool = False,
+) -> tuple[InterviewState, StepResult]:
+    """Set a value in the state, as a :class:`Set` step does.
+
+    Args:
+        state: The interview state.
+        location: The location to set.
+        get_value: A function called with the template context to get the value.
+        always: Whether to set the value even if it is already defined.
+
+    Returns:
+        The updated state, and whether it changed.
+    """
+    context = state.template_context
+    try:
+        current = location.evaluate(**context)
+    except UndefinedError:
+        current = _undefined
 
-        if isinstance(self.value, Evaluable):
-            value = self.value.evaluate(**state.template_context)
-        else:
-            value = self.value
+    if current is not _undefined and not always:
+        return state, StepResultStatus.not_changed  # skip if already defined
 
-        new_data = copy.deepcopy(state.data)
-        self.set.set(value, new_data)
-        state = evolve(state, data=new_data)
-        return state, StepResultStatus.changed
+    value = get_value(**context)
+
+    # only report a change if the value is different, so the interview settles
+    if type(current) is type(value) and current == value:
+        return state, StepResultStatus.not_changed
+
+    state = evolve(state, data=location.assign(value, state.data))
+    return state, StepResultStatus.changed
 
 
 @frozen
@@ -163,10 +197,11 @@ class Eval(AbstractStep):
 
     async def handle(self, state: InterviewState) -> tuple[InterviewState, StepResult]:
         as_list = self.eval if isinstance(self.eval, (list, tuple)) else [self.eval]
+        context = state.template_context
 
         for val in as_list:
             if isinstance(val, Evaluable):
-                res = val.evaluate(**state.template_context)
+                res = val.evaluate(**context)
                 if isinstance(res, Undefined):
                     res._fail_with_undefined_error()
 
@@ -215,7 +250,42 @@ class Hook(AbstractStep):
         """The hook function."""
         return self._hook_func
 
+    @property
+    def name(self) -> str:
+        """The hook URL, executable or Python function."""
+        obj = self.hook
+        for attr in ("url", "executable", "python"):
+            value = getattr(obj, attr, None)
+            if value is not None:
+                return str(value)
+        return type(obj).__name__
+
     async def handle(self, state: InterviewState) -> tuple[InterviewState, StepResult]:
+        observer = observer_ctx.get()
+        if observer is None:
+            return await self._handle(state)
+
+        start = time.perf_counter()
+        error = None
+        try:
+            return await self._handle(state)
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            observer.on_hook(self, error, start, time.perf_counter() - start)
+
+    async def _handle(self, state: InterviewState) -> tuple[InterviewState, StepResult]:
+        semaphore = hook_semaphore_ctx.get()
+        if semaphore is None:
+            return await self._call_hook(state)
+
+        async with semaphore:
+            return await self._call_hook(state)
+
+    async def _call_hook(
+        self, state: InterviewState
+    ) -> tuple[InterviewState, StepResult]:
         hook_func = self.hook_func
         if iscoroutinefunction(hook_func):
             return await hook_func(state)
@@ -291,39 +361,120 @@ def parse_value(v):
         raise TypeError(f"Invalid type {v}")
 
 
-def _get_when(obj: Whenable) -> Evaluable:
-    if isinstance(obj.when, tuple):
-        conds = obj.when
+@frozen
+class BlockRange:
+    """The range of flattened steps from a :class:`Block`."""
+
+    start: int
+    """The index of the first step."""
+
+    end: int
+    """The index after the last step."""
+
+    when: Condition
+    """The condition of the block, combined with those of enclosing blocks."""
+
+
+def _get_conditions(when: Condition) -> Optional[tuple[Condition, ...]]:
+    """Get the conditions that must all match, omitting the constant true ones.
+
+    Returns ``None`` if a condition is constant false.
+    """
+    conds = when if isinstance(when, tuple) else (when,)
+    result = []
+    for cond in conds:
+        value = get_constant_condition(cond)
+        if value is None:
+            result.append(cond)
+        elif not value:
+            return None
+
+    return tuple(result)
+
+
+def _combine_when(
+    parent_when: Union[bool, tuple[Condition, ...]], when: Condition
+) -> Union[bool, tuple[Condition, ...]]:
+    """Combine the condition of a step with the condition of its block."""
+    conds = _get_conditions(when)
+    if not isinstance(parent_when, tuple) or conds is None:
+        return False
     else:
-        conds = (obj.when,) if obj.when else ()
+        return (*parent_when, *conds)
+
 
-    return LogicAnd(and_=conds)
+def _get_when(obj: Whenable) -> Union[bool, tuple[Condition, ...]]:
+    return _combine_when((), obj.when)
 
 
 def flatten_block(step: Block) -> list[StepOrBlock]:
     """Flatten a :class:`Block` step into a list of its inner steps.
 
     Combines the ``when`` conditions.
+
+    See Also:
+        :func:`flatten_steps_with_blocks`
     """
-    steps = []
     block_when = _get_when(step)
-    for inner_step in step.block:
-        step_when = _get_when(inner_step)
-        new_inner_step = evolve(inner_step, when=(block_when, step_when))
-        steps.append(new_inner_step)
-
-    return steps
+    return [
+        evolve(inner_step, when=_combine_when(block_when, inner_step.when))
+        for inner_step in step.block
+    ]
 
 
-def flatten_steps(steps: Iterable[StepOrBlock]) -> list[Step]:
-    """Recursively flatten :class:`Block` steps."""
-    final_steps = []
+def _flatten_steps(
+    steps: Iterable[StepOrBlock],
+    parent_when: Union[bool, tuple[Condition, ...]],
+    final_steps: list[Step],
+    blocks: list[BlockRange],
+):
     for step in steps:
+        when = _combine_when(parent_when, step.when)
         if isinstance(step, Block):
-            flattened_block = flatten_block(step)
-            flattened_steps = flatten_steps(flattened_block)
-            final_steps.extend(flattened_steps)
+            _flatten_block(step, when, final_steps, blocks)
         else:
-            final_steps.append(step)
+            final_steps.append(evolve(step, when=when))
+
+
+def _flatten_block(
+    block: Block,
+    when: Union[bool, tuple[Condition, ...]],
+    final_steps: list[Step],
+    blocks: list[BlockRange],
+):
+    start = len(final_steps)
+    _flatten_steps(block.block, when, final_steps, blocks)
+    if when != () and len(final_steps) > start:
+        blocks.append(BlockRange(start, len(final_steps), when))
+
+
+def flatten_steps_with_blocks(
+    steps: Iterable[StepOrBlock],
+) -> tuple[list[Step], list[BlockRange]]:
+    """Recursively flatten :class:`Block` steps.
+
+    The condition of each step is combined with the conditions of its blocks. The
+    condition objects are shared, so they can be cached by identity. Constant
+    conditions are folded: constant true conditions are removed, and a constant false
+    condition is replaced with ``False``.
+
+    Returns:
+        A tuple of the flattened steps, and the ranges of steps from blocks with
+        conditions, ordered by start index, outermost first.
+    """
+    final_steps: list[Step] = []
+    blocks: list[BlockRange] = []
+    _flatten_steps(steps, (), final_steps, blocks)
+
+    # inner blocks are added first, so reverse before sorting to put outer ones first
+    blocks = sorted(reversed(blocks), key=lambda b: (b.start, -b.end))
+    return final_steps, blocks
 
-    return final_steps
+
+def flatten_steps(steps: Iterable[StepOrBlock]) -> list[Step]:
+    """Recursively flatten :class:`Block` steps.
+
+    See Also:
+        :func:`flatten_steps_with_blocks`
+    """
+    return flatten_steps_with_blocks(steps)[0]
@@ -0,0 +1,93 @@
+"""Resume cursor module."""
+from __future__ import annotations
+
+import hashlib
+from collections.abc import Iterable, Mapping
+from typing import Any, Optional
+
+import orjson
+from oes.interview.parsing.references import Path
+from oes.interview.state import InterviewState, ResumeCursor
+
+
+def _get_path_value(context: Mapping[str, Any], path: Path) -> tuple[bool, Any]:
+    """Get whether the value at ``path`` is defined, and the value."""
+    value: Any = context
+    for key in path:
+        try:
+            value = value[key]
+        except (KeyError, IndexError, TypeError):
+            return False, None
+    return True, value
+
+
+def get_fingerprint(state: InterviewState, paths: Iterable[Path]) -> Optional[str]:
+    """Get a digest of the live interview definition and the values at ``paths``.
+
+    Returns:
+        The fingerprint, or ``None`` if the values could not be serialized.
+    """
+    context = state.template_context
+    values = [
+        [list(path), *_get_path_value(context, path)] for path in sorted(paths, key=str)
+    ]
+    interview = state.interview
+    header = [
+        state.interview_id,
+        state.interview_version,
+        interview.digest,
+        len(interview.flattened_steps),
+    ]
+
+    try:
+        data = orjson.dumps(
+            [header, values], option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS
+        )
+    except TypeError:
+        return None
+
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def _get_prefix_read_paths(state: InterviewState, index: int) -> tuple[int, set[Path]]:
+    """Get the paths read by the steps before ``index``.
+
+    The index is reduced to the first step whose reads are unknown.
+    """
+    paths: set[Path] = set()
+    for step_deps in state.interview.dependency_graph.steps[:index]:
+        if step_deps.read_paths is None:
+            return step_deps.index, paths
+        paths.update(step_deps.read_paths)
+    return index, paths
+
+
+def get_cursor(state: InterviewState, index: int) -> Optional[ResumeCursor]:
+    """Get a :class:`ResumeCursor` to continue from the step at ``index``.
+
+    The steps before ``index`` must not make any changes with the state.
+
+    Returns:
+        The cursor, or ``None`` if there are no steps to skip.
+    """
+    index, paths = _get_prefix_read_paths(state, index)
+    fingerprint = get_fingerprint(state, paths) if index > 0 else None
+    return ResumeCursor(index, fingerprint) if fingerprint is not None else None
+
+
+def get_cursor_index(state: InterviewState) -> int:
+    """Get the index of the step to start processing from.
+
+    Returns:
+        The cursor index if the interview and the values read by the earlier steps
+        are unchanged, otherwise 0.
+    """
+    cursor = state.cursor
+    if cursor is None or cursor.index > len(state.interview.flattened_steps):
+        return 0
+
+    _, paths = _get_prefix_read_paths(state, cursor.index)
+    if get_fingerprint(state, paths) == cursor.fingerprint:
+        return cursor.index
+    else:
+        return 0
@@ -0,0 +1,220 @@
+"""State compression dictionaries.
+
+States of one interview repeat the same keys and values, so compressing them with a
+dictionary trained on sample states makes tokens much smaller.
+
+Train a dictionary with ``python -m oes.interview.dictionary``.
+"""
+from __future__ import annotations
+
+import argparse
+import base64
+import re
+import sys
+import zlib
+from collections import Counter
+from collections.abc import Iterable, Sequence
+from contextvars import ContextVar
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional
+
+from attrs import Factory, define, field, frozen
+
+if TYPE_CHECKING:
+    from oes.interview.state import InterviewState
+
+DEFAULT_DICTIONARY_SIZE = 8192
+"""The default dictionary size in bytes."""
+
+MAX_DICTIONARY_SIZE = 32768
+"""The largest useful dictionary size, the DEFLATE window size."""
+
+DICTIONARY_SUFFIX = ".dict"
+"""The file name suffix of dictionary files."""
+
+_TOKEN_RE = re.compile(rb"[^:,]{1,256}[:,]")
+
+
+def _get_dictionary_id(dictionary: CompressionDictionary) -> int:
+    return zlib.adler32(dictionary.data)
+
+
+@frozen
+class CompressionDictionary:
+    """A preset dictionary for raw DEFLATE compression."""
+
+    data: bytes
+    id: int = field(init=False, default=Factory(_get_dictionary_id, takes_self=True))
+    """The Adler-32 checksum of the data, as used by zlib to identify dictionaries."""
+
+    def compress(self, data: bytes, level: int) -> bytes:
+        """Compress ``data`` with this dictionary."""
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15, zdict=self.data)
+        return compressor.compress(data) + compressor.flush()
+
+    def decompress(self, data: bytes) -> bytes:
+        """Decompress ``data`` compressed with this dictionary."""
+        decompressor = zlib.decompressobj(-15, zdict=self.data)
+        result = decompressor.decompress(data) + decompressor.flush()
+        if not decompressor.eof:
+            raise ValueError("Truncated data")
+        return result
+
+    @classmethod
+    def load(cls, path: Path) -> CompressionDictionary:
+        """Load a dictionary file."""
+        return cls(path.read_bytes())
+
+
+@define
+class StateDictionaries:
+    """The compression dictionaries for interview states."""
+
+    by_interview: dict[str, CompressionDictionary] = Factory(dict)
+    """The dictionary to compress each interview's states with."""
+
+    by_id: dict[int, CompressionDictionary] = Factory(dict)
+    """All the dictionaries that states can be decompressed with, by ID."""
+
+    def add(self, dictionary: CompressionDictionary, interview_id: Optional[str]):
+        """Add a dictionary.
+
+        Args:
+            dictionary: The :class:`CompressionDictionary`.
+            interview_id: The interview whose states to compress with the dictionary,
+                or ``None`` to only use it to decompress states.
+        """
+        self.by_id[dictionary.id] = dictionary
+        if interview_id is not None:
+            self.by_interview[interview_id] = dictionary
+
+    def get_for_interview(self, interview_id: str) -> Optional[CompressionDictionary]:
+        """Get the dictionary to compress an interview's states with."""
+        return self.by_interview.get(interview_id)
+
+    def get(self, id: int) -> Optional[CompressionDictionary]:
+        """Get a dictionary by ID."""
+        return self.by_id.get(id)
+
+    @classmethod
+    def load(cls, path: Path) -> StateDictionaries:
+        """Load the dictionaries in a directory.
+
+        A file named ``<interview ID>.dict`` is used to compress that interview's
+        states. Other ``.dict`` files, like ``<interview ID>.<date>.dict`` for older
+        dictionaries kept until the states using them expire, are only used to
+        decompress states.
+        """
+        dictionaries = cls()
+        for file in sorted(path.glob(f"*{DICTIONARY_SUFFIX}")):
+            interview_id = file.name[: -len(DICTIONARY_SUFFIX)]
+            dictionaries.add(
+                CompressionDictionary.load(file),
+                interview_id if "." not in interview_id else None,
+            )
+        return dictionaries
+
+
+state_dictionaries_context: ContextVar[Optional[StateDictionaries]] = ContextVar(
+    "state_dictionaries_context", default=None
+)
+"""State compression dictionaries context var."""
+
+
+def train_dictionary(
+    samples: Sequence[bytes], size: int = DEFAULT_DICTIONARY_SIZE
+) -> bytes:
+    """Train a compression dictionary from sample packed states.
+
+    The samples are split into tokens ending in ``:`` or ``,``, which are mostly JSON
+    keys and values. The tokens found in the most samples, weighted by their length,
+    are joined, with the most useful tokens last, where DEFLATE finds them at the
+    shortest distances.
+
+    Args:
+        samples: The uncompressed sample states.
+        size: The maximum dictionary size in bytes.
+
+    Returns:
+        The dictionary data.
+    """
+    counts: Counter[bytes] = Counter()
+    for sample in samples:
+        counts.update(set(_TOKEN_RE.findall(sample)))
+
+    min_count = max(2, len(samples) // 100)
+    scored = sorted(
+        ((count * len(token), token) for token, count in counts.items()),
+        reverse=True,
+    )
+
+    selected: list[bytes] = []
+    remaining = min(size, MAX_DICTIONARY_SIZE)
+    for _, token in scored:
+        if counts[token] >= min_count and len(token) <= remaining:
+            selected.append(token)
+            remaining -= len(token)
+
+    return b"".join(reversed(selected))
+
+
+def _read_samples(
+    lines: Iterable[str], key: Optional[bytes]
+) -> Iterable[InterviewState]:
+    from oes.interview.state import InterviewState, state_converter
+
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        elif key is not None:
+            yield InterviewState.decrypt(line, key=key)
+        else:
+            yield state_converter.loads(line, InterviewState)
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description="Train a state compression dictionary")
+    parser.add_argument(
+        "samples",
+        type=argparse.FileType("r"),
+        nargs="+",
+        help="files with a sample state on each line, as JSON or an encrypted token",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        type=argparse.FileType("wb"),
+        required=True,
+        help="the dictionary file, named <interview ID>.dict",
+    )
+    parser.add_argument(
+        "--size",
+        type=int,
+        default=DEFAULT_DICTIONARY_SIZE,
+        help="the maximum dictionary size in bytes",
+    )
+    parser.add_argument(
+        "--key-file",
+        type=argparse.FileType("rb"),
+        help="decrypt the samples with the base64 encoded key in this file",
+    )
+    args = parser.parse_args(argv)
+
+    key = base64.b64decode(args.key_file.read()) if args.key_file else None
+    samples = [
+        state.pack(compress=False)
+        for file in args.samples
+        for state in _read_samples(file, key)
+    ]
+    dictionary = train_dictionary(samples, args.size)
+    args.output.write(dictionary)
+    print(
+        f"{len(samples)} samples, {len(dictionary)} bytes, "
+        f"ID {zlib.adler32(dictionary):08x}",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""Advance observer module."""
+from __future__ import annotations
+
+from contextvars import ContextVar
+from typing import TYPE_CHECKING, Optional
+
+from attrs import Factory, define
+
+if TYPE_CHECKING:
+    from oes.interview.config.step import Hook, Step, StepResult
+    from oes.interview.parsing.location import Location
+    from oes.interview.state import InterviewState
+    from oes.template import Condition
+
+
+class AdvanceObserver:
+    """Receives events while an interview state is advanced.
+
+    The methods do nothing, subclasses override the ones for the events they need.
+    Times are in seconds, from :func:`time.perf_counter`.
+    """
+
+    def on_advance(
+        self,
+        state: InterviewState,
+        result: Optional[StepResult],
+        start: float,
+        duration: float,
+    ):
+        """Called when an advance finishes, with ``result`` ``None`` on an error."""
+
+    def on_pass(self, number: int, start: float, duration: float):
+        """Called when a pass through the steps ends with a change or a result."""
+
+    def on_step(
+        self, index: int, step: Step, result: StepResult, start: float, duration: float
+    ):
+        """Called after the flattened step at ``index`` is handled.
+
+        When the condition of a block starting at ``index`` does not match, the
+        result is ``not_changed`` and the block's steps are not reported.
+        """
+
+    def on_condition(
+        self, condition: Condition, result: bool, start: float, duration: float
+    ):
+        """Called after a condition is evaluated. Cached results are not reported."""
+
+    def on_render(self, kind: str, id: Optional[str], start: float, duration: float):
+        """Called after a question or exit result is rendered.
+
+        Args:
+            kind: ``"question"`` or ``"exit"``.
+            id: The question ID, if rendering a question.
+            start: The start time.
+            duration: The time to render.
+        """
+
+    def on_undefined(
+        self,
+        location: Location,
+        question_id: Optional[str],
+        start: float,
+        duration: float,
+    ):
+        """Called after a question is looked up for an undefined value.
+
+        ``question_id`` is ``None`` if no question was found.
+        """
+
+    def on_hook(
+        self,
+        hook: Hook,
+        error: Optional[BaseException],
+        start: float,
+        duration: float,
+    ):
+        """Called after a hook is invoked, with the exception it raised, if any."""
+
+
+observer_ctx: ContextVar[Optional[AdvanceObserver]] = ContextVar(
+    "observer_ctx", default=None
+)
+"""The :class:`AdvanceObserver` of the current advance, if any."""
+
+
+@define
+class TimingObserver(AdvanceObserver):
+    """Adds up the number and duration of each kind of event.
+
+    Events of different kinds overlap, e.g. a step's time includes its conditions.
+    """
+
+    counts: dict[str, int] = Factory(dict)
+    """The number of events of each kind."""
+
+    durations: dict[str, float] = Factory(dict)
+    """The total time in seconds of each kind of event."""
+
+    slowest_step: Optional[tuple[int, str, float]] = None
+    """The index, type and duration of the slowest step."""
+
+    def add(self, kind: str, duration: float):
+        """Count an event of ``kind``."""
+        self.counts[kind] = self.counts.get(kind, 0) + 1
+        self.durations[kind] = self.durations.get(kind, 0.0) + duration
+
+    def on_advance(
+        self,
+        state: InterviewState,
+        result: Optional[StepResult],
+        start: float,
+        duration: float,
+    ):
+        self.add("advance", duration)
+
+    def on_pass(self, number: int, start: float, duration: float):
+        self.add("pass", duration)
+
+    def on_step(
+        self, index: int, step: Step, result: StepResult, start: float, duration: float
+    ):
+        self.add("step", duration)
+        if self.slowest_step is None or duration > self.slowest_step[2]:
+            self.slowest_step = (index, type(step).__name__.lower(), duration)
+
+    def on_condition(
+        self, condition: Condition, result: bool, start: float, duration: float
+    ):
+        self.add("condition", duration)
+
+    def on_render(self, kind: str, id: Optional[str], start: float, duration: float):
+        self.add("render", duration)
+
+    def on_undefined(
+        self,
+        location: Location,
+        question_id: Optional[str],
+        start: float,
+        duration: float,
+    ):
+        self.add("undefined", duration)
+
+    def on_hook(
+        self,
+        hook: Hook,
+        error: Optional[BaseException],
+        start: float,
+        duration: float,
+    ):
+        self.add("hook", duration)
@@ -0,0 +1,159 @@
+"""Compact binary packing primitives."""
+from __future__ import annotations
+
+import struct
+from collections.abc import Iterable
+from typing import Optional
+
+_int64 = struct.Struct(">q")
+
+
+class Packer:
+    """Writes values to a byte buffer."""
+
+    __slots__ = ("buffer",)
+
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def pack_byte(self, value: int):
+        """Write a single byte."""
+        self.buffer.append(value)
+
+    def pack_uint(self, value: int):
+        """Write a non-negative integer as a variable length integer."""
+        if value < 0x80:
+            self.buffer.append(value)
+            return
+        while value > 0x7F:
+            self.buffer.append((value & 0x7F) | 0x80)
+            value >>= 7
+        self.buffer.append(value)
+
+    def pack_raw(self, value: bytes):
+        """Write bytes without a length."""
+        self.buffer += value
+
+    def pack_int64(self, value: int):
+        """Write a signed 64-bit integer."""
+        self.buffer += _int64.pack(value)
+
+    def pack_bytes(self, value: bytes):
+        """Write length-prefixed bytes."""
+        self.pack_uint(len(value))
+        self.buffer += value
+
+    def pack_str(self, value: str):
+        """Write a length-prefixed UTF-8 string."""
+        self.pack_bytes(value.encode())
+
+    def pack_optional_str(self, value: Optional[str]):
+        """Write a string that may be ``None``."""
+        if value is None:
+            self.pack_uint(0)
+        else:
+            encoded = value.encode()
+            self.pack_uint(len(encoded) + 1)
+            self.buffer += encoded
+
+    def pack_str_set(self, values: Iterable[str]):
+        """Write a set of strings, sorted.
+
+        The strings are joined with NUL bytes, unless one contains a NUL byte, in
+        which case each is length-prefixed.
+        """
+        sorted_values = sorted(v.encode() for v in values)
+        joined = b"\0".join(sorted_values)
+        if joined.count(b"\0") == max(len(sorted_values) - 1, 0):
+            self.pack_uint(len(sorted_values) << 1)
+            self.pack_bytes(joined)
+        else:
+            self.pack_uint(len(sorted_values) << 1 | 1)
+            for value in sorted_values:
+                self.pack_bytes(value)
+
+    def getvalue(self) -> bytes:
+        """Get the packed bytes."""
+        return bytes(self.buffer)
+
+
+class Unpacker:
+    """Reads values written by a :class:`Packer`.
+
+    Raises:
+        ValueError: If the data is truncated or invalid.
+    """
+
+    __slots__ = ("data", "pos")
+
+    def __init__(self, data: bytes, pos: int = 0):
+        self.data = memoryview(data)
+        self.pos = pos
+
+    def unpack_byte(self) -> int:
+        """Read a single byte."""
+        if self.pos >= len(self.data):
+            raise ValueError("Truncated data")
+        value = self.data[self.pos]
+        self.pos += 1
+        return value
+
+    def unpack_uint(self) -> int:
+        """Read a variable length integer."""
+        value = 0
+        shift = 0
+        while True:
+            byte = self.unpack_byte()
+            value |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                return value
+            shift += 7
+            if shift > 63:
+                raise ValueError("Invalid integer")
+
+    def unpack_raw(self, length: int) -> bytes:
+        """Read ``length`` bytes."""
+        return self._read(length)
+
+    def unpack_int64(self) -> int:
+        """Read a signed 64-bit integer."""
+        return _int64.unpack(self._read(_int64.size))[0]
+
+    def unpack_bytes(self) -> bytes:
+        """Read length-prefixed bytes."""
+        return self._read(self.unpack_uint())
+
+    def unpack_str(self) -> str:
+        """Read a length-prefixed UTF-8 string."""
+        return self.unpack_bytes().decode()
+
+    def unpack_optional_str(self) -> Optional[str]:
+        """Read a string that may be ``None``."""
+        length = self.unpack_uint()
+        return self._read(length - 1).decode() if length else None
+
+    def unpack_str_set(self) -> frozenset[str]:
+        """Read a set of strings written by :meth:`Packer.pack_str_set`."""
+        header = self.unpack_uint()
+        count = header >> 1
+        if header & 1:
+            values = [self.unpack_bytes() for _ in range(count)]
+        else:
+            joined = self.unpack_bytes()
+            values = joined.split(b"\0") if count else []
+            if len(values) != count:
+                raise ValueError("Invalid string set")
+        return frozenset(v.decode() for v in values)
+
+    def unpack_rest(self) -> bytes:
+        """Read the remaining bytes."""
+        return self._read(len(self.data) - self.pos)
+
+    def _read(self, length: int) -> bytes:
+        start = self.pos
+        end = start + length
+        if end > len(self.data):
+            raise ValueError("Truncated data")
+        value = bytes(self.data[start:end])
+        self.pos = end
+        return value
@@ -0,0 +1,142 @@
+"""Condition evaluation module."""
+from __future__ import annotations
+
+import time
+from collections.abc import Iterable, Mapping
+from typing import Any, Optional
+
+from attrs import Factory, define
+from jinja2 import nodes
+from oes.interview.observer import AdvanceObserver
+from oes.interview.parsing.reads import read_names_context, record_read, track_reads
+from oes.interview.parsing.references import parse_expression
+from oes.interview.parsing.types import Whenable
+from oes.template import Condition, Expression, LogicAnd, evaluate
+
+
+def get_constant_condition(condition: Condition) -> Optional[bool]:
+    """Get the value of a condition that does not depend on any variables.
+
+    Returns:
+        The value, or ``None`` if the condition is not constant.
+    """
+    if isinstance(condition, bool):
+        return condition
+    elif isinstance(condition, tuple):
+        return _get_constant_conditions(condition)
+    elif isinstance(condition, LogicAnd):
+        return _get_constant_conditions(condition.and_)
+    elif isinstance(condition, Expression):
+        return _get_constant_expression(condition)
+    else:
+        return None
+
+
+def _get_constant_conditions(conditions: Iterable[Condition]) -> Optional[bool]:
+    values = [get_constant_condition(c) for c in conditions]
+    if False in values:
+        return False
+    else:
+        return True if all(v is True for v in values) else None
+
+
+def _get_constant_expression(expression: Expression) -> Optional[bool]:
+    source = getattr(expression, "source", None)
+    expr = parse_expression(source) if isinstance(source, str) else None
+    return bool(expr.value) if isinstance(expr, nodes.Const) else None
+
+
+@define
+class ConditionCache:
+    """Caches the results of conditions while the template context is unchanged.
+
+    Results are keyed by the identity of the condition objects. Conditions combined in
+    a tuple or :class:`LogicAnd` are cached separately, so a condition shared by many
+    steps, like the ``when`` condition of a block, is only evaluated once.
+    """
+
+    hits: int = 0
+    """The number of results returned from the cache."""
+
+    misses: int = 0
+    """The number of conditions that were evaluated."""
+
+    observer: Optional[AdvanceObserver] = None
+    """An observer to report evaluated conditions to."""
+
+    _context: Optional[Mapping[str, Any]] = None
+    _results: dict[int, tuple[object, bool, frozenset[str]]] = Factory(dict)
+
+    @property
+    def hit_rate(self) -> float:
+        """The fraction of results returned from the cache."""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def when_matches(self, obj: Whenable, context: Mapping[str, Any]) -> bool:
+        """Check if the ``when`` condition of ``obj`` matches."""
+        return self.evaluate(obj.when, context)
+
+    def evaluate(self, condition: Condition, context: Mapping[str, Any]) -> bool:
+        """Evaluate a condition, using the cached result if possible.
+
+        The cache is cleared when ``context`` is not the same object as the last one.
+        """
+        if context is not self._context:
+            self._context = context
+            self._results = {}
+
+        return self._evaluate(condition, context)
+
+    def _evaluate(self, condition: Condition, context: Mapping[str, Any]) -> bool:
+        if isinstance(condition, bool):
+            return condition
+        elif isinstance(condition, tuple):
+            return all(self._evaluate(c, context) for c in condition)
+        elif isinstance(condition, LogicAnd):
+            return all(self._evaluate(c, context) for c in condition.and_)
+        else:
+            return self._evaluate_cached(condition, context)
+
+    def _evaluate_cached(
+        self, condition: Condition, context: Mapping[str, Any]
+    ) -> bool:
+        entry = self._results.get(id(condition))
+        if entry is not None and entry[0] is condition:
+            self.hits += 1
+            _, result, names = entry
+            # record the names again, as if the condition was evaluated
+            for name in names:
+                record_read(name)
+        else:
+            self.misses += 1
+            result, names = self._evaluate_uncached(condition, context)
+            self._results[id(condition)] = (condition, result, names)
+
+        return result
+
+    def _evaluate_uncached(
+        self, condition: Condition, context: Mapping[str, Any]
+    ) -> tuple[bool, frozenset[str]]:
+        if self.observer is None:
+            return _evaluate_tracking_reads(condition, context)
+
+        start = time.perf_counter()
+        result, names = _evaluate_tracking_reads(condition, context)
+        self.observer.on_condition(
+            condition, result, start, time.perf_counter() - start
+        )
+        return result, names
+
+
+def _evaluate_tracking_reads(
+    condition: Condition, context: Mapping[str, Any]
+) -> tuple[bool, frozenset[str]]:
+    outer_names = read_names_context.get()
+    with track_reads() as names:
+        try:
+            result = bool(evaluate(condition, context))
+        finally:
+            if outer_names is not None:
+                outer_names.update(names)
+    return result, frozenset(names)
@@ -6,6 +6,7 @@ from typing import Any, Union
 
 import pyparsing as pp
 from attrs import frozen
+from oes.interview.parsing.reads import record_read
 from oes.template import Evaluable
 
 # Variable location
@@ -45,6 +46,15 @@ class Location(Evaluable, ABC):
         """Set the value at this location."""
         ...
 
+    @abstractmethod
+    def assign(self, value: Any, context: dict[str, Any]) -> dict[str, Any]:
+        """Return a copy of ``context`` with the value at this location set.
+
+        Only the containers along this location's path are copied, everything else
+        is shared with ``context``, which is not modified.
+        """
+        ...
+
     @classmethod
     def parse(cls, expr: str) -> Location:
         return var_location.parse_string(expr, True)[0]
@@ -74,6 +84,9 @@ class Const(Location):
     def set(self, value: Any, context: dict[str, Any]):
         raise TypeError("Cannot assign a constant")
 
+    def assign(self, value: Any, context: dict[str, Any]) -> dict[str, Any]:
+        raise TypeError("Cannot assign a constant")
+
 
 @frozen
 class Name(Location):
@@ -85,6 +98,7 @@ class Name(Location):
         return str(self.name)
 
     def evaluate(self, **context: Any) -> Any:
+        record_read(self.name)
         try:
             return context[self.name]
         except LookupError:
@@ -93,6 +107,9 @@ class Name(Location):
     def set(self, value: Any, context: dict[str, Any]):
         context[self.name] = value
 
+    def assign(self, value: Any, context: dict[str, Any]) -> dict[str, Any]:
+        return {**context, self.name: value}
+
 
 def _get_index(obj: object, index: Any) -> object:
     if not isinstance(obj, (dict, list)):
@@ -109,6 +126,15 @@ def _set_index(obj: object, index: Any, value: object):
     obj[index] = value
 
 
+def _copy_with_index(obj: object, index: Any, value: object) -> Union[dict, list]:
+    if not isinstance(obj, (dict, list)):
+        raise TypeError(f"Not a dict/list: {obj}")
+
+    copied = obj.copy()
+    _set_index(copied, index, value)
+    return copied
+
+
 @frozen
 class IndexAccess(Location):
     """An index access, e.g. ``a[x]``."""
@@ -143,6 +169,15 @@ class IndexAccess(Location):
         target = self.target.evaluate(**context)
         _set_index(target, index, value)
 
+    def assign(self, value: Any, context: dict[str, Any]) -> dict[str, Any]:
+        index = self.index.evaluate(**context)
+
+        if not isinstance(index, ConstTypes):
+            raise TypeError(f"Invalid index type: {index}")
+
+        target = self.target.evaluate(**context)
+        return self.target.assign(_copy_with_index(target, index, value), context)
+
 
 @frozen
 class AttributeAccess(Location):
@@ -180,6 +215,14 @@ class AttributeAccess(Location):
 
         target[self.attribute] = value
 
+    def assign(self, value: Any, context: dict[str, Any]) -> dict[str, Any]:
+        target = self.target.evaluate(**context)
+
+        if not isinstance(target, dict):
+            raise TypeError(f"Not a dict: {target}")
+
+        return self.target.assign({**target, self.attribute: value}, context)
+
 
 def _parse_element_type(
     left: Location, right_el: Union[pp.ParseResults, Location]
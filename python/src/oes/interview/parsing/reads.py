@@ -0,0 +1,37 @@
+"""Variable read tracking."""
+from __future__ import annotations
+
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+read_names_context: ContextVar[Optional[set[str]]] = ContextVar(
+    "read_names_context", default=None
+)
+"""The set of top level names read in the current context, if tracking is enabled."""
+
+
+def record_read(name: str):
+    """Record that the top level variable ``name`` was read."""
+    names = read_names_context.get()
+    if names is not None:
+        names.add(name)
+
+
+@contextmanager
+def track_reads() -> Iterator[set[str]]:
+    """Context manager that records the top level variable names that are read.
+
+    Names are recorded when they are looked up in a template or expression, or
+    evaluated by a :class:`Location`, whether or not they are defined.
+
+    Yields:
+        The set of names, which is updated as names are read.
+    """
+    names: set[str] = set()
+    token = read_names_context.set(names)
+    try:
+        yield names
+    finally:
+        read_names_context.reset(token)
@@ -0,0 +1,271 @@
+"""Static analysis of the variables referenced by templates and expressions."""
+from __future__ import annotations
+
+from collections.abc import Iterable, Iterator
+from datetime import date
+from enum import Enum
+from typing import Any, Optional, Union
+
+import attrs
+from jinja2 import TemplateSyntaxError, meta, nodes
+from jinja2.parser import Parser
+from oes.interview.parsing.location import (
+    AttributeAccess,
+    Const,
+    IndexAccess,
+    Location,
+    Name,
+)
+from oes.interview.parsing.template import default_jinja2_env
+from oes.template import Expression, Template
+
+Path = tuple[Union[str, int], ...]
+"""A location as a tuple of a name followed by attributes/indexes."""
+
+LITERAL_TYPES = (bool, int, float, str, date, Enum)
+
+ANY_INDEX = Name("*")
+"""Placeholder for an index that is not a constant."""
+
+_missing = object()
+
+
+def get_location_path(loc: Location) -> Path:
+    """Get the :class:`Path` of a :class:`Location`.
+
+    The path ends before the first non-constant index, so it covers every item of the
+    indexed value.
+    """
+    path: list[Union[str, int]] = []
+    while not isinstance(loc, Name):
+        if isinstance(loc, AttributeAccess):
+            path.append(loc.attribute)
+        elif isinstance(loc, IndexAccess) and isinstance(loc.index, Const):
+            path.append(loc.index.value)
+        elif isinstance(loc, IndexAccess):
+            path.clear()
+        else:
+            raise TypeError(f"Invalid location: {loc!r}")
+        loc = loc.target
+
+    path.append(loc.name)
+    return tuple(reversed(path))
+
+
+def paths_overlap(a: Path, b: Path) -> bool:
+    """Return whether one path contains the other."""
+    size = min(len(a), len(b))
+    return a[:size] == b[:size]
+
+
+def any_paths_overlap(a: Iterable[Path], b: Iterable[Path]) -> bool:
+    """Return whether any path in ``a`` contains or is contained by one in ``b``."""
+    b_paths = tuple(b)
+    return any(paths_overlap(a_path, b_path) for a_path in a for b_path in b_paths)
+
+
+def get_changed_paths(old: Any, new: Any, prefix: Path = ()) -> set[Path]:
+    """Get the paths of the values that differ between two dicts.
+
+    Values that are the same object are not compared, so this is cheap when the
+    unchanged parts are shared.
+    """
+    if old is new:
+        return set()
+
+    keys = _get_common_keys(old, new)
+    if keys is None:
+        return set() if old == new else {prefix}
+
+    changed = set()
+    for key in keys:
+        changed.update(
+            get_changed_paths(
+                _get_child(old, key), _get_child(new, key), (*prefix, key)
+            )
+        )
+
+    return changed
+
+
+def _get_common_keys(old: Any, new: Any) -> Optional[Iterable[Union[str, int]]]:
+    if isinstance(old, dict) and isinstance(new, dict):
+        return old.keys() | new.keys()
+    elif isinstance(old, list) and isinstance(new, list) and len(old) == len(new):
+        return range(len(old))
+    else:
+        return None
+
+
+def _get_child(obj: Union[dict, list], key: Any) -> Any:
+    return obj.get(key, _missing) if isinstance(obj, dict) else obj[key]
+
+
+def _get_node_location(node: nodes.Node) -> Optional[Location]:
+    """Get the :class:`Location` a Jinja2 node refers to, if any."""
+    if isinstance(node, nodes.Name):
+        return Name(node.name)
+    elif isinstance(node, (nodes.Getattr, nodes.Getitem)):
+        target = _get_node_location(node.node)
+        return _get_access_location(target, node) if target is not None else None
+    else:
+        return None
+
+
+def _get_access_location(
+    target: Location, node: Union[nodes.Getattr, nodes.Getitem]
+) -> Location:
+    if isinstance(node, nodes.Getattr):
+        return AttributeAccess(target, node.attr)
+    elif isinstance(node.arg, nodes.Const) and isinstance(node.arg.value, int):
+        return IndexAccess(target, Const(node.arg.value))
+    elif isinstance(node.arg, nodes.Const) and isinstance(node.arg.value, str):
+        return AttributeAccess(target, node.arg.value)
+    else:
+        return IndexAccess(target, ANY_INDEX)
+
+
+def _iter_node_locations(node: nodes.Node) -> Iterator[Location]:
+    """Yield the outermost locations referenced in a Jinja2 AST."""
+    if isinstance(node, nodes.Call) and isinstance(node.node, nodes.Getattr):
+        # a method call like a.get("b") reads a, not a.get
+        yield from _iter_node_locations(node.node.node)
+        yield from _iter_child_locations(node, exclude=("node",))
+        return
+
+    loc = _get_node_location(node)
+    if loc is not None:
+        yield loc
+        yield from _iter_index_locations(node)
+    else:
+        yield from _iter_child_locations(node)
+
+
+def _iter_child_locations(
+    node: nodes.Node, exclude: tuple[str, ...] = ()
+) -> Iterator[Location]:
+    for child in node.iter_child_nodes(exclude=exclude):
+        yield from _iter_node_locations(child)
+
+
+def _iter_index_locations(node: nodes.Node) -> Iterator[Location]:
+    """Yield the locations referenced by the indexes of an attribute/item access."""
+    while isinstance(node, (nodes.Getattr, nodes.Getitem)):
+        if isinstance(node, nodes.Getitem):
+            yield from _iter_node_locations(node.arg)
+        node = node.node
+
+
+def _get_ast_locations(ast: nodes.Node) -> frozenset[Location]:
+    undeclared = meta.find_undeclared_variables(ast)
+    return frozenset(
+        loc
+        for loc in _iter_node_locations(ast)
+        if get_location_path(loc)[0] in undeclared
+    )
+
+
+def get_template_references(source: str) -> Optional[frozenset[Location]]:
+    """Get the locations referenced by a template source.
+
+    Returns:
+        The set of locations, or ``None`` if they could not be determined.
+    """
+    try:
+        ast = default_jinja2_env.parse(source)
+    except TemplateSyntaxError:
+        return None
+
+    return _get_ast_locations(ast)
+
+
+def parse_expression(source: str) -> Optional[nodes.Expr]:
+    """Parse an expression source into a Jinja2 AST node.
+
+    Returns:
+        The node, or ``None`` if the source is not a valid expression.
+    """
+    try:
+        parser = Parser(default_jinja2_env, source, state="variable")
+        expr = parser.parse_expression()
+    except TemplateSyntaxError:
+        return None
+
+    return expr if parser.stream.eos else None
+
+
+def get_expression_references(source: str) -> Optional[frozenset[Location]]:
+    """Get the locations referenced by an expression source.
+
+    Returns:
+        The set of locations, or ``None`` if they could not be determined.
+    """
+    expr = parse_expression(source)
+    if expr is None:
+        return None
+
+    # wrap the expression in a template so undeclared names can be found
+    ast = nodes.Template([nodes.Output([expr], lineno=1)], lineno=1)
+    ast.set_environment(default_jinja2_env)
+    return _get_ast_locations(ast)
+
+
+def get_location_references(loc: Location) -> frozenset[Location]:
+    """Get the locations read when evaluating a :class:`Location`."""
+    refs = {loc}
+    while isinstance(loc, (AttributeAccess, IndexAccess)):
+        if isinstance(loc, IndexAccess) and not isinstance(loc.index, Const):
+            refs.update(get_location_references(loc.index))
+        loc = loc.target
+    return frozenset(refs)
+
+
+def _get_source_references(obj: object) -> Optional[frozenset[Location]]:
+    source = getattr(obj, "source", None)
+    if not isinstance(source, str):
+        return None
+    elif isinstance(obj, Template):
+        return get_template_references(source)
+    else:
+        return get_expression_references(source)
+
+
+def get_references(obj: object) -> Optional[frozenset[Location]]:
+    """Get the locations referenced by a template, expression, or condition.
+
+    Sequences, dicts, and attrs classes containing these are searched as well.
+
+    Returns:
+        The set of locations, or ``None`` if they could not be determined.
+    """
+    if obj is None or isinstance(obj, LITERAL_TYPES):
+        return frozenset()
+    elif isinstance(obj, (Template, Expression)):
+        return _get_source_references(obj)
+    elif isinstance(obj, Location):
+        return get_location_references(obj)
+    else:
+        return _get_container_references(obj)
+
+
+def _get_container_references(obj: object) -> Optional[frozenset[Location]]:
+    if isinstance(obj, dict):
+        return _union_references(obj.values())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        return _union_references(obj)
+    elif attrs.has(type(obj)):
+        return _union_references(
+            getattr(obj, f.name) for f in attrs.fields(type(obj)) if f.init
+        )
+    else:
+        return None
+
+
+def _union_references(objs: Iterable[object]) -> Optional[frozenset[Location]]:
+    result: set[Location] = set()
+    for obj in objs:
+        refs = get_references(obj)
+        if refs is None:
+            return None
+        result.update(refs)
+    return frozenset(result)
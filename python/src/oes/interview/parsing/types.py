@@ -3,6 +3,7 @@ from __future__ import annotations
 
 import re
 from abc import abstractmethod
+from collections.abc import Mapping
 from typing import Any
 
 from oes.template import Condition, evaluate
@@ -33,4 +34,8 @@ class Whenable(Protocol):
 
     def when_matches(self, **context: Any) -> bool:
         """Check if the condition matches."""
+        return self.when_matches_context(context)
+
+    def when_matches_context(self, context: Mapping[str, Any]) -> bool:
+        """Check if the condition matches, using ``context`` without copying it."""
         return bool(evaluate(self.when, context))
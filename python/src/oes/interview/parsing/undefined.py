@@ -11,6 +11,7 @@ from oes.interview.parsing.location import (
     Name,
     UndefinedError,
 )
+from oes.interview.parsing.reads import record_read
 
 
 class Proxy:
@@ -44,6 +45,7 @@ class Context(jinja2.environment.Context):
     """Jinja2 context that returns :class:`Proxy` instances when appropriate."""
 
     def resolve_or_missing(self, key: str):
+        record_read(key)
         val = super().resolve_or_missing(key)
         return Proxy._make_proxy(Name(key), val)
 
@@ -1,22 +1,71 @@
 """Interview process module."""
-import copy
-from collections.abc import Awaitable, Callable, Iterable
-from typing import Any, Optional
+import asyncio
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterable, Sequence
+from typing import Any, Optional, Union
 
-from attrs import evolve
+from attrs import Factory, define, evolve, frozen
+from loguru import logger
 from oes.hook import HttpHookConfig
+from oes.interview.config.dependencies import StepDependencies
+from oes.interview.config.interview import Interview
+from oes.interview.config.plan import InterviewPlan
 from oes.interview.config.question import Question
 from oes.interview.config.question_bank import QuestionBank, question_bank_context
-from oes.interview.config.step import Step, StepResult, StepResultStatus, http_func_ctx
+from oes.interview.config.step import (
+    Hook,
+    Step,
+    StepResult,
+    StepResultStatus,
+    hook_semaphore_ctx,
+    http_func_ctx,
+)
+from oes.interview.cursor import get_cursor, get_cursor_index
+from oes.interview.observer import AdvanceObserver, observer_ctx
+from oes.interview.parsing.condition import ConditionCache
 from oes.interview.parsing.location import Location, UndefinedError
+from oes.interview.parsing.reads import track_reads
+from oes.interview.parsing.references import Path as LocationPath
+from oes.interview.parsing.references import any_paths_overlap, get_changed_paths
+from oes.interview.parsing.types import Whenable
 from oes.interview.response import AskResult
 from oes.interview.state import InterviewState, InvalidStateError
+from typing_extensions import TypeAlias
+
+DEFAULT_MAX_UNDEFINED_DEPTH = 50
+"""The default maximum number of nested undefined values to resolve."""
+
+DEFAULT_MAX_PASSES = 100
+"""The default number of changes to process in one advance, besides one per step."""
+
+DEFAULT_MAX_SECONDS = 10.0
+"""The default maximum time in seconds to spend processing changes in one advance."""
+
+DEFAULT_BATCH_CONCURRENCY = 100
+"""The default maximum number of states to advance at once in a batch."""
+
+DEFAULT_HOOK_CONCURRENCY = 10
+"""The default maximum number of hooks to run at once in a batch."""
+
+HttpFunc: TypeAlias = Callable[
+    [InterviewState, HttpHookConfig], Awaitable[tuple[InterviewState, StepResult]]
+]
+"""A coroutine to use for HTTP hooks."""
 
 
 class InterviewError(RuntimeError):
     """Raised when there is a problem with an interview."""
 
 
+def get_max_passes(interview: Interview) -> int:
+    """Get the default maximum number of passes for an interview.
+
+    A settling interview changes each value about once, so this is one pass per
+    flattened step, plus :data:`DEFAULT_MAX_PASSES`.
+    """
+    return len(interview.flattened_steps) + DEFAULT_MAX_PASSES
+
+
 def get_questions_for_variable(
     state: InterviewState, bank: QuestionBank, location: Location
 ) -> Iterable[Question]:
@@ -35,7 +84,11 @@ def get_questions_for_variable(
 
 
 def get_question_for_variable(
-    state: InterviewState, bank: QuestionBank, location: Location
+    state: InterviewState,
+    bank: QuestionBank,
+    location: Location,
+    *,
+    conditions: Optional[ConditionCache] = None,
 ) -> Question:
     """Get a :class:`Question` that provides the value of ``expr``.
 
@@ -46,6 +99,7 @@ def get_question_for_variable(
         state: The interview state.
         bank: The question bank.
         location: The variable location.
+        conditions: A :class:`ConditionCache` to use for the ``when`` conditions.
 
     Returns:
         A :class:`Question`.
@@ -53,11 +107,12 @@ def get_question_for_variable(
     Raises:
         InterviewError: If a question could not be found.
     """
+    conditions = conditions if conditions is not None else ConditionCache()
     for q in get_questions_for_variable(state, bank, location):
         if q.id in state.answered_question_ids:
             continue
 
-        if not q.when_matches(**state.template_context):
+        if not conditions.when_matches(q, state.template_context):
             continue
 
         return q
@@ -65,29 +120,71 @@ def get_question_for_variable(
         raise InterviewError(f"No question providing {location}")
 
 
-def recursive_get_ask_for_variable(
-    state: InterviewState, bank: QuestionBank, location: Location
+def get_ask_for_variable(
+    state: InterviewState,
+    bank: QuestionBank,
+    location: Location,
+    *,
+    max_depth: int = DEFAULT_MAX_UNDEFINED_DEPTH,
+    dependencies: Optional[dict[Location, Location]] = None,
+    conditions: Optional[ConditionCache] = None,
 ) -> tuple[InterviewState, AskResult]:
-    """Recursively get a :class:`AskResult` for a variable.
+    """Get a :class:`AskResult` for a variable.
+
+    If the question providing the variable depends on another undefined variable, a
+    question for that variable is found instead, and so on.
 
     Args:
         state: The interview state.
         bank: The question bank.
         location: The variable location.
+        max_depth: The maximum number of nested undefined variables.
+        dependencies: A dict mapping locations to the undefined location they depend
+            on, which is used and updated. Only valid for the same state.
+        conditions: A :class:`ConditionCache` to use for the ``when`` conditions.
 
     Returns:
         A :class:`AskResult`.
 
     Raises:
-        InterviewError: If a question could not be found.
+        InterviewError: If a question could not be found, the variables depend on each
+            other, or there are too many nested undefined variables.
     """
-    try:
-        q = get_question_for_variable(state, bank, location)
-        ask = AskResult.create_from_question(q, state)
-        state = state.update_with_question(q.id)
-        return state, ask
-    except UndefinedError as e:
-        return recursive_get_ask_for_variable(state, bank, e.location)
+    dependencies = dependencies if dependencies is not None else {}
+    stack = [location]
+
+    while True:
+        loc = stack[-1]
+        if loc not in dependencies:
+            try:
+                q = get_question_for_variable(state, bank, loc, conditions=conditions)
+                ask = AskResult.create_from_question(q, state)
+                return state.update_with_question(q.id), ask
+            except UndefinedError as e:
+                dependencies[loc] = e.location
+
+        dependency = dependencies[loc]
+        _check_dependency(stack, dependency, max_depth)
+        stack.append(dependency)
+
+
+def _check_dependency(stack: Sequence[Location], dependency: Location, max_depth: int):
+    if dependency in stack:
+        chain = " -> ".join(str(loc) for loc in (*stack, dependency))
+        raise InterviewError(f"Circular dependency: {chain}")
+    elif len(stack) >= max_depth:
+        raise InterviewError(f"Too many nested undefined values for {stack[0]}")
+
+
+def recursive_get_ask_for_variable(
+    state: InterviewState, bank: QuestionBank, location: Location
+) -> tuple[InterviewState, AskResult]:
+    """Get a :class:`AskResult` for a variable.
+
+    See Also:
+        :func:`get_ask_for_variable`
+    """
+    return get_ask_for_variable(state, bank, location)
 
 
 def _validate_and_apply_responses(
@@ -98,9 +195,9 @@ def _validate_and_apply_responses(
 ) -> dict[str, Any]:
     """Validate and apply responses."""
     values = question.parse_response(responses, button)
-    new_data = copy.deepcopy(state.data)
+    new_data = state.data
     for path, val in values.items():
-        path.set(val, new_data)
+        new_data = path.assign(val, new_data)
 
     return new_data
 
@@ -126,28 +223,194 @@ def _apply_responses(
         return state
 
 
+@define
+class _Advance:
+    """Settings and caches for a single interview state advance."""
+
+    questions: QuestionBank
+    max_undefined_depth: int = DEFAULT_MAX_UNDEFINED_DEPTH
+    max_passes: int = DEFAULT_MAX_PASSES
+    max_seconds: Optional[float] = DEFAULT_MAX_SECONDS
+    plan: Optional[InterviewPlan] = None
+    """The compiled plan to run, instead of handling the steps directly."""
+
+    passes: int = 0
+    start: float = Factory(time.perf_counter)
+    index: int = 0
+    """The index of the last step that was handled."""
+
+    observer: Optional[AdvanceObserver] = None
+    pass_start: float = 0.0
+    """When the current pass started, if observed."""
+
+    conditions: ConditionCache = Factory(
+        lambda self: ConditionCache(observer=self.observer), takes_self=True
+    )
+
+    _dependencies: dict[Location, Location] = Factory(dict)
+    _dependencies_state: Optional[InterviewState] = None
+
+    def count_pass(self):
+        """Count a pass through the steps after a change.
+
+        Raises:
+            InterviewError: If the maximum number of passes or time is exceeded.
+        """
+        self.passes += 1
+        if self.observer is not None:
+            self.end_pass(self.passes)
+
+        if self.passes > self.max_passes:
+            raise InterviewError(
+                f"Interview did not finish after {self.max_passes} passes, "
+                "steps may be changing values repeatedly"
+            )
+
+        elapsed = time.perf_counter() - self.start
+        if self.max_seconds is not None and elapsed > self.max_seconds:
+            raise InterviewError(
+                f"Interview did not finish after {self.max_seconds:g} seconds "
+                f"({self.passes} passes), steps may be changing values repeatedly"
+            )
+
+    def end_pass(self, number: int):
+        """Report the end of a pass to the observer."""
+        assert self.observer is not None
+        now = time.perf_counter()
+        self.observer.on_pass(number, self.pass_start, now - self.pass_start)
+        self.pass_start = now
+
+    def when_matches(self, obj: Whenable, state: InterviewState) -> bool:
+        """Check if the ``when`` condition of ``obj`` matches."""
+        return self.conditions.when_matches(obj, state.template_context)
+
+    def get_ask_for_variable(
+        self, state: InterviewState, location: Location
+    ) -> tuple[InterviewState, AskResult]:
+        """Get a :class:`AskResult` for a variable.
+
+        Remembers the undefined values that questions depend on, while the data and
+        answered questions are unchanged.
+        """
+        if self.observer is None:
+            return self._get_ask_for_variable(state, location)
+
+        start = time.perf_counter()
+        question_id = None
+        try:
+            state, ask = self._get_ask_for_variable(state, location)
+            question_id = state.question_id
+            return state, ask
+        finally:
+            self.observer.on_undefined(
+                location, question_id, start, time.perf_counter() - start
+            )
+
+    def _get_ask_for_variable(
+        self, state: InterviewState, location: Location
+    ) -> tuple[InterviewState, AskResult]:
+        prev = self._dependencies_state
+        if (
+            prev is None
+            or prev.template_context is not state.template_context
+            or prev.answered_question_ids != state.answered_question_ids
+        ):
+            self._dependencies = {}
+            self._dependencies_state = state
+
+        return get_ask_for_variable(
+            state,
+            self.questions,
+            location,
+            max_depth=self.max_undefined_depth,
+            dependencies=self._dependencies,
+            conditions=self.conditions,
+        )
+
+
+async def _handle_step(
+    state: InterviewState, advance: _Advance, index: int
+) -> tuple[InterviewState, StepResult]:
+    if advance.plan is not None:
+        return await advance.plan.steps[index](state, advance.conditions)
+
+    step = state.interview.flattened_steps[index]
+
+    # Evaluate when conditions
+    if not advance.when_matches(step, state):
+        return state, StepResultStatus.not_changed
+
+    return await step.handle(state)
+
+
 async def _handle_step_or_resolve_undefined(
-    state: InterviewState, questions: QuestionBank, step: Step
+    state: InterviewState, advance: _Advance, index: int
 ) -> tuple[InterviewState, StepResult]:
     # Handle the step, or return an AskResult for a missing value
     try:
-        # Evaluate when conditions
-        if not step.when_matches(**state.template_context):
-            return state, StepResultStatus.not_changed
+        return await _handle_step(state, advance, index)
+    except UndefinedError as e:
+        return advance.get_ask_for_variable(state, e.location)
+
+
+async def _handle_step_or_skip_blocks(
+    state: InterviewState, advance: _Advance, index: int
+) -> tuple[InterviewState, StepResult, int]:
+    """Handle the step at ``index``, unless the condition of a block starting there
+    does not match.
 
-        return await step.handle(state)
+    Returns:
+        The updated state, the result, and the index after the steps that were
+        handled or skipped.
+    """
+    advance.index = index
+    interview = state.interview
+    try:
+        for block in interview.block_ranges.get(index, ()):
+            if not advance.when_matches(block, state):
+                return state, StepResultStatus.not_changed, block.end
     except UndefinedError as e:
-        return recursive_get_ask_for_variable(state, questions, e.location)
+        new_state, ask = advance.get_ask_for_variable(state, e.location)
+        return new_state, ask, index
+
+    state, res = await _handle_step_or_resolve_undefined(state, advance, index)
+    return state, res, index + 1
+
+
+async def _observe_step(
+    state: InterviewState, advance: _Advance, index: int
+) -> tuple[InterviewState, StepResult, int]:
+    assert advance.observer is not None
+    start = time.perf_counter()
+    new_state, res, next_index = await _handle_step_or_skip_blocks(
+        state, advance, index
+    )
+    step = state.interview.flattened_steps[index]
+    advance.observer.on_step(index, step, res, start, time.perf_counter() - start)
+    return new_state, res, next_index
+
+
+def _get_step_handler(
+    advance: _Advance,
+) -> Callable[
+    [InterviewState, _Advance, int], Awaitable[tuple[InterviewState, StepResult, int]]
+]:
+    """Get the function to handle steps, which only times them if observed."""
+    if advance.observer is not None:
+        return _observe_step
+    else:
+        return _handle_step_or_skip_blocks
 
 
 async def _process_steps(
-    state: InterviewState, questions: QuestionBank
+    state: InterviewState, advance: _Advance, start: int = 0
 ) -> tuple[InterviewState, StepResult]:
     # Walk through steps
-    for step_wrapper in state.interview.flattened_steps:
-        state, res = await _handle_step_or_resolve_undefined(
-            state, questions, step_wrapper
-        )
+    steps = state.interview.flattened_steps
+    handle_step = _get_step_handler(advance)
+    index = start
+    while index < len(steps):
+        state, res, index = await handle_step(state, advance, index)
         if res is not StepResultStatus.not_changed:
             return state, res
 
@@ -155,17 +418,173 @@ async def _process_steps(
     return state, StepResultStatus.completed
 
 
+async def _restart_steps(
+    state: InterviewState, advance: _Advance, start: int = 0
+) -> tuple[InterviewState, StepResult]:
+    # process all steps in order. repeat every time a change is made.
+    state, result = await _process_steps(state, advance, start)
+    while result is StepResultStatus.changed:
+        advance.count_pass()
+        state, result = await _process_steps(state, advance)
+
+    return state, result
+
+
+def _get_changed_paths(
+    old: InterviewState, new: InterviewState
+) -> Optional[set[LocationPath]]:
+    """Get the paths of the values that differ between two states.
+
+    Returns ``None`` if something other than the data/context changed.
+    """
+    if new.answered_question_ids != old.answered_question_ids:
+        return None
+
+    return get_changed_paths(old.data, new.data) | get_changed_paths(
+        old.context, new.context
+    )
+
+
+def _is_step_affected(
+    names: Optional[frozenset[str]],
+    paths: Optional[frozenset[LocationPath]],
+    changed: set[LocationPath],
+) -> bool:
+    """Return whether a step that read ``names`` and ``paths`` is affected."""
+    if names is None:
+        return True
+    elif names.isdisjoint(path[0] for path in changed):
+        return False
+    else:
+        return paths is None or any_paths_overlap(paths, changed)
+
+
+def _get_resume_index(
+    reads: Sequence[Optional[frozenset[str]]],
+    dependencies: Sequence[StepDependencies],
+    changed: Optional[set[LocationPath]],
+) -> int:
+    """Get the index of the first step whose reads were affected by a change.
+
+    The names recorded while handling the step are narrowed down using the paths
+    found by static analysis.
+    """
+    if changed is None:
+        return 0
+
+    for i, step_reads in enumerate(reads):
+        if _is_step_affected(step_reads, dependencies[i].read_paths, changed):
+            return i
+    return len(reads)
+
+
+def _add_reads(
+    reads: list[Optional[frozenset[str]]],
+    steps: Sequence[Step],
+    index: int,
+    next_index: int,
+    names: set[str],
+):
+    """Add the names read by the steps that were handled or skipped."""
+    if next_index == index + 1 and isinstance(steps[index], Hook):
+        # hooks may depend on anything
+        reads.append(None)
+    else:
+        # skipped steps only depend on the block conditions
+        reads.extend([frozenset(names)] * (next_index - index))
+
+
+def _get_static_names(dependencies: StepDependencies) -> Optional[frozenset[str]]:
+    paths = dependencies.read_paths
+    return frozenset(path[0] for path in paths) if paths is not None else None
+
+
+async def _resume_steps(
+    state: InterviewState, advance: _Advance, start: int = 0
+) -> tuple[InterviewState, StepResult]:
+    # Walk through steps, tracking the names read by each one. After a change, only
+    # go back to the first step that read a changed value.
+    steps = state.interview.flattened_steps
+    dependencies = state.interview.dependency_graph.steps
+    # the names read by skipped steps are found by static analysis
+    reads = [_get_static_names(dependencies[i]) for i in range(start)]
+    handle_step = _get_step_handler(advance)
+    index = start
+
+    while index < len(steps):
+        with track_reads() as names:
+            new_state, res, next_index = await handle_step(state, advance, index)
+
+        _add_reads(reads, steps, index, next_index, names)
+
+        if res is StepResultStatus.changed:
+            advance.count_pass()
+            changed = _get_changed_paths(state, new_state)
+            index = _get_resume_index(reads, dependencies, changed)
+            del reads[index:]
+        elif res is StepResultStatus.not_changed:
+            index = next_index
+        else:
+            return new_state, res
+
+        state = new_state
+
+    state = evolve(state, complete=True)
+    return state, StepResultStatus.completed
+
+
+def _update_cursor(state: InterviewState, index: int) -> InterviewState:
+    new_cursor = get_cursor(state, index) if not state.complete else None
+    return evolve(state, cursor=new_cursor)
+
+
+async def _run_steps(
+    state: InterviewState, advance: _Advance, resume: bool, cursor: bool
+) -> tuple[InterviewState, StepResult]:
+    start = get_cursor_index(state) if cursor else 0
+    if resume:
+        state, result = await _resume_steps(state, advance, start)
+    else:
+        state, result = await _restart_steps(state, advance, start)
+
+    if cursor:
+        state = _update_cursor(state, advance.index)
+
+    return state, result
+
+
+async def _observe_steps(
+    state: InterviewState, advance: _Advance, resume: bool, cursor: bool
+) -> tuple[InterviewState, StepResult]:
+    observer = advance.observer
+    assert observer is not None
+    start = time.perf_counter()
+    advance.pass_start = start
+    result: Optional[StepResult] = None
+    token = observer_ctx.set(observer)
+    try:
+        state, result = await _run_steps(state, advance, resume, cursor)
+        advance.end_pass(advance.passes + 1)
+        return state, result
+    finally:
+        observer_ctx.reset(token)
+        observer.on_advance(state, result, start, time.perf_counter() - start)
+
+
 async def advance_interview_state(
     state: InterviewState,
     questions: QuestionBank,
     responses: Optional[dict[str, Any]] = None,
     button: Optional[int] = None,
-    http_func: Optional[
-        Callable[
-            [InterviewState, HttpHookConfig],
-            Awaitable[tuple[InterviewState, StepResult]],
-        ]
-    ] = None,
+    http_func: Optional[HttpFunc] = None,
+    *,
+    resume: bool = False,
+    max_undefined_depth: int = DEFAULT_MAX_UNDEFINED_DEPTH,
+    max_passes: Optional[int] = None,
+    max_seconds: Optional[float] = DEFAULT_MAX_SECONDS,
+    cursor: bool = False,
+    compiled: bool = False,
+    observer: Optional[AdvanceObserver] = None,
 ) -> tuple[InterviewState, StepResult]:
     """Advance the interview state.
 
@@ -175,26 +594,146 @@ async def advance_interview_state(
         responses: The question responses, if provided.
         button: The button ID, if provided.
         http_func: A coroutine to use for HTTP hooks.
+        resume: Continue from the step after a change, instead of restarting from the
+            first step. Only earlier steps that read a changed value are re-processed.
+        max_undefined_depth: The maximum number of nested undefined values to resolve
+            when looking for a question.
+        max_passes: The maximum number of times to continue processing steps after a
+            change, defaults to :func:`get_max_passes`.
+        max_seconds: The maximum time in seconds to continue processing steps after
+            changes, or ``None`` for no limit.
+        cursor: Continue from the :class:`ResumeCursor` of the state if the values
+            read by the earlier steps did not change, and store a new cursor in the
+            returned state.
+        compiled: Run the compiled :class:`InterviewPlan` of the interview, instead
+            of handling each step. The plan uses the interview's own question bank.
+        observer: An :class:`AdvanceObserver` to report passes, steps, conditions,
+            renders, undefined values and hooks to.
 
     Returns:
         A tuple of the updated state and the step result.
+
+    Raises:
+        InterviewError: If there is a problem with the interview, or the maximum
+            number of passes or time is exceeded.
     """
     # Checks
     if state.complete:
         raise InvalidStateError("Interview is already complete")
 
     state = _apply_responses(state, questions, responses, button)
+    advance = _Advance(
+        questions,
+        max_undefined_depth=max_undefined_depth,
+        max_passes=(
+            max_passes if max_passes is not None else get_max_passes(state.interview)
+        ),
+        max_seconds=max_seconds,
+        plan=state.interview.plan if compiled else None,
+        observer=observer,
+    )
 
     # set question bank and http context
     token = question_bank_context.set(questions)
     http_token = http_func_ctx.set(http_func)
+    result: StepResult
     try:
-        # process all steps in order. repeat every time a change is made.
-        result: StepResult = StepResultStatus.changed
-        while result is StepResultStatus.changed:
-            state, result = await _process_steps(state, questions)
+        if observer is None:
+            state, result = await _run_steps(state, advance, resume, cursor)
+        else:
+            state, result = await _observe_steps(state, advance, resume, cursor)
     finally:
         http_func_ctx.reset(http_token)
         question_bank_context.reset(token)
+        # formatted by loguru only if a handler logs debug messages
+        conditions = advance.conditions
+        logger.debug(
+            "Condition cache: {} hits, {} misses ({:.0%} hit rate)",
+            conditions.hits,
+            conditions.misses,
+            conditions.hit_rate,
+        )
 
     return state, result
+
+
+@frozen
+class AdvanceRequest:
+    """A state to advance with :func:`advance_interview_states`."""
+
+    state: InterviewState
+    responses: Optional[dict[str, Any]] = None
+    button: Optional[int] = None
+
+
+async def _advance_batch_item(
+    request: AdvanceRequest,
+    semaphore: asyncio.Semaphore,
+    question_banks: dict[str, QuestionBank],
+    http_func: Optional[HttpFunc],
+    options: dict[str, Any],
+) -> Union[tuple[InterviewState, StepResult], Exception]:
+    async with semaphore:
+        try:
+            state = request.state
+            bank = question_banks.get(state.interview_id)
+            if bank is None:
+                bank = state.interview.question_bank
+                question_banks[state.interview_id] = bank
+
+            return await advance_interview_state(
+                state, bank, request.responses, request.button, http_func, **options
+            )
+        except Exception as e:
+            return e
+
+
+async def advance_interview_states(
+    requests: Iterable[AdvanceRequest],
+    http_func: Optional[HttpFunc] = None,
+    *,
+    concurrency: int = DEFAULT_BATCH_CONCURRENCY,
+    hook_concurrency: int = DEFAULT_HOOK_CONCURRENCY,
+    **options: Any,
+) -> AsyncIterator[Union[tuple[InterviewState, StepResult], Exception]]:
+    """Advance many interview states concurrently.
+
+    Each interview's question bank is looked up once for the batch.
+
+    Args:
+        requests: The states to advance, with their responses.
+        http_func: A coroutine to use for HTTP hooks.
+        concurrency: The maximum number of states to advance at once.
+        hook_concurrency: The maximum number of hooks to run at once.
+        **options: Keyword arguments for :func:`advance_interview_state`.
+
+    Yields:
+        The updated state and step result for each request, in the same order as
+        ``requests``. If advancing a state raised an exception, the exception is
+        yielded instead.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    question_banks: dict[str, QuestionBank] = {}
+
+    # tasks copy the context when they are created
+    token = hook_semaphore_ctx.set(asyncio.Semaphore(hook_concurrency))
+    try:
+        tasks = [
+            asyncio.create_task(
+                _advance_batch_item(
+                    request, semaphore, question_banks, http_func, options
+                )
+            )
+            for request in requests
+        ]
+    finally:
+        hook_semaphore_ctx.reset(token)
+
+    # if the iterator is closed early, cancel the advances that have not finished
+    try:
+        for task in tasks:
+            yield await task
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -4,6 +4,7 @@ from typing import Optional
 
 from attrs import frozen
 from oes.interview.state import InterviewState, get_validated_state
+from oes.interview.verify import VerifiedState, verify_state
 
 
 @frozen
@@ -27,3 +28,19 @@ class InterviewStateRequestBody:
         return get_validated_state(
             self.state, key=key, current_version=current_version, now=now
         )
+
+    def verify(
+        self,
+        *,
+        key: bytes,
+        current_version: Optional[str] = None,
+        now: Optional[datetime] = None,
+    ) -> VerifiedState:
+        """Verify the completed state without building the :class:`InterviewState`.
+
+        See Also:
+            :func:`oes.interview.verify.verify_state`
+        """
+        return verify_state(
+            self.state, key=key, current_version=current_version, now=now
+        )
@@ -1,12 +1,14 @@
 """Response types."""
 from __future__ import annotations
 
+import time
 from collections.abc import Sequence
 from typing import TYPE_CHECKING, Any, Literal, Optional, Union
 
 from attrs import frozen
 from cattrs import Converter
 from oes.interview.config.field import AskField
+from oes.interview.observer import observer_ctx
 
 if TYPE_CHECKING:
     from oes.interview.config.question import Button, Question
@@ -60,6 +62,20 @@ class AskResult:
         Returns:
             The :class:`AskResult`.
         """
+        observer = observer_ctx.get()
+        if observer is None:
+            return cls._render_question(question, state)
+
+        start = time.perf_counter()
+        try:
+            return cls._render_question(question, state)
+        finally:
+            observer.on_render(
+                "question", question.id, start, time.perf_counter() - start
+            )
+
+    @classmethod
+    def _render_question(cls, question: Question, state: InterviewState) -> AskResult:
         context = state.template_context
         title = question.title.render(**context) if question.title else None
         desc = question.description.render(**context) if question.description else None
@@ -104,6 +120,18 @@ class ExitResult:
     @classmethod
     def create_from_step(cls, step: Exit, state: InterviewState) -> ExitResult:
         """Create an :class:`ExitResult` from an :class:`Exit` step."""
+        observer = observer_ctx.get()
+        if observer is None:
+            return cls._render_step(step, state)
+
+        start = time.perf_counter()
+        try:
+            return cls._render_step(step, state)
+        finally:
+            observer.on_render("exit", None, start, time.perf_counter() - start)
+
+    @classmethod
+    def _render_step(cls, step: Exit, state: InterviewState) -> ExitResult:
         context = state.template_context
         title = step.exit.render(**context)
         desc = step.description.render(**context) if step.description else None
@@ -155,6 +183,7 @@ def create_state_response(
     key: bytes,
     content: Union[AskResult, ExitResult, None] = None,
     update_url: Optional[str] = None,
+    handle: Optional[str] = None,
 ) -> InterviewStateResponse:
     """Create an interview state response.
 
@@ -163,16 +192,18 @@ def create_state_response(
         key: The encryption key.
         content: The result content.
         update_url: The update URL.
+        handle: Return this handle to a stored state instead of the encrypted
+            state, if the state is not complete.
 
     Returns:
         The response body.
     """
     res: InterviewStateResponse
 
-    state_str = state.encrypt(key=key)
     if state.complete:
+        # the target service needs the full state
         res = CompleteInterviewStateResponse(
-            state=state_str,
+            state=state.encrypt(key=key),
             complete=True,
             target_url=state.target_url,
         )
@@ -180,7 +211,7 @@ def create_state_response(
         if not update_url:
             raise ValueError("`update_url` is required")
         res = IncompleteInterviewStateResponse(
-            state=state_str,
+            state=handle if handle is not None else state.encrypt(key=key),
             update_url=update_url,
             content=content,
         )
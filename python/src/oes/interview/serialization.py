@@ -1,9 +1,9 @@
-from collections.abc import Sequence
+from collections.abc import Callable, Iterable, Iterator, Sequence
 from datetime import date
 from typing import Any, Optional, Tuple, Union, get_args, get_origin
 
 from attrs import Attribute, fields
-from cattrs import override
+from cattrs import Converter, override
 from cattrs.gen import make_dict_structure_fn, make_dict_unstructure_fn
 from cattrs.preconf.orjson import make_converter
 from oes.hook import ExecutableHookConfig, PythonHookConfig
@@ -17,11 +17,17 @@ from oes.interview.config.interview import (
     Interview,
     InterviewEntry,
     InterviewQuestion,
+    get_config_digest,
     parse_interview_entry,
     parse_question_entry,
 )
 from oes.interview.config.question import Question
-from oes.interview.config.step import StepOrBlock, StepResult, URLOnlyHttpHookConfig
+from oes.interview.config.step import (
+    HookResult,
+    StepOrBlock,
+    StepResult,
+    URLOnlyHttpHookConfig,
+)
 from oes.interview.config.step import Value as StepValue
 from oes.interview.config.step import (
     ValueOrExpression,
@@ -32,7 +38,16 @@ from oes.interview.config.step import (
     parse_value,
 )
 from oes.interview.parsing.location import Location
-from oes.interview.response import Result, parse_result_type
+from oes.interview.response import (
+    AskResult,
+    AskResultButton,
+    CompleteInterviewStateResponse,
+    ExitResult,
+    IncompleteInterviewStateResponse,
+    Result,
+    parse_result_type,
+)
+from oes.interview.state import InterviewState, state_converter
 from oes.template import (
     Condition,
     Expression,
@@ -48,12 +63,15 @@ converter = make_converter()
 # Basic types
 
 
-# Any attrs classes should omit None if it is the default
+# Any attrs classes should omit None if it is the default, and omit fields that are
+# not passed to __init__
 def make_unstructure_omitting_none(cls: Any):
     args = {}
     field: Attribute
     for field in fields(cls):
-        if field.default is None:
+        if not field.init:
+            args[field.name] = override(omit=True)
+        elif field.default is None:
             args[field.name] = override(omit_if_default=True)
 
     return make_dict_unstructure_fn(cls, converter, **args)
@@ -204,15 +222,27 @@ converter.register_structure_hook(
 
 # Interviews
 
-converter.register_structure_hook(
+_structure_interview = make_dict_structure_fn(
     Interview,
-    make_dict_structure_fn(
-        Interview,
-        converter,
-        question_bank=override(omit=True),
-        flattened_steps=override(omit=True),
-    ),
+    converter,
+    question_bank=override(omit=True),
+    _flattened=override(omit=True),
+    flattened_steps=override(omit=True),
+    block_ranges=override(omit=True),
+    _plan=override(omit=True),
+    _dependency_graph=override(omit=True),
+    _digest=override(omit=True),
 )
+
+
+# remember a digest of the config the interview was loaded from
+def structure_interview(v, t):
+    interview = _structure_interview(v, t)
+    object.__setattr__(interview, "_digest", get_config_digest(v))
+    return interview
+
+
+converter.register_structure_hook(Interview, structure_interview)
 converter.register_structure_hook(
     InterviewQuestion, lambda v, t: parse_question_entry(converter, v)
 )
@@ -224,3 +254,60 @@ converter.register_structure_hook(
 converter.register_structure_hook(
     Optional[Result], lambda v, t: parse_result_type(converter, v)
 )
+
+
+# Warm-up
+
+_STRUCTURED_TYPES = (HookResult, InterviewState)
+_UNSTRUCTURED_TYPES = (
+    InterviewState,
+    IncompleteInterviewStateResponse,
+    CompleteInterviewStateResponse,
+    AskResult,
+    AskResultButton,
+    ExitResult,
+)
+
+
+def _get_subclasses(cls: type) -> Iterator[type]:
+    for subclass in cls.__subclasses__():
+        yield subclass
+        yield from _get_subclasses(subclass)
+
+
+def _get_hook_getters(c: Converter) -> tuple[Callable, Callable]:
+    # cattrs 24.1 added public methods, older versions only have the dispatchers
+    if hasattr(c, "get_structure_hook"):
+        return c.get_structure_hook, c.get_unstructure_hook
+    return c._structure_func.dispatch, c._unstructure_func.dispatch
+
+
+def _generate_hooks(c: Converter, structure: Iterable[Any], unstructure: Iterable[Any]):
+    # getting a hook generates it for the type and caches it
+    get_structure_hook, get_unstructure_hook = _get_hook_getters(c)
+    for cls in structure:
+        get_structure_hook(cls)
+    for cls in unstructure:
+        get_unstructure_hook(cls)
+
+
+def warm_up_converters(interviews: Iterable[Interview] = ()):
+    """Generate the converter hooks used when handling requests.
+
+    cattrs generates the hooks for attrs classes on first use, which otherwise makes
+    the first requests slow.
+
+    Args:
+        interviews: Also generate the hooks for these interviews' responses.
+    """
+    response_classes = [
+        question.response_class
+        for interview in interviews
+        for question in interview.question_bank
+    ]
+    _generate_hooks(
+        converter,
+        (*_STRUCTURED_TYPES, *response_classes),
+        (*_UNSTRUCTURED_TYPES, *_get_subclasses(AskField), *response_classes),
+    )
+    _generate_hooks(state_converter, (InterviewState,), (InterviewState,))
@@ -1,16 +1,25 @@
 """Server application."""
+import time
 from ipaddress import IPv4Network, IPv6Network
+from typing import Optional
 
 from blacksheep import Application
 from blacksheep.server.openapi.v3 import OpenAPIHandler
 from blacksheep.server.remotes.forwarding import XForwardedHeadersMiddleware
 from httpx import AsyncClient
+from loguru import logger
 from oes.interview.config.interview import (
     InterviewConfig,
     interviews_context,
     load_interview_config,
 )
-from oes.interview.server.settings import load_settings
+from oes.interview.dictionary import StateDictionaries, state_dictionaries_context
+from oes.interview.serialization import warm_up_converters
+from oes.interview.server.cache import ResponseCache, StateCache
+from oes.interview.server.metrics import InterviewMetrics
+from oes.interview.server.profiling import ProfileBuffer
+from oes.interview.server.settings import Settings, load_settings
+from oes.interview.store import MemoryStateStore, SQLiteStateStore, StateStore
 from openapidocs.v3 import Info
 
 app = Application()
@@ -61,15 +70,53 @@ async def on_start(app: Application):
     interviews = load_interview_config(settings.config_file)
     app.services.add_instance(interviews)
 
+    start = time.perf_counter()
+    warm_up_converters(interviews)
+    logger.info(
+        f"Warmed up converters in {(time.perf_counter() - start) * 1000:.1f} ms"
+    )
+
     app.services.add_instance(AsyncClient())
+    app.services.add_instance(InterviewMetrics())
+    app.services.add_instance(ProfileBuffer(settings.profile_buffer_size))
+
+    dictionaries = (
+        StateDictionaries.load(settings.state_dictionary_dir)
+        if settings.state_dictionary_dir is not None
+        else StateDictionaries()
+    )
+    app.services.add_instance(dictionaries)
+
+    app.services.add_instance(
+        StateCache(settings.state_cache_size, settings.state_cache_ttl)
+    )
+    app.services.add_instance(
+        ResponseCache(settings.response_cache_size, settings.response_cache_ttl)
+    )
+
+    store = _make_state_store(settings)
+    if store is not None:
+        app.services.add_instance(store, StateStore)
+
+
+def _make_state_store(settings: Settings) -> Optional[StateStore]:
+    if settings.state_store == "memory":
+        return MemoryStateStore(settings.state_store_size)
+    elif settings.state_store == "sqlite":
+        return SQLiteStateStore(settings.state_store_path)
+    else:
+        return None
 
 
 async def context_middleware(request, handler):
     interviews = app.service_provider[InterviewConfig]
+    dictionaries = app.service_provider[StateDictionaries]
     token = interviews_context.set(interviews)
+    dictionaries_token = state_dictionaries_context.set(dictionaries)
     try:
         return await handler(request)
     finally:
+        state_dictionaries_context.reset(dictionaries_token)
         interviews_context.reset(token)
 
 
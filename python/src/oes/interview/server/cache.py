@@ -0,0 +1,205 @@
+"""Server caches."""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from typing import Optional
+
+from attrs import Factory, define, frozen
+from blacksheep import Content, Response
+from oes.interview.state import InterviewState
+
+
+def _get_key(token: str) -> bytes:
+    return hashlib.blake2b(token.encode(), digest_size=16).digest()
+
+
+@define
+class StateCache:
+    """Caches validated states by a hash of their token.
+
+    Lets retried and duplicate requests skip decrypting the same token again. The
+    states are immutable, so the cached instances are shared.
+    """
+
+    max_size: int = 1000
+    """The maximum number of states, ``0`` to disable the cache."""
+
+    ttl: float = 60.0
+    """How long to keep a state, in seconds."""
+
+    _entries: OrderedDict[bytes, tuple[InterviewState, float]] = Factory(OrderedDict)
+    _lock: threading.Lock = Factory(threading.Lock)
+
+    @property
+    def enabled(self) -> bool:
+        """Whether the cache stores states."""
+        return self.max_size > 0
+
+    def get(self, token: str) -> Optional[InterviewState]:
+        """Get the state for a token.
+
+        Returns:
+            The state, or ``None`` if it is not cached, or is older than the TTL or
+            expired.
+        """
+        if not self.enabled:
+            return None
+
+        key = _get_key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            state, added = entry
+            if time.monotonic() - added >= self.ttl or state.get_is_expired():
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return state
+
+    def put(self, token: str, state: InterviewState):
+        """Cache the validated state for a token."""
+        if not self.enabled:
+            return
+
+        key = _get_key(token)
+        with self._lock:
+            self._entries[key] = (state, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+@frozen
+class CachedResponse:
+    """A serialized update response."""
+
+    body: bytes
+    """The response body."""
+
+    interview_id: str
+    """The ID of the interview."""
+
+    status: int = 200
+    """The response status."""
+
+    headers: tuple[tuple[bytes, bytes], ...] = ()
+    """The response headers, like ``Server-Timing``."""
+
+    content_type: bytes = b"application/json"
+    """The content type of the body."""
+
+    @classmethod
+    def from_response(cls, response: Response, interview_id: str) -> CachedResponse:
+        """Create a :class:`CachedResponse` from a response with a body."""
+        assert response.content is not None and response.content.body is not None
+        return cls(
+            response.content.body,
+            interview_id,
+            response.status,
+            tuple(response.headers.items()),
+            response.content.type,
+        )
+
+    def to_response(self) -> Response:
+        """Create a new response with the same status, headers and body."""
+        return Response(
+            self.status, list(self.headers), Content(self.content_type, self.body)
+        )
+
+
+@define
+class ResponseCache:
+    """Caches update responses by a digest of the request.
+
+    Duplicate requests get the earlier response instead of advancing the state again,
+    and concurrent duplicates wait for the first one. Only used from the event loop.
+    """
+
+    max_size: int = 1000
+    """The maximum number of responses, ``0`` to disable the cache."""
+
+    ttl: float = 30.0
+    """How long to keep a response, in seconds."""
+
+    _entries: OrderedDict[bytes, tuple[CachedResponse, float]] = Factory(OrderedDict)
+    _pending: dict[bytes, asyncio.Future[CachedResponse]] = Factory(dict)
+
+    @property
+    def enabled(self) -> bool:
+        """Whether the cache stores responses."""
+        return self.max_size > 0
+
+    async def get_or_create(
+        self, key: bytes, func: Callable[[], Awaitable[CachedResponse]]
+    ) -> tuple[CachedResponse, bool]:
+        """Get the response for a request, or create it with ``func``.
+
+        If the same request is already being handled, waits for its response. Errors
+        are passed to the waiting requests, but not cached.
+
+        Returns:
+            A pair of the response and whether it is a response to an earlier request.
+        """
+        cached = self._get(key)
+        if cached is not None:
+            return cached, True
+
+        pending = self._pending.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending), True
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending[key] = future
+        try:
+            result = await func()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # mark it retrieved if nothing is waiting
+            raise
+        finally:
+            del self._pending[key]
+
+        future.set_result(result)
+        self._put(key, result)
+        return result, False
+
+    def _get(self, key: bytes) -> Optional[CachedResponse]:
+        if not self.enabled:
+            return None
+
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        response, added = entry
+        if time.monotonic() - added >= self.ttl:
+            del self._entries[key]
+            return None
+
+        return response
+
+    def _put(self, key: bytes, response: CachedResponse):
+        if not self.enabled:
+            return
+
+        self._entries[key] = (response, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
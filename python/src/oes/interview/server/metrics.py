@@ -0,0 +1,255 @@
+"""Server metrics."""
+from __future__ import annotations
+
+import math
+from bisect import bisect_left
+from collections.abc import Iterator, Sequence
+from typing import Optional, Union
+
+from attrs import Factory, define, field
+from oes.interview.config.step import Hook
+from oes.interview.observer import TimingObserver
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+"""The content type of the Prometheus text format."""
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+"""The default histogram buckets, in seconds."""
+
+COUNT_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+"""Histogram buckets for numbers of passes and steps."""
+
+SIZE_BUCKETS = tuple(float(1 << n) for n in range(8, 22, 2))
+"""Histogram buckets for state token sizes, in bytes."""
+
+Labels = tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values))
+    return f"{{{pairs}}}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+@define
+class Counter:
+    """A counter, with a value for each combination of label values."""
+
+    name: str
+    help: str
+    label_names: Labels = ()
+    _values: dict[Labels, float] = Factory(dict)
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        """Increase the counter for the label values."""
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def get(self, *labels: str) -> float:
+        """Get the value for the label values."""
+        return self._values.get(labels, 0.0)
+
+    def collect(self) -> Iterator[str]:
+        """Yield the lines of the text format."""
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        for labels, value in sorted(self._values.items()):
+            label_str = _format_labels(self.label_names, labels)
+            yield f"{self.name}{label_str} {_format_value(value)}"
+
+
+@define
+class _HistogramValue:
+    counts: list[int]
+    sum: float = 0.0
+    count: int = 0
+
+
+@define
+class Histogram:
+    """A histogram, with a value for each combination of label values."""
+
+    name: str
+    help: str
+    label_names: Labels = ()
+    buckets: Sequence[float] = field(default=DEFAULT_BUCKETS, converter=tuple)
+    _values: dict[Labels, _HistogramValue] = Factory(dict)
+
+    def observe(self, value: float, *labels: str):
+        """Record a value for the label values."""
+        entry = self._values.get(labels)
+        if entry is None:
+            entry = _HistogramValue([0] * len(self.buckets))
+            self._values[labels] = entry
+
+        index = bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            entry.counts[index] += 1
+        entry.sum += value
+        entry.count += 1
+
+    def get_count(self, *labels: str) -> int:
+        """Get the number of values recorded for the label values."""
+        entry = self._values.get(labels)
+        return entry.count if entry is not None else 0
+
+    def collect(self) -> Iterator[str]:
+        """Yield the lines of the text format."""
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        names = (*self.label_names, "le")
+        for labels, entry in sorted(self._values.items(), key=lambda i: i[0]):
+            total = 0
+            for bound, count in zip(self.buckets, entry.counts):
+                total += count
+                label_str = _format_labels(names, (*labels, _format_value(bound)))
+                yield f"{self.name}_bucket{label_str} {total}"
+            label_str = _format_labels(names, (*labels, "+Inf"))
+            yield f"{self.name}_bucket{label_str} {entry.count}"
+
+            label_str = _format_labels(self.label_names, labels)
+            yield f"{self.name}_sum{label_str} {_format_value(entry.sum)}"
+            yield f"{self.name}_count{label_str} {entry.count}"
+
+
+Metric = Union[Counter, Histogram]
+
+
+@define
+class MetricsRegistry:
+    """An in-process registry of metrics.
+
+    Metrics are updated from the event loop thread, so no locking is done.
+    """
+
+    metrics: list[Metric] = Factory(list)
+
+    def counter(self, name: str, help: str, label_names: Labels = ()) -> Counter:
+        """Create and register a :class:`Counter`."""
+        counter = Counter(name, help, label_names)
+        self.metrics.append(counter)
+        return counter
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        label_names: Labels = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        """Create and register a :class:`Histogram`."""
+        histogram = Histogram(name, help, label_names, buckets)
+        self.metrics.append(histogram)
+        return histogram
+
+    def render(self) -> str:
+        """Render all the metrics in the Prometheus text format."""
+        return "".join(f"{line}\n" for m in self.metrics for line in m.collect())
+
+
+def _counter(name: str, help: str, *label_names: str):
+    return Factory(
+        lambda self: self.registry.counter(name, help, label_names), takes_self=True
+    )
+
+
+def _histogram(
+    name: str,
+    help: str,
+    *label_names: str,
+    buckets: Sequence[float] = DEFAULT_BUCKETS,
+):
+    return Factory(
+        lambda self: self.registry.histogram(name, help, label_names, buckets),
+        takes_self=True,
+    )
+
+
+@define
+class InterviewMetrics:
+    """The metrics of the interview service."""
+
+    registry: MetricsRegistry = Factory(MetricsRegistry)
+
+    update_seconds: Histogram = _histogram(
+        "oes_interview_update_seconds",
+        "Time to handle an update request.",
+        "interview_id",
+    )
+    responses: Counter = _counter(
+        "oes_interview_update_responses_total",
+        "Update responses by status code.",
+        "status",
+    )
+    passes: Histogram = _histogram(
+        "oes_interview_advance_passes",
+        "Passes through the steps per advance.",
+        "interview_id",
+        buckets=COUNT_BUCKETS,
+    )
+    steps: Histogram = _histogram(
+        "oes_interview_advance_steps",
+        "Steps handled per advance.",
+        "interview_id",
+        buckets=COUNT_BUCKETS,
+    )
+    hook_seconds: Histogram = _histogram(
+        "oes_interview_hook_seconds", "Time to invoke a hook.", "hook"
+    )
+    hook_failures: Counter = _counter(
+        "oes_interview_hook_failures_total", "Hooks that raised an exception.", "hook"
+    )
+    token_bytes: Histogram = _histogram(
+        "oes_interview_state_token_bytes",
+        "Size of the encrypted state tokens returned.",
+        buckets=SIZE_BUCKETS,
+    )
+    crypto_seconds: Histogram = _histogram(
+        "oes_interview_state_crypto_seconds",
+        "Time to encrypt or decrypt a state.",
+        "operation",
+    )
+    state_cache: Counter = _counter(
+        "oes_interview_state_cache_total",
+        "Decrypted state cache lookups by result.",
+        "result",
+    )
+    replays: Counter = _counter(
+        "oes_interview_update_replays_total",
+        "Duplicate update requests answered with an earlier response.",
+    )
+
+    def record_advance(self, interview_id: str, observer: TimingObserver):
+        """Record the passes and steps counted by ``observer``."""
+        self.passes.observe(observer.counts.get("pass", 0), interview_id)
+        self.steps.observe(observer.counts.get("step", 0), interview_id)
+
+
+@define
+class MetricsObserver(TimingObserver):
+    """A :class:`TimingObserver` that also records hook metrics."""
+
+    metrics: Optional[InterviewMetrics] = None
+
+    def on_hook(
+        self,
+        hook: Hook,
+        error: Optional[BaseException],
+        start: float,
+        duration: float,
+    ):
+        super().on_hook(hook, error, start, duration)
+        if self.metrics is not None:
+            self.metrics.hook_seconds.observe(duration, hook.name)
+            if error is not None:
+                self.metrics.hook_failures.inc(hook.name)
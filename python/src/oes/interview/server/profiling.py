@@ -0,0 +1,156 @@
+"""Request profiling.
+
+Profiles are taken with :mod:`cProfile`, which records everything that runs on the
+thread. Updates await I/O, so a profile also includes any other requests the event
+loop ran while the profiled update was in progress.
+"""
+from __future__ import annotations
+
+import cProfile
+import hmac
+import io
+import marshal
+import pstats
+import secrets
+from collections import deque
+from datetime import datetime, timezone
+from typing import Optional
+
+from attrs import Factory, define, frozen
+
+ADMIN_KEY_HEADER = b"X-Admin-Key"
+"""The header with the admin key."""
+
+PROFILE_HEADER = b"X-Profile"
+"""The header requesting that an update be profiled."""
+
+PROFILE_ID_HEADER = b"X-Profile-Id"
+"""The header with the ID of a saved profile."""
+
+
+def check_admin_key(admin_key: Optional[str], value: Optional[bytes]) -> bool:
+    """Check a request's admin key header value against the configured key.
+
+    Always ``False`` if no admin key is configured.
+    """
+    if not admin_key or value is None:
+        return False
+    return hmac.compare_digest(admin_key.encode(), value)
+
+
+@frozen
+class ProfileRecord:
+    """A saved profile of a request.
+
+    The stats include the work of any requests that ran concurrently.
+    """
+
+    id: str
+    interview_id: str
+    date: datetime
+    duration: float
+    stats: bytes
+    """The stats in the :mod:`marshal` format of :meth:`cProfile.Profile.dump_stats`,
+    for loading with :mod:`pstats` or other profile viewers."""
+
+    text: str
+    """The stats as text, sorted by cumulative time."""
+
+    def get_summary(self) -> dict[str, object]:
+        """Get the fields besides the stats."""
+        return {
+            "id": self.id,
+            "interview_id": self.interview_id,
+            "date": self.date.isoformat(),
+            "duration": self.duration,
+        }
+
+
+def _format_stats(profile: cProfile.Profile, limit: int) -> str:
+    stream = io.StringIO()
+    stats = pstats.Stats(profile, stream=stream)
+    stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(limit)
+    return stream.getvalue()
+
+
+@define
+class ProfileBuffer:
+    """Profiles requests and keeps the most recent profiles.
+
+    Only one request is profiled at a time. Requested profiles take priority, a
+    requested profile replaces a sampled one, which is then discarded. The profiler is
+    enabled for the thread, so a profile also includes any other requests the event
+    loop runs concurrently.
+    """
+
+    size: int = 20
+    """The maximum number of profiles to keep."""
+
+    limit: int = 50
+    """The number of functions in the text stats."""
+
+    _records: deque[ProfileRecord] = Factory(
+        lambda self: deque(maxlen=self.size), takes_self=True
+    )
+    _active: Optional[cProfile.Profile] = None
+    _active_requested: bool = False
+
+    @property
+    def records(self) -> list[ProfileRecord]:
+        """The saved profiles, most recent first."""
+        return list(reversed(self._records))
+
+    def get(self, id: str) -> Optional[ProfileRecord]:
+        """Get a saved profile by ID."""
+        return next((r for r in self._records if r.id == id), None)
+
+    def start(self, requested: bool = True) -> Optional[cProfile.Profile]:
+        """Start profiling.
+
+        Args:
+            requested: Whether the profile was requested, rather than sampled.
+                Requested profiles replace a sampled profile that is in progress.
+
+        Returns:
+            The enabled profiler, or ``None`` if another request is being profiled.
+        """
+        if self._active is not None:
+            if not requested or self._active_requested:
+                return None
+            self._active.disable()
+
+        profile = cProfile.Profile()
+        self._active = profile
+        self._active_requested = requested
+        profile.enable()
+        return profile
+
+    def stop(self, profile: cProfile.Profile) -> bool:
+        """Stop a profiler returned by :meth:`start`.
+
+        Returns:
+            Whether the profile is complete, ``False`` if it was replaced by a
+            requested profile.
+        """
+        profile.disable()
+        if self._active is not profile:
+            return False
+        self._active = None
+        self._active_requested = False
+        return True
+
+    def save(
+        self, profile: cProfile.Profile, interview_id: str, duration: float
+    ) -> ProfileRecord:
+        """Save a stopped profile, discarding the oldest one if the buffer is full."""
+        profile.create_stats()
+        record = ProfileRecord(
+            id=secrets.token_hex(8),
+            interview_id=interview_id,
+            date=datetime.now(tz=timezone.utc),
+            duration=duration,
+            stats=marshal.dumps(profile.stats),  # type: ignore
+            text=_format_stats(profile, self.limit),
+        )
+        self._records.append(record)
+        return record
@@ -1,6 +1,7 @@
 """Server settings."""
 import base64
 from pathlib import Path
+from typing import Literal, Optional
 
 import typed_settings as ts
 from attrs import Factory
@@ -18,6 +19,30 @@ def _load_key_file(settings):
 class Settings:
     encryption_key_file: Path = Path("encryption_key")
     config_file: Path = Path("interviews.yml")
+    resume_steps: bool = False
+    resume_cursor: bool = False
+    compiled_steps: bool = False
+    max_batch_size: int = 1000
+    batch_concurrency: int = 100
+    hook_concurrency: int = 10
+    max_undefined_depth: int = 50
+    max_passes: Optional[int] = None
+    max_advance_seconds: Optional[float] = 10.0
+    server_timing: bool = False
+    slow_update_seconds: float = 1.0
+    metrics: bool = False
+    admin_key: Optional[str] = ts.secret(default=None)
+    profile_updates: bool = False
+    profile_sample_rate: float = 0.01
+    profile_buffer_size: int = 20
+    state_dictionary_dir: Optional[Path] = None
+    state_store: Optional[Literal["memory", "sqlite"]] = None
+    state_store_size: int = 10000
+    state_store_path: Path = Path("states.db")
+    state_cache_size: int = 1000
+    state_cache_ttl: float = 60.0
+    response_cache_size: int = 1000
+    response_cache_ttl: float = 30.0
     encryption_key: ts.Secret[bytes] = ts.secret(
         init=False, eq=False, default=Factory(_load_key_file, takes_self=True)
     )
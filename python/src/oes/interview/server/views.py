@@ -1,13 +1,28 @@
 """The update view."""
 from __future__ import annotations
 
+import cProfile
+import hashlib
+import random
+import time
 from builtins import bool
-from collections.abc import Callable
+from collections.abc import AsyncIterator, Callable, Iterator
+from contextlib import contextmanager, nullcontext
+from contextvars import Context, ContextVar, copy_context
 from dataclasses import dataclass
-from typing import Any, Awaitable, Optional
+from typing import Any, Awaitable, Optional, Union
 
+import orjson
 from attrs import frozen
-from blacksheep import FromJSON, HTTPException, Request
+from blacksheep import (
+    Content,
+    FromJSON,
+    HTTPException,
+    Request,
+    Response,
+    StreamedContent,
+    json,
+)
 from blacksheep.messages import get_absolute_url_to_path
 from blacksheep.server.openapi.common import (
     ContentInfo,
@@ -16,16 +31,55 @@ from blacksheep.server.openapi.common import (
     ResponseInfo,
 )
 from cattrs import BaseValidationError
+from cattrs.gen import make_dict_structure_fn
 from httpx import AsyncClient
+from loguru import logger
 from oes.hook import HttpHookConfig
-from oes.interview.config.interview import InterviewConfig
+from oes.interview.config.interview import (
+    Interview,
+    InterviewConfig,
+    interviews_context,
+)
 from oes.interview.config.step import HookResult, StepResult, StepResultStatus
-from oes.interview.process import advance_interview_state
+from oes.interview.dictionary import state_dictionaries_context
+from oes.interview.observer import TimingObserver
+from oes.interview.process import (
+    AdvanceRequest,
+    InterviewError,
+    advance_interview_state,
+    advance_interview_states,
+)
 from oes.interview.response import create_state_response
 from oes.interview.serialization import converter
 from oes.interview.server.app import app, docs
+from oes.interview.server.cache import CachedResponse, ResponseCache, StateCache
+from oes.interview.server.metrics import CONTENT_TYPE, InterviewMetrics, MetricsObserver
+from oes.interview.server.profiling import (
+    ADMIN_KEY_HEADER,
+    PROFILE_HEADER,
+    PROFILE_ID_HEADER,
+    ProfileBuffer,
+    ProfileRecord,
+    check_admin_key,
+)
 from oes.interview.server.settings import Settings
-from oes.interview.state import InterviewState, InvalidStateError
+from oes.interview.state import InterviewState, InvalidStateError, get_validated_state
+from oes.interview.store import (
+    StateStore,
+    decrypt_stored_state,
+    encrypt_stored_state,
+    get_stored_state,
+    is_state_handle,
+    put_stored_state,
+)
+from oes.template import jinja2_env_context
+
+_BATCH_CONTEXT_VARS: tuple[ContextVar[Any], ...] = (
+    interviews_context,
+    state_dictionaries_context,
+    jinja2_env_context,
+)
+"""Context vars the batch results are advanced with."""
 
 
 @frozen
@@ -34,17 +88,18 @@ class InterviewStateRequest:
     responses: Optional[dict[str, Any]] = None
     button: Optional[int] = None
 
-    def get_validated_state(self, *, key: bytes) -> InterviewState:
-        verified = InterviewState.decrypt(self.state, key=key)
-        verified.validate()
-        return verified
-
     @classmethod
     def parse(cls, data: dict[str, Any]) -> InterviewStateRequest:
         request_body = converter.structure(data, InterviewStateRequest)
         return request_body
 
 
+converter.register_structure_hook(
+    InterviewStateRequest,
+    make_dict_structure_fn(InterviewStateRequest, converter),
+)
+
+
 @dataclass
 class ExampleInterviewStateResponse:
     state: str
@@ -110,6 +165,9 @@ _request_example = {
         ),
         409: ResponseInfo("The state is expired."),
         422: ResponseInfo("The submitted values are invalid."),
+        500: ResponseInfo(
+            "The interview could not be advanced, e.g. because it does not settle."
+        ),
     },
 )
 @app.router.post(
@@ -121,21 +179,239 @@ async def update_interview_state(
     interview_config: InterviewConfig,
     settings: Settings,
     client: AsyncClient,
+    metrics: InterviewMetrics,
+    profiles: ProfileBuffer,
 ):
     """Update an interview state.
 
     Validates the state, applies the responses, and returns a new state and content.
     """
+    requested = _is_profile_requested(request, settings)
+    profile = None
+    start = time.perf_counter()
+    try:
+        profile = _start_profile(settings, profiles, requested)
+        response, interview_id = await _get_update_response(
+            request, body.value, interview_config, settings, client, metrics, requested
+        )
+    except HTTPException as e:
+        metrics.responses.inc(str(e.status))
+        raise
+    finally:
+        # a sampled profile is incomplete if a requested one replaced it
+        profiled = profile is not None and profiles.stop(profile)
+
+    duration = time.perf_counter() - start
+    metrics.responses.inc("200")
+    metrics.update_seconds.observe(duration, interview_id)
+
+    if not profiled:
+        return response
+
+    return _save_profile(
+        settings, profiles, profile, requested, response, interview_id, duration
+    )
+
+
+async def _get_update_response(
+    request: Request,
+    body: Any,
+    interview_config: InterviewConfig,
+    settings: Settings,
+    client: AsyncClient,
+    metrics: InterviewMetrics,
+    profile_requested: bool,
+) -> tuple[Union[dict[str, Any], Response], str]:
+    # requested profiles always run the update
+    cache = app.service_provider[ResponseCache]
+    key = _get_request_key(request, body) if cache.enabled else None
+    if key is None or profile_requested:
+        return await _update_interview_state(
+            request, body, interview_config, settings, client, metrics
+        )
+
+    async def create() -> CachedResponse:
+        data, interview_id = await _update_interview_state(
+            request, body, interview_config, settings, client, metrics
+        )
+        response = data if isinstance(data, Response) else json(data)
+        return CachedResponse.from_response(response, interview_id)
+
+    cached, replayed = await cache.get_or_create(key, create)
+    if replayed:
+        metrics.replays.inc()
+    return cached.to_response(), cached.interview_id
+
+
+def _get_request_key(request: Request, body: Any) -> Optional[bytes]:
+    # the update URL is part of the response
+    update_url = get_absolute_url_to_path(request, "/update").value
+    try:
+        data = orjson.dumps(body, option=orjson.OPT_SORT_KEYS)
+    except TypeError:
+        return None  # e.g. integers orjson does not support, not cached
+    return hashlib.blake2b(
+        data + b"\0" + update_url, digest_size=16, person=b"update-request"
+    ).digest()
+
+
+async def _update_interview_state(
+    request: Request,
+    body: Any,
+    interview_config: InterviewConfig,
+    settings: Settings,
+    client: AsyncClient,
+    metrics: InterviewMetrics,
+) -> tuple[Union[dict[str, Any], Response], str]:
+    advance_request, interview = await _parse_update_request(
+        body, interview_config, settings, metrics
+    )
+    observer = _make_observer(settings, metrics)
 
     try:
-        update_request = InterviewStateRequest.parse(body.value)
+        state, result = await advance_interview_state(
+            advance_request.state,
+            interview.question_bank,
+            advance_request.responses,
+            advance_request.button,
+            _make_http_func(client),
+            observer=observer,
+            **_get_advance_options(settings),
+        )
+    except BaseValidationError:
+        raise HTTPException(422, "Invalid response values")
+    except InterviewError as e:
+        raise _get_interview_error(interview.id, e)
+
+    data = await _make_response(request, settings, state, result, metrics)
+    if observer is None:
+        return data, interview.id
+
+    metrics.record_advance(interview.id, observer)
+    _log_timing(settings, state, observer)
+    if not settings.server_timing:
+        return data, interview.id
+
+    response = json(data)
+    response.add_header(b"Server-Timing", _get_server_timing(observer).encode())
+    return response, interview.id
+
+
+@app.router.get("/metrics")
+async def get_metrics(settings: Settings, metrics: InterviewMetrics):
+    """Get the service metrics in the Prometheus text format."""
+    if not settings.metrics:
+        raise HTTPException(404, "Not found")
+
+    return Response(
+        200,
+        None,
+        Content(CONTENT_TYPE.encode(), metrics.registry.render().encode()),
+    )
+
+
+@app.router.get("/admin/profiles")
+async def list_profiles(request: Request, settings: Settings, profiles: ProfileBuffer):
+    """List the saved update profiles, most recent first."""
+    _check_admin_key(request, settings)
+    return json([record.get_summary() for record in profiles.records])
+
+
+@app.router.get("/admin/profiles/{profile_id}")
+async def get_profile(
+    request: Request, profile_id: str, settings: Settings, profiles: ProfileBuffer
+):
+    """Get a saved update profile as text."""
+    _check_admin_key(request, settings)
+    record = _get_profile_record(profiles, profile_id)
+    return Response(
+        200, None, Content(b"text/plain; charset=utf-8", record.text.encode())
+    )
+
+
+@app.router.get("/admin/profiles/{profile_id}/stats")
+async def get_profile_stats(
+    request: Request, profile_id: str, settings: Settings, profiles: ProfileBuffer
+):
+    """Get a saved update profile in the :mod:`pstats` file format."""
+    _check_admin_key(request, settings)
+    record = _get_profile_record(profiles, profile_id)
+    return Response(200, None, Content(b"application/octet-stream", record.stats))
+
+
+@docs(
+    request_body=RequestBodyInfo(
+        examples={
+            "update": [_request_example],
+        }
+    ),
+    responses={
+        200: ResponseInfo(
+            "Newline delimited JSON, with an InterviewStateResponse or an error "
+            "object for each request, in order."
+        ),
+        413: ResponseInfo("There are too many states in the batch."),
+    },
+)
+@app.router.post(
+    "/update-batch",
+)
+async def update_interview_states(
+    request: Request,
+    body: FromJSON[list[dict[str, Any]]],
+    interview_config: InterviewConfig,
+    settings: Settings,
+    client: AsyncClient,
+    metrics: InterviewMetrics,
+):
+    """Update many interview states.
+
+    Each item is handled like a request to ``/update``. The results are streamed as
+    newline delimited JSON in the same order as the requests. Items that fail have an
+    ``error`` object with the status code and detail instead.
+    """
+    if len(body.value) > settings.max_batch_size:
+        raise HTTPException(413, f"At most {settings.max_batch_size} states per batch")
+
+    items = await _parse_batch_items(body.value, interview_config, settings, metrics)
+    results = advance_interview_states(
+        [item for item in items if isinstance(item, AdvanceRequest)],
+        _make_http_func(client),
+        concurrency=settings.batch_concurrency,
+        hook_concurrency=settings.hook_concurrency,
+        **_get_advance_options(settings),
+    )
+
+    # the results are streamed after the middleware resets the context vars
+    context = copy_context()
+
+    async def write_results():
+        # closing the results cancels the remaining advances if the client disconnects
+        try:
+            with _set_batch_context(context):
+                for item in items:
+                    res = await _next_batch_result(item, results)
+                    result = await _get_batch_result(request, settings, res, metrics)
+                    yield orjson.dumps(result) + b"\n"
+        finally:
+            await results.aclose()
+
+    return Response(200, None, StreamedContent(b"application/x-ndjson", write_results))
+
+
+async def _parse_update_request(
+    body: Any,
+    interview_config: InterviewConfig,
+    settings: Settings,
+    metrics: InterviewMetrics,
+) -> tuple[AdvanceRequest, Interview]:
+    try:
+        update_request = InterviewStateRequest.parse(body)
     except BaseValidationError:
         raise HTTPException(422, "Invalid request")
 
     try:
-        state = update_request.get_validated_state(
-            key=settings.encryption_key.get_secret_value()
-        )
+        state = await _get_validated_state(update_request, settings, metrics)
     except BaseValidationError:
         raise HTTPException(422, "Invalid request")
     except InvalidStateError:
@@ -146,29 +422,284 @@ async def update_interview_state(
     if not interview:
         raise HTTPException(422, "Interview not found")
 
+    advance_request = AdvanceRequest(
+        state, update_request.responses, update_request.button
+    )
+    return advance_request, interview
+
+
+async def _get_validated_state(
+    update_request: InterviewStateRequest,
+    settings: Settings,
+    metrics: InterviewMetrics,
+) -> InterviewState:
+    cache = app.service_provider[StateCache]
+    state = cache.get(update_request.state)
+    if state is not None:
+        metrics.state_cache.inc("hit")
+        return state
+    elif cache.enabled:
+        metrics.state_cache.inc("miss")
+
+    key = settings.encryption_key.get_secret_value()
+    token = update_request.state
+    if is_state_handle(token):
+        data = await get_stored_state(_get_state_store(), token, key=key)
+        with _time_crypto(settings, metrics, "decrypt"):
+            state = decrypt_stored_state(data, key=key)
+        state.validate()
+    else:
+        with _time_crypto(settings, metrics, "decrypt"):
+            state = get_validated_state(token, key=key)
+
+    cache.put(token, state)
+    return state
+
+
+async def _parse_batch_items(
+    body: list[Any],
+    interview_config: InterviewConfig,
+    settings: Settings,
+    metrics: InterviewMetrics,
+) -> list[Union[AdvanceRequest, HTTPException]]:
+    items: list[Union[AdvanceRequest, HTTPException]] = []
+    for item in body:
+        try:
+            advance_request, _ = await _parse_update_request(
+                item, interview_config, settings, metrics
+            )
+            items.append(advance_request)
+        except HTTPException as e:
+            items.append(e)
+
+    return items
+
+
+@contextmanager
+def _set_batch_context(context: Context) -> Iterator[None]:
+    tokens = [
+        (var, var.set(context[var])) for var in _BATCH_CONTEXT_VARS if var in context
+    ]
     try:
-        state, result = await advance_interview_state(
-            state,
-            interview.question_bank,
-            update_request.responses,
-            update_request.button,
-            _make_http_func(client),
-        )
-    except BaseValidationError:
-        raise HTTPException(422, "Invalid response values")
+        yield
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
+
+
+def _start_profile(
+    settings: Settings, profiles: ProfileBuffer, requested: bool
+) -> Optional[cProfile.Profile]:
+    if requested:
+        profile = profiles.start()
+        if profile is None:
+            raise HTTPException(409, "Another update is being profiled")
+        return profile
+
+    # slow update profiles can only be read with the admin key, and only a sample of
+    # updates is profiled to limit the overhead
+    if (
+        settings.admin_key
+        and settings.profile_updates
+        and random.random() < settings.profile_sample_rate
+    ):
+        return profiles.start(requested=False)
+    return None
+
+
+def _save_profile(
+    settings: Settings,
+    profiles: ProfileBuffer,
+    profile: cProfile.Profile,
+    requested: bool,
+    response: Union[dict[str, Any], Response],
+    interview_id: str,
+    duration: float,
+) -> Union[dict[str, Any], Response]:
+    # requested profiles are always saved and their ID returned, other profiles are
+    # only saved if the update is slow
+    if not requested and duration < settings.slow_update_seconds:
+        return response
+
+    record = profiles.save(profile, interview_id, duration)
+    if not requested:
+        return response
+
+    response = json(response) if isinstance(response, dict) else response
+    response.add_header(PROFILE_ID_HEADER, record.id.encode())
+    return response
+
+
+def _is_profile_requested(request: Request, settings: Settings) -> bool:
+    if request.get_first_header(PROFILE_HEADER) is None:
+        return False
+    return check_admin_key(
+        settings.admin_key, request.get_first_header(ADMIN_KEY_HEADER)
+    )
 
+
+def _check_admin_key(request: Request, settings: Settings):
+    if not settings.admin_key:
+        raise HTTPException(404, "Not found")
+    if not check_admin_key(
+        settings.admin_key, request.get_first_header(ADMIN_KEY_HEADER)
+    ):
+        raise HTTPException(403, "Forbidden")
+
+
+def _get_profile_record(profiles: ProfileBuffer, profile_id: str) -> ProfileRecord:
+    record = profiles.get(profile_id)
+    if record is None:
+        raise HTTPException(404, "Not found")
+    return record
+
+
+def _get_advance_options(settings: Settings) -> dict[str, Any]:
+    return dict(
+        resume=settings.resume_steps,
+        max_undefined_depth=settings.max_undefined_depth,
+        max_passes=settings.max_passes,
+        max_seconds=settings.max_advance_seconds,
+        cursor=settings.resume_cursor,
+        compiled=settings.compiled_steps,
+    )
+
+
+def _make_observer(
+    settings: Settings, metrics: InterviewMetrics
+) -> Optional[TimingObserver]:
+    if settings.metrics:
+        return MetricsObserver(metrics=metrics)
+    elif settings.server_timing:
+        return TimingObserver()
+    else:
+        return None
+
+
+async def _make_response(
+    request: Request,
+    settings: Settings,
+    state: InterviewState,
+    result: StepResult,
+    metrics: InterviewMetrics,
+) -> dict[str, Any]:
     update_url = get_absolute_url_to_path(request, "/update")
 
-    response = create_state_response(
-        state,
-        key=settings.encryption_key.get_secret_value(),
-        content=result,
-        update_url=update_url.value.decode(),
+    key = settings.encryption_key.get_secret_value()
+    handle = await _save_state(settings, metrics, state, key)
+
+    # the state is only encrypted here if it was not stored
+    timer = (
+        _time_crypto(settings, metrics, "encrypt") if handle is None else nullcontext()
     )
+    with timer:
+        response = create_state_response(
+            state,
+            key=key,
+            content=result,
+            update_url=update_url.value.decode(),
+            handle=handle,
+        )
+    if settings.metrics:
+        metrics.token_bytes.observe(len(response.state))
 
     return converter.unstructure(response)
 
 
+async def _save_state(
+    settings: Settings, metrics: InterviewMetrics, state: InterviewState, key: bytes
+) -> Optional[str]:
+    store = _get_state_store()
+    # completed states are returned in full, for the target service
+    if store is None or state.complete:
+        return None
+
+    with _time_crypto(settings, metrics, "encrypt"):
+        data = encrypt_stored_state(state, key=key)
+    return await put_stored_state(store, data, state.expiration_date, key=key)
+
+
+@contextmanager
+def _time_crypto(
+    settings: Settings, metrics: InterviewMetrics, operation: str
+) -> Iterator[None]:
+    if not settings.metrics:
+        yield
+        return
+
+    start = time.perf_counter()
+    yield
+    metrics.crypto_seconds.observe(time.perf_counter() - start, operation)
+
+
+def _get_state_store() -> Optional[StateStore]:
+    return app.service_provider.get(StateStore, default=None)
+
+
+async def _next_batch_result(
+    item: Union[AdvanceRequest, HTTPException],
+    results: AsyncIterator[Union[tuple[InterviewState, StepResult], Exception]],
+) -> Union[tuple[InterviewState, StepResult], Exception]:
+    if isinstance(item, HTTPException):
+        return item
+
+    res = await results.__anext__()
+    if isinstance(res, InterviewError):
+        return _get_interview_error(item.state.interview_id, res)
+    return res
+
+
+async def _get_batch_result(
+    request: Request,
+    settings: Settings,
+    res: Union[tuple[InterviewState, StepResult], Exception],
+    metrics: InterviewMetrics,
+) -> dict[str, Any]:
+    if isinstance(res, tuple):
+        return await _make_response(request, settings, *res, metrics)
+    elif isinstance(res, HTTPException):
+        return {"error": {"status": res.status, "detail": str(res)}}
+    elif isinstance(res, BaseValidationError):
+        return {"error": {"status": 422, "detail": "Invalid response values"}}
+    else:
+        logger.opt(exception=res).error("Error updating interview state")
+        return {"error": {"status": 500, "detail": "Internal server error"}}
+
+
+def _get_interview_error(interview_id: str, error: InterviewError) -> HTTPException:
+    # a problem with the interview config, e.g. steps that never settle
+    logger.bind(interview_id=interview_id).error(
+        "Error advancing interview {}: {}", interview_id, error
+    )
+    return HTTPException(500, "Interview could not be advanced")
+
+
+def _get_server_timing(observer: TimingObserver) -> str:
+    return ", ".join(
+        f'{kind};dur={duration * 1000:.3f};desc="{observer.counts[kind]}"'
+        for kind, duration in observer.durations.items()
+    )
+
+
+def _log_timing(settings: Settings, state: InterviewState, observer: TimingObserver):
+    duration = observer.durations.get("advance", 0.0)
+    slowest = observer.slowest_step
+    log = logger.bind(
+        interview_id=state.interview_id,
+        counts=observer.counts,
+        durations=observer.durations,
+        slowest_step=dict(zip(("index", "type", "duration"), slowest))
+        if slowest
+        else None,
+    )
+    level = "WARNING" if duration >= settings.slow_update_seconds else "DEBUG"
+    log.log(
+        level,
+        f"Advanced interview {state.interview_id} in {duration * 1000:.1f} ms"
+        + (f", slowest step {slowest[0]} ({slowest[1]})" if slowest else ""),
+    )
+
+
 def _make_http_func(
     client: AsyncClient,
 ) -> Callable[
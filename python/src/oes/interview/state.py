@@ -2,14 +2,31 @@
 from __future__ import annotations
 
 import base64
+import secrets
+import struct
 import uuid
+import zlib
 from collections.abc import Callable
 from datetime import datetime, timedelta, timezone
 from typing import TYPE_CHECKING, Any, Optional
 
-from attrs import evolve, frozen
+import orjson
+from attrs import evolve, field, frozen
+from cattrs import override
+from cattrs.gen import make_dict_unstructure_fn
 from cattrs.preconf.orjson import make_converter
+from nacl.bindings import (
+    crypto_aead_xchacha20poly1305_ietf_decrypt,
+    crypto_aead_xchacha20poly1305_ietf_encrypt,
+    crypto_aead_xchacha20poly1305_ietf_NPUBBYTES,
+)
 from nacl.secret import SecretBox
+from oes.interview.dictionary import (
+    CompressionDictionary,
+    StateDictionaries,
+    state_dictionaries_context,
+)
+from oes.interview.packing import Packer, Unpacker
 
 if TYPE_CHECKING:
     from oes.interview.config.interview import Interview
@@ -17,14 +34,152 @@ if TYPE_CHECKING:
 DEFAULT_INTERVIEW_EXPIRATION = 1800
 """The default amount of time in seconds an interview state is valid."""
 
-state_converter = make_converter()
-"""Converter just for use with :class:`InterviewState`."""
+state_converter = make_converter(detailed_validation=False)
+"""Converter just for use with :class:`InterviewState`.
+
+Its errors are not shown to users, so it skips collecting detailed errors.
+"""
+
+FORMAT_JSON = 0x7B
+"""Format byte of a JSON encoded state, the ``{`` starting the JSON object."""
+
+FORMAT_PACKED = 0x01
+"""Format byte of a packed state."""
+
+FORMAT_PACKED_ZLIB = 0x02
+"""Format byte of a packed state compressed with raw DEFLATE."""
+
+FORMAT_PACKED_DICT = 0x03
+"""Format byte of a packed state compressed with raw DEFLATE and a dictionary."""
+
+TOKEN_VERSION = 0x01
+"""The version of the token format with a plaintext header."""
+
+TOKEN_SEPARATOR = "."
+"""Separates the header and the encrypted state in a token.
+
+Not in the base64 alphabet, so tokens without a header never contain it.
+"""
+
+COMPRESS_MIN_SIZE = 128
+"""Packed states smaller than this many bytes are not compressed."""
+
+COMPRESS_LEVEL = 1
+"""The zlib compression level."""
+
+_FLAG_COMPLETE = 0x01
+_FLAG_UUID = 0x02
+_FLAG_CURSOR = 0x04
+_FLAG_HEX_FINGERPRINT = 0x08
+
+_dictionary_id = struct.Struct(">I")
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_MICROSECOND = timedelta(microseconds=1)
 
 
 class InvalidStateError(ValueError):
     """Raised when an interview state is not valid."""
 
 
+@frozen
+class ResumeCursor:
+    """Where to continue processing steps in the next advance."""
+
+    index: int
+    """The index of the flattened step to continue from."""
+
+    fingerprint: str
+    """A digest of the interview and the values the earlier steps read."""
+
+
+@frozen
+class StateHeader:
+    """The plaintext header of an encrypted state.
+
+    The header is authenticated but not encrypted, so a state can be rejected
+    without decrypting it.
+    """
+
+    interview_id: str
+    """The interview ID."""
+
+    interview_version: str
+    """The interview version."""
+
+    expiration_date: datetime
+    """When the interview expires."""
+
+    version: int = TOKEN_VERSION
+    """The token format version."""
+
+    def pack(self) -> bytes:
+        """Encode this header."""
+        packer = Packer()
+        packer.pack_byte(self.version)
+        packer.pack_int64(_get_timestamp(self.expiration_date))
+        packer.pack_str(self.interview_id)
+        packer.pack_str(self.interview_version)
+        return packer.getvalue()
+
+    @classmethod
+    def unpack(cls, data: bytes) -> StateHeader:
+        """Decode a header encoded with :meth:`pack`.
+
+        Raises:
+            ValueError: If the data is not valid.
+        """
+        unpacker = Unpacker(data)
+        version = unpacker.unpack_byte()
+        if version != TOKEN_VERSION:
+            raise ValueError(f"Unsupported token version: {version}")
+        expiration_date = _EPOCH + unpacker.unpack_int64() * _MICROSECOND
+        interview_id = unpacker.unpack_str()
+        interview_version = unpacker.unpack_str()
+        if unpacker.unpack_rest():
+            raise ValueError("Unexpected data after header")
+        return cls(interview_id, interview_version, expiration_date, version)
+
+    @classmethod
+    def read(cls, encrypted: str) -> Optional[StateHeader]:
+        """Read the header of an encrypted state.
+
+        Warning:
+            The header is not authenticated until the state is decrypted.
+
+        Returns:
+            The :class:`StateHeader`, or ``None`` if the state has no header.
+
+        Raises:
+            InvalidStateError: If the header is not valid.
+        """
+        header_str, sep, _ = encrypted.partition(TOKEN_SEPARATOR)
+        if not sep:
+            return None
+        try:
+            return cls.unpack(base64.urlsafe_b64decode(header_str))
+        except Exception as e:
+            raise InvalidStateError("Interview state is not valid") from e
+
+    def get_is_expired(self, *, now: Optional[datetime] = None) -> bool:
+        """Return whether the state is expired."""
+        now = now if now is not None else datetime.now(tz=timezone.utc)
+        return now >= self.expiration_date
+
+    def validate(
+        self, *, current_version: Optional[str] = None, now: Optional[datetime] = None
+    ):
+        """Check that the state is valid.
+
+        Raises:
+            InvalidStateError: If the state is expired or the wrong version.
+        """
+        if self.get_is_expired(now=now) or (
+            current_version is not None and self.interview_version != current_version
+        ):
+            raise InvalidStateError("Interview state is not valid")
+
+
 @frozen
 class InterviewState:
     """An interview state."""
@@ -59,6 +214,14 @@ class InterviewState:
     data: dict[str, Any] = {}
     """Interview data."""
 
+    cursor: Optional[ResumeCursor] = None
+    """Where to continue processing steps, if known."""
+
+    _template_context: Optional[dict[str, Any]] = field(
+        init=False, eq=False, repr=False, default=None
+    )
+    """The cached template context."""
+
     @property
     def interview(self) -> Interview:
         """The associated :class:`Interview`."""
@@ -73,8 +236,13 @@ class InterviewState:
 
     @property
     def template_context(self) -> dict[str, Any]:
-        """The context dict to use when evaluating templates."""
-        return {**self.data, **self.context}
+        """The context dict to use when evaluating templates.
+
+        The dict is built on first access and reused, and must not be modified.
+        """
+        if self._template_context is None:
+            object.__setattr__(self, "_template_context", {**self.data, **self.context})
+        return self._template_context
 
     @classmethod
     def create(
@@ -104,26 +272,111 @@ class InterviewState:
             data=data or {},
         )
 
+    def pack(
+        self,
+        *,
+        default: Optional[Callable[[Any], Any]] = None,
+        compress: bool = True,
+        dictionaries: Optional[StateDictionaries] = None,
+    ) -> bytes:
+        """Encode this state in the packed binary format.
+
+        The first byte is the format. Fixed fields are stored by position, dates as
+        microseconds and a UUID submission ID as 16 bytes. The data and context are
+        stored as JSON.
+
+        If there is a compression dictionary for the interview, the state is
+        compressed with it and the dictionary ID follows the format byte.
+
+        Args:
+            default: A function to serialize values orjson does not handle.
+            compress: Whether to compress the state, if it is large enough.
+            dictionaries: The :class:`StateDictionaries`, defaults to the context.
+        """
+        packed = _pack_state(self, default)
+        if not compress:
+            return bytes((FORMAT_PACKED,)) + packed
+
+        dictionaries = (
+            dictionaries
+            if dictionaries is not None
+            else state_dictionaries_context.get()
+        )
+        dictionary = (
+            dictionaries.get_for_interview(self.interview_id) if dictionaries else None
+        )
+        return _compress_state(packed, dictionary)
+
+    @classmethod
+    def unpack(
+        cls, data: bytes, *, dictionaries: Optional[StateDictionaries] = None
+    ) -> InterviewState:
+        """Decode a state encoded with :meth:`pack` or as JSON.
+
+        Args:
+            data: The encoded state.
+            dictionaries: The :class:`StateDictionaries`, defaults to the context.
+
+        Raises:
+            ValueError: If the data is not valid, or the dictionary is not found.
+        """
+        data = decompress_state(data, dictionaries=dictionaries)
+        if data[0] == FORMAT_PACKED:
+            return _unpack_state(Unpacker(data, 1))
+        else:
+            return state_converter.loads(data, cls)
+
     def encrypt(
-        self, *, key: bytes, default: Optional[Callable[[Any], Any]] = None
+        self,
+        *,
+        key: bytes,
+        default: Optional[Callable[[Any], Any]] = None,
+        compress: bool = True,
+        dictionaries: Optional[StateDictionaries] = None,
     ) -> str:
-        """Encrypt this state."""
-        json_bytes = state_converter.dumps(self, default=default)
+        """Encrypt this state.
+
+        The token is the base64 encoded :class:`StateHeader`, then
+        :data:`TOKEN_SEPARATOR`, then the base64 encoded nonce and packed state,
+        encrypted with XChaCha20-Poly1305 using the header as associated data.
+        """
+        packed = self.pack(
+            default=default, compress=compress, dictionaries=dictionaries
+        )
 
-        box = SecretBox(key)
-        enc_bytes = box.encrypt(json_bytes)
-        return base64.urlsafe_b64encode(enc_bytes).decode()
+        header = StateHeader(
+            self.interview_id, self.interview_version, self.expiration_date
+        ).pack()
+        nonce = secrets.token_bytes(crypto_aead_xchacha20poly1305_ietf_NPUBBYTES)
+        enc_bytes = crypto_aead_xchacha20poly1305_ietf_encrypt(
+            packed, header, nonce, key
+        )
+        return (
+            base64.urlsafe_b64encode(header).decode()
+            + TOKEN_SEPARATOR
+            + base64.urlsafe_b64encode(nonce + enc_bytes).decode()
+        )
 
     @classmethod
-    def decrypt(cls, encrypted: str, *, key: bytes) -> InterviewState:
+    def decrypt(
+        cls,
+        encrypted: str,
+        *,
+        key: bytes,
+        dictionaries: Optional[StateDictionaries] = None,
+    ) -> InterviewState:
         """Decrypt an encrypted state.
 
+        Accepts states with a :class:`StateHeader`, and states without one
+        encrypted with :class:`SecretBox`, packed or JSON encoded.
+
         Warning:
             Does not check the expiration date or perform other validation.
 
         Args:
             encrypted: The base64 encoded encrypted state.
             key: The key.
+            dictionaries: The :class:`StateDictionaries`, defaults to the context.
 
         Returns:
             The :class:`InterviewState`.
@@ -133,11 +386,7 @@ class InterviewState:
         """
 
         try:
-            enc_bytes = base64.urlsafe_b64decode(encrypted)
-
-            box = SecretBox(key)
-            decrypted = box.decrypt(enc_bytes)
-            parsed = state_converter.loads(decrypted, cls)
+            parsed = cls.unpack(_decrypt(encrypted, key), dictionaries=dictionaries)
         except Exception as e:
             raise InvalidStateError("Interview state is not valid") from e
 
@@ -176,11 +425,278 @@ class InterviewState:
     def update_with_question(self, question_id: str) -> InterviewState:
         """Return a new state with the given question ID as the current question."""
         new_qs = self.answered_question_ids | {question_id}
-        return evolve(
+        updated = evolve(
             self,
             question_id=question_id,
             answered_question_ids=new_qs,
         )
+        # the data is unchanged, re-use the template context
+        object.__setattr__(updated, "_template_context", self._template_context)
+        return updated
+
+
+state_converter.register_unstructure_hook(
+    InterviewState,
+    make_dict_unstructure_fn(
+        InterviewState,
+        state_converter,
+        _template_context=override(omit=True),
+        cursor=override(omit_if_default=True),
+    ),
+)
+
+
+@frozen
+class StateSummary:
+    """The fields of a state needed to verify it, read without building the state."""
+
+    header: StateHeader
+    """The interview ID, version and expiration date."""
+
+    complete: bool
+    """Whether the state is complete."""
+
+    data: dict[str, Any]
+    """The interview data."""
+
+    @classmethod
+    def unpack(cls, data: bytes) -> StateSummary:
+        """Decode the summary of a state returned by :func:`decompress_state`.
+
+        Raises:
+            ValueError: If the data is not valid.
+        """
+        if data[:1] == bytes((FORMAT_PACKED,)):
+            return _unpack_summary(Unpacker(data, 1))
+
+        obj = orjson.loads(data)
+        header = StateHeader(
+            obj["interview_id"],
+            obj["interview_version"],
+            datetime.fromisoformat(obj["expiration_date"]),
+        )
+        return cls(header, bool(obj.get("complete", False)), obj.get("data", {}))
+
+
+def decompress_state(
+    data: bytes, *, dictionaries: Optional[StateDictionaries] = None
+) -> bytes:
+    """Decompress a state encoded with :meth:`InterviewState.pack`.
+
+    Args:
+        data: The encoded state.
+        dictionaries: The :class:`StateDictionaries`, defaults to the context.
+
+    Returns:
+        The state in the uncompressed packed format, or JSON.
+
+    Raises:
+        ValueError: If the data is not valid, or the dictionary is not found.
+    """
+    format_byte = data[0] if data else None
+    if format_byte in (FORMAT_PACKED, FORMAT_JSON):
+        return data
+    elif format_byte == FORMAT_PACKED_ZLIB:
+        return bytes((FORMAT_PACKED,)) + zlib.decompress(data[1:], -15)
+    elif format_byte == FORMAT_PACKED_DICT:
+        return bytes((FORMAT_PACKED,)) + _decompress_dict(data, dictionaries)
+    else:
+        raise ValueError(f"Unsupported state format: {format_byte}")
+
+
+def decrypt_state(
+    encrypted: str,
+    *,
+    key: bytes,
+    dictionaries: Optional[StateDictionaries] = None,
+) -> bytes:
+    """Decrypt and decompress a state without decoding it.
+
+    Warning:
+        Does not check the expiration date or perform other validation.
+
+    Returns:
+        The state in the uncompressed packed format, or JSON.
+
+    Raises:
+        InvalidStateError: If decryption/verification fails.
+    """
+    try:
+        return decompress_state(_decrypt(encrypted, key), dictionaries=dictionaries)
+    except Exception as e:
+        raise InvalidStateError("Interview state is not valid") from e
+
+
+def _decrypt(encrypted: str, key: bytes) -> bytes:
+    if TOKEN_SEPARATOR in encrypted:
+        return _decrypt_token(encrypted, key)
+    else:
+        return SecretBox(key).decrypt(base64.urlsafe_b64decode(encrypted))
+
+
+def _decrypt_token(encrypted: str, key: bytes) -> bytes:
+    header_str, _, enc_str = encrypted.partition(TOKEN_SEPARATOR)
+    header = base64.urlsafe_b64decode(header_str)
+    if not header or header[0] != TOKEN_VERSION:
+        raise ValueError("Unsupported token version")
+    enc_bytes = base64.urlsafe_b64decode(enc_str)
+    nonce_size = crypto_aead_xchacha20poly1305_ietf_NPUBBYTES
+    return crypto_aead_xchacha20poly1305_ietf_decrypt(
+        enc_bytes[nonce_size:], header, enc_bytes[:nonce_size], key
+    )
+
+
+def _compress_state(
+    packed: bytes, dictionary: Optional[CompressionDictionary]
+) -> bytes:
+    if dictionary is not None:
+        compressed = dictionary.compress(packed, COMPRESS_LEVEL)
+        if len(compressed) + _dictionary_id.size < len(packed):
+            return (
+                bytes((FORMAT_PACKED_DICT,))
+                + _dictionary_id.pack(dictionary.id)
+                + compressed
+            )
+    elif len(packed) >= COMPRESS_MIN_SIZE:
+        compressor = zlib.compressobj(COMPRESS_LEVEL, zlib.DEFLATED, -15)
+        compressed = compressor.compress(packed) + compressor.flush()
+        if len(compressed) < len(packed):
+            return bytes((FORMAT_PACKED_ZLIB,)) + compressed
+    return bytes((FORMAT_PACKED,)) + packed
+
+
+def _decompress_dict(data: bytes, dictionaries: Optional[StateDictionaries]) -> bytes:
+    dictionaries = (
+        dictionaries if dictionaries is not None else state_dictionaries_context.get()
+    )
+    (id,) = _dictionary_id.unpack_from(data, 1)
+    dictionary = dictionaries.get(id) if dictionaries else None
+    if dictionary is None:
+        raise ValueError(f"Compression dictionary not found: {id:08x}")
+    start = 1 + _dictionary_id.size
+    return dictionary.decompress(data[start:])
+
+
+def _pack_state(
+    state: InterviewState, default: Optional[Callable[[Any], Any]]
+) -> bytes:
+    uuid_bytes = _get_uuid_bytes(state.submission_id)
+    cursor = state.cursor
+    fingerprint = _get_hex_bytes(cursor.fingerprint) if cursor else None
+
+    packer = Packer()
+    packer.pack_byte(_get_flags(state, uuid_bytes, fingerprint))
+    packer.pack_int64(_get_timestamp(state.expiration_date))
+    if uuid_bytes is not None:
+        packer.pack_raw(uuid_bytes)
+    else:
+        packer.pack_str(state.submission_id)
+    packer.pack_str(state.interview_id)
+    packer.pack_str(state.interview_version)
+    packer.pack_str(state.target_url)
+    packer.pack_optional_str(state.question_id)
+    if cursor is not None:
+        packer.pack_uint(cursor.index)
+        packer.pack_bytes(fingerprint or cursor.fingerprint.encode())
+    packer.pack_str_set(state.answered_question_ids)
+    # values typed Any are not unstructured, orjson serializes them directly
+    packer.pack_bytes(orjson.dumps(state.context, default=default))
+    packer.pack_raw(orjson.dumps(state.data, default=default))
+    return packer.getvalue()
+
+
+def _get_flags(
+    state: InterviewState, uuid_bytes: Optional[bytes], fingerprint: Optional[bytes]
+) -> int:
+    return (
+        (_FLAG_COMPLETE if state.complete else 0)
+        | (_FLAG_UUID if uuid_bytes is not None else 0)
+        | (_FLAG_CURSOR if state.cursor is not None else 0)
+        | (_FLAG_HEX_FINGERPRINT if fingerprint is not None else 0)
+    )
+
+
+def _unpack_state(unpacker: Unpacker) -> InterviewState:
+    flags = unpacker.unpack_byte()
+    expiration_date = _EPOCH + unpacker.unpack_int64() * _MICROSECOND
+    if flags & _FLAG_UUID:
+        submission_id = str(uuid.UUID(bytes=unpacker.unpack_raw(16)))
+    else:
+        submission_id = unpacker.unpack_str()
+    interview_id = unpacker.unpack_str()
+    interview_version = unpacker.unpack_str()
+    target_url = unpacker.unpack_str()
+    question_id = unpacker.unpack_optional_str()
+    cursor = _unpack_cursor(unpacker, flags) if flags & _FLAG_CURSOR else None
+
+    return InterviewState(
+        submission_id=submission_id,
+        interview_id=interview_id,
+        interview_version=interview_version,
+        expiration_date=expiration_date,
+        target_url=target_url,
+        complete=bool(flags & _FLAG_COMPLETE),
+        answered_question_ids=unpacker.unpack_str_set(),
+        context=orjson.loads(unpacker.unpack_bytes()),
+        question_id=question_id,
+        data=orjson.loads(unpacker.unpack_rest()),
+        cursor=cursor,
+    )
+
+
+def _unpack_summary(unpacker: Unpacker) -> StateSummary:
+    # skips the fields in the order written by _pack_state
+    flags = unpacker.unpack_byte()
+    expiration_date = _EPOCH + unpacker.unpack_int64() * _MICROSECOND
+    if flags & _FLAG_UUID:
+        unpacker.unpack_raw(16)
+    else:
+        unpacker.unpack_bytes()
+    interview_id = unpacker.unpack_str()
+    interview_version = unpacker.unpack_str()
+    unpacker.unpack_bytes()  # target URL
+    unpacker.unpack_optional_str()
+    if flags & _FLAG_CURSOR:
+        _unpack_cursor(unpacker, flags)
+    unpacker.unpack_str_set()
+    unpacker.unpack_bytes()  # context
+
+    return StateSummary(
+        StateHeader(interview_id, interview_version, expiration_date),
+        bool(flags & _FLAG_COMPLETE),
+        orjson.loads(unpacker.unpack_rest()),
+    )
+
+
+def _unpack_cursor(unpacker: Unpacker, flags: int) -> ResumeCursor:
+    index = unpacker.unpack_uint()
+    fingerprint = unpacker.unpack_bytes()
+    return ResumeCursor(
+        index,
+        fingerprint.hex() if flags & _FLAG_HEX_FINGERPRINT else fingerprint.decode(),
+    )
+
+
+def _get_timestamp(date: datetime) -> int:
+    # naive dates are taken to be UTC
+    date = date if date.tzinfo is not None else date.replace(tzinfo=timezone.utc)
+    return (date - _EPOCH) // _MICROSECOND
+
+
+def _get_uuid_bytes(value: str) -> Optional[bytes]:
+    try:
+        parsed = uuid.UUID(value)
+    except ValueError:
+        return None
+    return parsed.bytes if str(parsed) == value else None
+
+
+def _get_hex_bytes(value: str) -> Optional[bytes]:
+    try:
+        parsed = bytes.fromhex(value)
+    except ValueError:
+        return None
+    return parsed if parsed.hex() == value else None
 
 
 def get_validated_state(
@@ -192,7 +708,9 @@ def get_validated_state(
 ) -> InterviewState:
     """Get the validated :class:`InterviewState`.
 
-    Decrypts, verifies, and validates the state.
+    Checks the :class:`StateHeader` if the state has one, then decrypts, verifies,
+    and validates the state, so expired and outdated states are rejected without
+    decrypting them.
 
     Args:
         state: The encrypted state string.
@@ -206,6 +724,10 @@ def get_validated_state(
     Raises:
         InvalidStateError: If the state is not valid.
     """
+    header = StateHeader.read(state)
+    if header is not None:
+        header.validate(current_version=current_version, now=now)
+
     verified_state = InterviewState.decrypt(state, key=key)
     verified_state.validate(current_version=current_version, now=now)
 
@@ -0,0 +1,258 @@
+"""Server-side interview state storage.
+
+Instead of the full encrypted state, a response can contain a short signed handle to
+a state kept in a :class:`StateStore`.
+"""
+from __future__ import annotations
+
+import asyncio
+import base64
+import functools
+import hashlib
+import hmac
+import secrets
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+from attrs import Factory, define, field
+from nacl.secret import SecretBox
+from oes.interview.state import InterviewState, InvalidStateError
+
+HANDLE_PREFIX = "h."
+"""The prefix of state handles, which is not in the base64 alphabet of tokens."""
+
+_ID_SIZE = 16
+_MAC_SIZE = 16
+
+
+class StateStore(ABC):
+    """Stores encrypted states by ID until they expire."""
+
+    @abstractmethod
+    async def get(self, id: bytes) -> Optional[bytes]:
+        """Get a stored state, or ``None`` if it is not found or expired."""
+        ...
+
+    @abstractmethod
+    async def put(self, id: bytes, data: bytes, expiration_date: datetime):
+        """Store a state until ``expiration_date``."""
+        ...
+
+
+@define
+class MemoryStateStore(StateStore):
+    """Stores states in memory, discarding the least recently used ones."""
+
+    max_size: int = 10000
+    """The maximum number of states."""
+
+    _entries: OrderedDict[bytes, tuple[bytes, float]] = Factory(OrderedDict)
+    _lock: threading.Lock = Factory(threading.Lock)
+
+    async def get(self, id: bytes) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(id)
+            if entry is None:
+                return None
+            elif entry[1] <= time.time():
+                del self._entries[id]
+                return None
+            self._entries.move_to_end(id)
+            return entry[0]
+
+    async def put(self, id: bytes, data: bytes, expiration_date: datetime):
+        with self._lock:
+            self._entries[id] = (data, expiration_date.timestamp())
+            self._entries.move_to_end(id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+
+@define
+class SQLiteStateStore(StateStore):
+    """Stores states in a SQLite database file.
+
+    Queries run in a worker thread, so they do not block the event loop.
+    """
+
+    path: Path
+    """The database file."""
+
+    purge_interval: int = 1000
+    """Delete expired states after this many states are stored."""
+
+    _connection: sqlite3.Connection = field(init=False)
+    _lock: threading.Lock = Factory(threading.Lock)
+    _puts: int = 0
+
+    def __attrs_post_init__(self):
+        self._connection = sqlite3.connect(
+            str(self.path), isolation_level=None, check_same_thread=False
+        )
+        self._connection.executescript(
+            """
+            PRAGMA journal_mode = WAL;
+            PRAGMA synchronous = NORMAL;
+            CREATE TABLE IF NOT EXISTS states (
+                id BLOB PRIMARY KEY,
+                data BLOB NOT NULL,
+                expires REAL NOT NULL
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS states_expires ON states (expires);
+            """
+        )
+
+    async def get(self, id: bytes) -> Optional[bytes]:
+        return await asyncio.to_thread(self._get, id)
+
+    async def put(self, id: bytes, data: bytes, expiration_date: datetime):
+        await asyncio.to_thread(self._put, id, data, expiration_date)
+
+    def close(self):
+        """Close the database."""
+        with self._lock:
+            self._connection.close()
+
+    def _get(self, id: bytes) -> Optional[bytes]:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT data FROM states WHERE id = ? AND expires > ?",
+                (id, time.time()),
+            ).fetchone()
+        return row[0] if row is not None else None
+
+    def _put(self, id: bytes, data: bytes, expiration_date: datetime):
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO states (id, data, expires) VALUES (?, ?, ?)",
+                (id, data, expiration_date.timestamp()),
+            )
+            self._puts += 1
+            if self._puts >= self.purge_interval:
+                self._puts = 0
+                self._purge()
+
+    def _purge(self):
+        self._connection.execute(
+            "DELETE FROM states WHERE expires <= ?", (time.time(),)
+        )
+
+
+@functools.lru_cache(maxsize=8)
+def _get_handle_key(key: bytes) -> bytes:
+    # a subkey, so the handles are not signed with the encryption key itself
+    return hashlib.blake2b(key=key, person=b"state-handle").digest()
+
+
+def _get_mac(id: bytes, key: bytes) -> bytes:
+    return hashlib.blake2b(id, key=_get_handle_key(key), digest_size=_MAC_SIZE).digest()
+
+
+def is_state_handle(value: str) -> bool:
+    """Return whether ``value`` is a state handle, rather than an encrypted state."""
+    return value.startswith(HANDLE_PREFIX)
+
+
+def make_state_handle(key: bytes) -> tuple[str, bytes]:
+    """Make a new signed state handle.
+
+    Returns:
+        A pair of the handle and the ID to store the state under.
+    """
+    id = secrets.token_bytes(_ID_SIZE)
+    encoded = base64.urlsafe_b64encode(id + _get_mac(id, key)).rstrip(b"=")
+    return HANDLE_PREFIX + encoded.decode(), id
+
+
+def verify_state_handle(handle: str, key: bytes) -> Optional[bytes]:
+    """Get the ID from a state handle, or ``None`` if the signature is not valid."""
+    if not is_state_handle(handle):
+        return None
+    encoded = handle.removeprefix(HANDLE_PREFIX)
+    try:
+        decoded = base64.urlsafe_b64decode(encoded + "=" * (-len(encoded) % 4))
+    except ValueError:
+        return None
+    id, mac = decoded[:_ID_SIZE], decoded[_ID_SIZE:]
+    if len(id) != _ID_SIZE or not hmac.compare_digest(mac, _get_mac(id, key)):
+        return None
+    return id
+
+
+def encrypt_stored_state(state: InterviewState, *, key: bytes) -> bytes:
+    """Encrypt a state to store it."""
+    return SecretBox(key).encrypt(state.pack())
+
+
+def decrypt_stored_state(data: bytes, *, key: bytes) -> InterviewState:
+    """Decrypt a stored state.
+
+    Warning:
+        Does not check the expiration date or perform other validation.
+
+    Raises:
+        InvalidStateError: If the state is not valid.
+    """
+    try:
+        return InterviewState.unpack(SecretBox(key).decrypt(data))
+    except Exception as e:
+        raise InvalidStateError("Interview state is not valid") from e
+
+
+async def put_stored_state(
+    store: StateStore, data: bytes, expiration_date: datetime, *, key: bytes
+) -> str:
+    """Store an encrypted state.
+
+    Returns:
+        The handle to load the state with.
+    """
+    handle, id = make_state_handle(key)
+    await store.put(id, data, expiration_date)
+    return handle
+
+
+async def get_stored_state(
+    store: Optional[StateStore], handle: str, *, key: bytes
+) -> bytes:
+    """Get an encrypted stored state.
+
+    Raises:
+        InvalidStateError: If the handle is not valid, or the state is not found.
+    """
+    id = verify_state_handle(handle, key)
+    data = await store.get(id) if store is not None and id is not None else None
+    if data is None:
+        raise InvalidStateError("Interview state is not valid")
+    return data
+
+
+async def save_state(store: StateStore, state: InterviewState, *, key: bytes) -> str:
+    """Encrypt and store a state.
+
+    Returns:
+        The handle to load the state with.
+    """
+    data = encrypt_stored_state(state, key=key)
+    return await put_stored_state(store, data, state.expiration_date, key=key)
+
+
+async def load_state(
+    store: Optional[StateStore], handle: str, *, key: bytes
+) -> InterviewState:
+    """Load a stored state.
+
+    Warning:
+        Does not check the expiration date or perform other validation.
+
+    Raises:
+        InvalidStateError: If the handle is not valid, or the state is not found.
+    """
+    data = await get_stored_state(store, handle, key=key)
+    return decrypt_stored_state(data, key=key)
@@ -0,0 +1,133 @@
+"""Verify completed interview states.
+
+For services that only read the data of completed interviews. Verifying a state does
+not build the :class:`InterviewState` or import the interview config.
+"""
+from __future__ import annotations
+
+from collections.abc import Iterable, Mapping
+from concurrent.futures import Executor, ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Optional, Union
+
+from attrs import field, frozen
+from oes.interview.dictionary import StateDictionaries, state_dictionaries_context
+from oes.interview.state import (
+    InterviewState,
+    InvalidStateError,
+    StateHeader,
+    StateSummary,
+    decrypt_state,
+)
+
+
+@frozen
+class VerifiedState:
+    """A verified completed interview state."""
+
+    header: StateHeader
+    """The interview ID, version and expiration date."""
+
+    data: Mapping[str, Any]
+    """The interview data."""
+
+    _encoded: bytes = field(repr=False)
+    _state: Optional[InterviewState] = field(
+        init=False, eq=False, repr=False, default=None
+    )
+
+    @property
+    def state(self) -> InterviewState:
+        """The full :class:`InterviewState`, built on first access."""
+        if self._state is None:
+            object.__setattr__(self, "_state", InterviewState.unpack(self._encoded))
+        return self._state
+
+
+def verify_state(
+    encrypted: str,
+    *,
+    key: bytes,
+    current_version: Optional[str] = None,
+    now: Optional[datetime] = None,
+    dictionaries: Optional[StateDictionaries] = None,
+) -> VerifiedState:
+    """Decrypt and verify a completed state.
+
+    Args:
+        encrypted: The encrypted state string.
+        key: The encryption key.
+        current_version: The current interview version, if it should be checked.
+        now: The current time.
+        dictionaries: The :class:`StateDictionaries`, defaults to the context.
+
+    Returns:
+        The :class:`VerifiedState`.
+
+    Raises:
+        InvalidStateError: If the state is not valid, expired, the wrong version, or
+            not complete.
+    """
+    header = StateHeader.read(encrypted)
+    if header is not None:
+        header.validate(current_version=current_version, now=now)
+
+    encoded = decrypt_state(encrypted, key=key, dictionaries=dictionaries)
+    try:
+        summary = StateSummary.unpack(encoded)
+    except Exception as e:
+        raise InvalidStateError("Interview state is not valid") from e
+
+    summary.header.validate(current_version=current_version, now=now)
+    if not summary.complete:
+        raise InvalidStateError("Interview state is not complete")
+
+    return VerifiedState(summary.header, summary.data, encoded)
+
+
+def verify_states(
+    encrypted: Iterable[str],
+    *,
+    key: bytes,
+    current_version: Optional[str] = None,
+    now: Optional[datetime] = None,
+    dictionaries: Optional[StateDictionaries] = None,
+    executor: Optional[Executor] = None,
+) -> list[Union[VerifiedState, InvalidStateError]]:
+    """Decrypt and verify many completed states on a thread pool.
+
+    Args:
+        encrypted: The encrypted state strings.
+        key: The encryption key.
+        current_version: The current interview version, if it should be checked.
+        now: The current time, the same for all the states.
+        dictionaries: The :class:`StateDictionaries`, defaults to the context.
+        executor: The executor to use, defaults to a new thread pool.
+
+    Returns:
+        A :class:`VerifiedState`, or the :class:`InvalidStateError` if it is not
+        valid, for each state, in order.
+    """
+    # context vars are not available in the pool's threads
+    dictionaries = (
+        dictionaries if dictionaries is not None else state_dictionaries_context.get()
+    )
+    now = now if now is not None else datetime.now(tz=timezone.utc)
+
+    def verify(value: str) -> Union[VerifiedState, InvalidStateError]:
+        try:
+            return verify_state(
+                value,
+                key=key,
+                current_version=current_version,
+                now=now,
+                dictionaries=dictionaries,
+            )
+        except InvalidStateError as e:
+            return e
+
+    if executor is not None:
+        return list(executor.map(verify, encrypted))
+
+    with ThreadPoolExecutor() as pool:
+        return list(pool.map(verify, encrypted))
@@ -3,6 +3,7 @@ from pathlib import Path
 import pytest
 from cattrs import BaseValidationError
 from oes.interview.config.interview import Interview
+from oes.interview.parsing.location import Location
 from oes.interview.serialization import converter
 
 
@@ -42,3 +43,54 @@ def test_parse_questions_missing():
 
     with pytest.raises(BaseValidationError):
         converter.structure(obj, Interview)
+
+
+def test_dependency_graph():
+    obj = {
+        "id": "test",
+        "questions": [
+            {
+                "id": "q1",
+                "title": "Hello {{ name }}",
+                "fields": [{"type": "text", "set": "people[index].email"}],
+            }
+        ],
+        "steps": [
+            {"set": "greeting", "value": "'Hi ' ~ name", "when": "enabled"},
+            {"ask": "q1"},
+        ],
+    }
+
+    interview = converter.structure(obj, Interview)
+    graph = interview.dependency_graph
+    set_step, ask_step = graph.steps
+    assert sorted(str(loc) for loc in set_step.reads) == [
+        "enabled",
+        "greeting",
+        "name",
+    ]
+    assert set_step.writes == {Location.parse("greeting")}
+    assert ask_step.writes == frozenset()
+
+    (question,) = graph.questions
+    assert sorted(str(loc) for loc in question.reads) == ["index", "name"]
+    assert list(graph.get_step_providers(Location.parse("greeting"))) == [set_step]
+    assert list(graph.get_question_providers(Location.parse("people"))) == [question]
+    assert "greeting <- step 0" in graph.format()
+
+
+def test_plan_built_lazily():
+    obj = {
+        "id": "test",
+        "questions": [Path("tests/test_data/questions.yml")],
+        "steps": [{"ask": "name"}],
+    }
+
+    interview = converter.structure(obj, Interview)
+    assert interview._plan is None
+    assert interview._dependency_graph is None
+
+    plan = interview.plan
+    assert len(plan.steps) == 1
+    assert interview.plan is plan
+    assert interview.dependency_graph is interview.dependency_graph
@@ -12,7 +12,9 @@ from oes.interview.config.step import (
     HookResult,
     Set,
     StepOrBlock,
+    flatten_block,
     flatten_steps,
+    flatten_steps_with_blocks,
     http_func_ctx,
 )
 from oes.interview.response import ExitResult
@@ -86,6 +88,48 @@ def test_flatten_blocks_when_2():
     assert flattened[0].when_matches()
 
 
+def test_flatten_block():
+    step_list = [
+        {
+            "block": [{"block": [{"ask": "test"}], "when": "b"}, {"eval": "1"}],
+            "when": ["a", True],
+        }
+    ]
+
+    steps = converter.structure(step_list, list[StepOrBlock])
+    inner = flatten_block(steps[0])
+    assert isinstance(inner[0], Block)
+    assert len(inner[0].when) == 2
+    assert flatten_steps(inner) == flatten_steps(steps)
+
+
+def test_flatten_blocks_ranges():
+    step_list = [
+        {"eval": "1"},
+        {
+            "block": [{"eval": "2"}, {"block": [{"eval": "3"}], "when": "b"}],
+            "when": "a",
+        },
+        {"block": [{"eval": "4"}], "when": "true"},
+    ]
+
+    steps = converter.structure(step_list, list[StepOrBlock])
+    flattened, blocks = flatten_steps_with_blocks(steps)
+    assert len(flattened) == 4
+    assert [(b.start, b.end) for b in blocks] == [(1, 3), (2, 3)]
+    assert flattened[2].when == blocks[1].when
+    assert flattened[3].when == ()
+
+
+def test_flatten_blocks_constant_false():
+    step_list = [{"block": [{"eval": "1", "when": "a"}], "when": "false"}]
+
+    steps = converter.structure(step_list, list[StepOrBlock])
+    flattened, blocks = flatten_steps_with_blocks(steps)
+    assert flattened[0].when is False
+    assert blocks[0].when is False
+
+
 @pytest.mark.asyncio
 async def test_hooks_1():
     step_list = [
@@ -0,0 +1,46 @@
+from oes.interview.config.step import Block, StepOrBlock, flatten_steps
+from oes.interview.parsing.condition import ConditionCache
+from oes.interview.parsing.reads import track_reads
+from oes.interview.serialization import converter
+from oes.template import Condition
+
+
+def test_condition_cache():
+    cache = ConditionCache()
+    cond = converter.structure("a == 1", Condition)
+    context = {"a": 1}
+
+    assert cache.evaluate(cond, context) is True
+    assert cache.evaluate(cond, context) is True
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    # a different context clears the cache
+    assert cache.evaluate(cond, {"a": 2}) is False
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_condition_cache_block():
+    block = converter.structure(
+        {"block": [{"eval": "1"}, {"eval": "2"}], "when": "enabled"}, StepOrBlock
+    )
+    assert isinstance(block, Block)
+    steps = flatten_steps([block])
+    cache = ConditionCache()
+    context = {"enabled": False}
+
+    assert not any(cache.when_matches(step, context) for step in steps)
+    assert cache.misses == 1
+    assert cache.hits == 1
+
+
+def test_condition_cache_records_reads():
+    cache = ConditionCache()
+    cond = converter.structure("a == 1", Condition)
+    context = {"a": 1}
+    cache.evaluate(cond, context)
+
+    with track_reads() as names:
+        cache.evaluate(cond, context)
+
+    assert cache.hits == 1
+    assert names == {"a"}
@@ -1,3 +1,5 @@
+import copy
+
 import pytest
 from oes.interview.parsing.location import (
     AttributeAccess,
@@ -185,3 +187,35 @@ def test_loc_set(obj, expr, value, final):
     expr_obj = Location.parse(expr)
     expr_obj.set(value, obj)
     assert obj == final
+
+
+@pytest.mark.parametrize(
+    "obj, expr, value, final",
+    [
+        [{}, "a", 1, {"a": 1}],
+        [{"a": 1}, "a", 2, {"a": 2}],
+        [{"a": {}}, "a.b", 2, {"a": {"b": 2}}],
+        [{"a": {"b": 1}}, "a.c", 2, {"a": {"b": 1, "c": 2}}],
+        [{"a": [1, 2], "i": 1}, "a[i]", 3, {"a": [1, 3], "i": 1}],
+        [{"a": [{"b": 1}]}, "a[0].b", 2, {"a": [{"b": 2}]}],
+    ],
+)
+def test_loc_assign(obj, expr, value, final):
+    expr_obj = Location.parse(expr)
+    original = copy.deepcopy(obj)
+    result = expr_obj.assign(value, obj)
+    assert result == final
+    assert obj == original
+
+
+def test_loc_assign_shares_unchanged():
+    obj = {
+        "a": {"b": {"c": 1}, "d": [1, 2]},
+        "e": [{"f": 1}],
+    }
+    result = Location.parse("a.b.c").assign(2, obj)
+    assert result["a"]["b"] == {"c": 2}
+    assert result["a"] is not obj["a"]
+    assert result["a"]["d"] is obj["a"]["d"]
+    assert result["e"] is obj["e"]
+    assert obj["a"]["b"] == {"c": 1}
@@ -0,0 +1,73 @@
+import pytest
+from oes.interview.parsing.location import Location
+from oes.interview.parsing.references import (
+    get_changed_paths,
+    get_expression_references,
+    get_location_path,
+    get_template_references,
+    paths_overlap,
+)
+
+
+@pytest.mark.parametrize(
+    "loc, expected",
+    [
+        ["a", ("a",)],
+        ["a.b[0]", ("a", "b", 0)],
+        ["a[x].b", ("a",)],
+    ],
+)
+def test_get_location_path(loc, expected):
+    assert get_location_path(Location.parse(loc)) == expected
+
+
+@pytest.mark.parametrize(
+    "a, b, expected",
+    [
+        [("a",), ("a", "b"), True],
+        [("a", "b"), ("a",), True],
+        [("a", "b"), ("a", "c"), False],
+        [("a",), ("b",), False],
+    ],
+)
+def test_paths_overlap(a, b, expected):
+    assert paths_overlap(a, b) == expected
+
+
+@pytest.mark.parametrize(
+    "source, expected",
+    [
+        ["a", ["a"]],
+        ["a.b == c[0]", ["a.b", "c[0]"]],
+        ["a[x].b", ["a[*].b", "x"]],
+        ["a['b'].c", ["a.b.c"]],
+        ["a.get('z') ~ y", ["a", "y"]],
+        ["a | default(1)", ["a"]],
+        ["[1, 2] | length", []],
+        ["a b", None],
+    ],
+)
+def test_get_expression_references(source, expected):
+    refs = get_expression_references(source)
+    assert (sorted(str(r) for r in refs) if refs is not None else None) == expected
+
+
+@pytest.mark.parametrize(
+    "source, expected",
+    [
+        ["Hello {{ name }}", ["name"]],
+        ["{% for p in people %}{{ p.name }}{{ x }}{% endfor %}", ["people", "x"]],
+        ["{% set y = 1 %}{{ y }}", []],
+        ["{{ a ", None],
+    ],
+)
+def test_get_template_references(source, expected):
+    refs = get_template_references(source)
+    assert (sorted(str(r) for r in refs) if refs is not None else None) == expected
+
+
+def test_get_changed_paths():
+    shared = {"x": 1}
+    old = {"a": {"b": 1, "c": [1, 2]}, "d": shared, "e": 1}
+    new = {"a": {"b": 1, "c": [1, 3]}, "d": shared}
+    assert get_changed_paths(old, new) == {("a", "c", 1), ("e",)}
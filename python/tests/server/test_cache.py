@@ -0,0 +1,136 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+import pytest
+from blacksheep import Content, Response
+from oes.interview.server.cache import CachedResponse, ResponseCache, StateCache
+from oes.interview.state import InterviewState
+
+
+def _make_state(seconds: float = 30) -> InterviewState:
+    return InterviewState.create(
+        interview_id="test",
+        interview_version="1",
+        target_url="http://test.com",
+        expiration_date=datetime.now(tz=timezone.utc) + timedelta(seconds=seconds),
+    )
+
+
+def test_state_cache():
+    cache = StateCache(max_size=2)
+    state = _make_state()
+    assert cache.get("a") is None
+    cache.put("a", state)
+    assert cache.get("a") is state
+
+
+def test_state_cache_size():
+    cache = StateCache(max_size=2)
+    cache.put("a", _make_state())
+    cache.put("b", _make_state())
+    cache.get("a")
+    cache.put("c", _make_state())
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+
+
+def test_state_cache_ttl():
+    cache = StateCache(ttl=10)
+    cache.put("a", _make_state())
+    with patch("time.monotonic", return_value=1e12):
+        assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_state_cache_expired():
+    cache = StateCache()
+    cache.put("a", _make_state(-1))
+    assert cache.get("a") is None
+
+
+def test_state_cache_disabled():
+    cache = StateCache(max_size=0)
+    cache.put("a", _make_state())
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+@pytest.mark.asyncio
+async def test_response_cache():
+    cache = ResponseCache()
+    calls = 0
+
+    async def create():
+        nonlocal calls
+        calls += 1
+        return CachedResponse(b"{}", "test")
+
+    first = await cache.get_or_create(b"a", create)
+    second = await cache.get_or_create(b"a", create)
+    assert first == (CachedResponse(b"{}", "test"), False)
+    assert second == (first[0], True)
+    assert calls == 1
+
+
+@pytest.mark.asyncio
+async def test_response_cache_concurrent():
+    cache = ResponseCache()
+    event = asyncio.Event()
+    calls = 0
+
+    async def create():
+        nonlocal calls
+        calls += 1
+        await event.wait()
+        return CachedResponse(b"{}", "test")
+
+    tasks = [asyncio.create_task(cache.get_or_create(b"a", create)) for _ in range(3)]
+    await asyncio.sleep(0)
+    event.set()
+    results = await asyncio.gather(*tasks)
+    assert calls == 1
+    assert [replayed for _, replayed in results] == [False, True, True]
+
+
+@pytest.mark.asyncio
+async def test_response_cache_error():
+    cache = ResponseCache()
+    event = asyncio.Event()
+
+    async def fail():
+        await event.wait()
+        raise ValueError
+
+    tasks = [asyncio.create_task(cache.get_or_create(b"a", fail)) for _ in range(2)]
+    await asyncio.sleep(0)
+    event.set()
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    assert all(isinstance(r, ValueError) for r in results)
+    assert len(cache) == 0
+
+
+@pytest.mark.asyncio
+async def test_response_cache_ttl():
+    cache = ResponseCache(ttl=10)
+
+    async def create():
+        return CachedResponse(b"{}", "test")
+
+    await cache.get_or_create(b"a", create)
+    with patch("time.monotonic", return_value=1e12):
+        assert (await cache.get_or_create(b"a", create))[1] is False
+
+
+def test_cached_response():
+    response = Response(
+        201, [(b"Server-Timing", b"advance;dur=1")], Content(b"text/plain", b"a")
+    )
+    cached = CachedResponse.from_response(response, "test")
+    replayed = cached.to_response()
+    assert replayed.status == 201
+    assert replayed.headers.get_first(b"Server-Timing") == b"advance;dur=1"
+    assert replayed.content.type == b"text/plain"
+    assert replayed.content.body == b"a"
+    assert cached.interview_id == "test"
@@ -0,0 +1,36 @@
+from oes.interview.server.metrics import MetricsRegistry
+
+
+def test_counter_render():
+    registry = MetricsRegistry()
+    counter = registry.counter("requests_total", "Requests.", ("status",))
+    counter.inc("200")
+    counter.inc("200")
+    counter.inc("409")
+
+    assert counter.get("200") == 2
+    assert registry.render() == (
+        "# HELP requests_total Requests.\n"
+        "# TYPE requests_total counter\n"
+        'requests_total{status="200"} 2\n'
+        'requests_total{status="409"} 1\n'
+    )
+
+
+def test_histogram_render():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("latency_seconds", "Latency.", buckets=(0.1, 1.0))
+    histogram.observe(0.05)
+    histogram.observe(0.5)
+    histogram.observe(2.0)
+
+    assert histogram.get_count() == 3
+    assert registry.render() == (
+        "# HELP latency_seconds Latency.\n"
+        "# TYPE latency_seconds histogram\n"
+        'latency_seconds_bucket{le="0.1"} 1\n'
+        'latency_seconds_bucket{le="1"} 2\n'
+        'latency_seconds_bucket{le="+Inf"} 3\n'
+        "latency_seconds_sum 2.55\n"
+        "latency_seconds_count 3\n"
+    )
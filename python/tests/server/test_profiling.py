@@ -0,0 +1,27 @@
+from oes.interview.server.profiling import ProfileBuffer
+
+
+def test_profile_buffer_one_at_a_time():
+    profiles = ProfileBuffer()
+    profile = profiles.start()
+    assert profile is not None
+    assert profiles.start() is None
+    assert profiles.start(requested=False) is None
+    assert profiles.stop(profile)
+
+    record = profiles.save(profile, "test", 0.1)
+    assert profiles.get(record.id) == record
+    assert profiles.start() is not None
+
+
+def test_profile_buffer_requested_replaces_sampled():
+    profiles = ProfileBuffer()
+    sampled = profiles.start(requested=False)
+    assert sampled is not None
+    assert profiles.start(requested=False) is None
+
+    requested = profiles.start()
+    assert requested is not None
+    assert not profiles.stop(sampled)
+    assert profiles.start() is None
+    assert profiles.stop(requested)
@@ -38,6 +38,28 @@ async def client():
         settings = create_autospec(Settings)
         settings.config_file = Path("tests/test_data/interviews.yml")
         settings.encryption_key = ts.Secret(b"0" * 32)
+        settings.resume_steps = True
+        settings.resume_cursor = True
+        settings.compiled_steps = True
+        settings.max_batch_size = 100
+        settings.batch_concurrency = 100
+        settings.hook_concurrency = 10
+        settings.max_undefined_depth = 50
+        settings.max_passes = None
+        settings.max_advance_seconds = 10.0
+        settings.server_timing = True
+        settings.slow_update_seconds = 1.0
+        settings.metrics = True
+        settings.admin_key = "admin"
+        settings.profile_updates = False
+        settings.profile_sample_rate = 1.0
+        settings.profile_buffer_size = 5
+        settings.state_dictionary_dir = None
+        settings.state_store = None
+        settings.state_cache_size = 100
+        settings.state_cache_ttl = 60.0
+        settings.response_cache_size = 100
+        settings.response_cache_ttl = 30.0
         load_settings.return_value = settings
 
         app.show_error_details = True
@@ -143,3 +165,192 @@ async def test_interview_2(client: TestClient):
     # Resubmit with text, should provide a complete state
     state = await update_state(client, state, {"field_0": "test"})
     assert isinstance(state, CompleteInterviewStateResponse)
+
+
+@pytest.mark.asyncio
+async def test_update_batch(client: TestClient):
+    states = [get_initial_state("test1"), get_initial_state("test2")]
+    data = [{"state": s.state} for s in states] + [{"state": "invalid"}]
+
+    res = await client.post(
+        "/update-batch",
+        content=Content(
+            b"application/json",
+            data=json.dumps(data).encode(),
+        ),
+    )
+    assert res.status == 200
+    lines = (await res.read()).decode().splitlines()
+    assert len(lines) == 3
+
+    first, second = (
+        converter.structure(json.loads(line), InterviewStateResponse)
+        for line in lines[:2]
+    )
+    assert isinstance(first, IncompleteInterviewStateResponse)
+    assert isinstance(second, IncompleteInterviewStateResponse)
+    assert first.content != second.content
+    assert json.loads(lines[2]) == {
+        "error": {"status": 409, "detail": "Invalid or expired state"}
+    }
+
+
+@pytest.mark.asyncio
+async def test_update_batch_too_large(client: TestClient):
+    state = get_initial_state("test1")
+    data = [{"state": state.state}] * 101
+
+    res = await client.post(
+        "/update-batch",
+        content=Content(
+            b"application/json",
+            data=json.dumps(data).encode(),
+        ),
+    )
+    assert res.status == 413
+
+
+@pytest.mark.asyncio
+async def test_update_interview_error(client: TestClient):
+    state = get_initial_state("unsettled")
+    body = json.dumps({"state": state.state}).encode()
+
+    res = await client.post("/update", content=Content(b"application/json", body))
+    assert res.status == 500
+
+    res = await client.post(
+        "/update-batch",
+        content=Content(b"application/json", b"[" + body + b"]"),
+    )
+    assert res.status == 200
+    assert json.loads(await res.read()) == {
+        "error": {"status": 500, "detail": "Interview could not be advanced"}
+    }
+
+
+@pytest.mark.asyncio
+async def test_update_server_timing(client: TestClient):
+    state = get_initial_state("test1")
+    data = {"state": state.state}
+
+    res = await client.post(
+        "/update",
+        content=Content(
+            b"application/json",
+            data=json.dumps(data).encode(),
+        ),
+    )
+    assert res.status == 200
+    timing = res.headers.get_first(b"Server-Timing")
+    assert timing is not None
+    assert b"advance;dur=" in timing
+    assert b"step;dur=" in timing
+
+
+@pytest.mark.asyncio
+async def test_metrics(client: TestClient):
+    state = get_initial_state("test1")
+    data = {"state": state.state}
+
+    res = await client.post(
+        "/update",
+        content=Content(
+            b"application/json",
+            data=json.dumps(data).encode(),
+        ),
+    )
+    assert res.status == 200
+
+    res = await client.get("/metrics")
+    assert res.status == 200
+    assert res.content_type().startswith(b"text/plain")
+    text = await res.text()
+    assert 'oes_interview_update_responses_total{status="200"}' in text
+    assert 'oes_interview_update_seconds_count{interview_id="test1"}' in text
+    assert 'oes_interview_state_crypto_seconds_count{operation="decrypt"}' in text
+
+
+@pytest.mark.asyncio
+async def test_update_profile(client: TestClient):
+    state = get_initial_state("test1")
+    data = json.dumps({"state": state.state}).encode()
+
+    res = await client.post(
+        "/update",
+        content=Content(b"application/json", data),
+        headers={"X-Profile": "1"},
+    )
+    assert res.status == 200
+    assert res.headers.get_first(b"X-Profile-Id") is None
+
+    res = await client.post(
+        "/update",
+        content=Content(b"application/json", data),
+        headers={"X-Profile": "1", "X-Admin-Key": "admin"},
+    )
+    assert res.status == 200
+    profile_id = res.headers.get_first(b"X-Profile-Id").decode()
+
+    res = await client.get("/admin/profiles")
+    assert res.status == 403
+
+    res = await client.get("/admin/profiles", headers={"X-Admin-Key": "admin"})
+    assert res.status == 200
+    assert (await res.json())[0]["id"] == profile_id
+
+    res = await client.get(
+        f"/admin/profiles/{profile_id}", headers={"X-Admin-Key": "admin"}
+    )
+    assert res.status == 200
+    assert "cumulative" in await res.text()
+
+
+@pytest.mark.asyncio
+async def test_update_state_cache(client: TestClient):
+    state = get_initial_state("test1")
+
+    # different bodies, so the second is not answered from the response cache
+    for data in ({"state": state.state}, {"state": state.state, "responses": {}}):
+        res = await client.post(
+            "/update", content=Content(b"application/json", json.dumps(data).encode())
+        )
+        assert res.status == 200
+
+    res = await client.get("/metrics")
+    text = await res.text()
+    assert 'oes_interview_state_cache_total{result="hit"}' in text
+
+
+@pytest.mark.asyncio
+async def test_update_duplicate(client: TestClient):
+    state = get_initial_state("test1")
+    data = json.dumps({"state": state.state, "responses": {}, "button": None})
+
+    async def post() -> tuple[bytes, bytes]:
+        res = await client.post(
+            "/update", content=Content(b"application/json", data.encode())
+        )
+        assert res.status == 200
+        return await res.read(), res.headers.get_first(b"Server-Timing")
+
+    first = await post()
+    assert first[1] is not None
+    assert await post() == first
+
+    res = await client.get("/metrics")
+    assert "oes_interview_update_replays_total 1" in await res.text()
+
+
+@pytest.mark.asyncio
+async def test_update_duplicate_concurrent(client: TestClient):
+    state = get_initial_state("test2")
+    data = json.dumps({"state": state.state}).encode()
+
+    results = await asyncio.gather(
+        *(
+            client.post("/update", content=Content(b"application/json", data))
+            for _ in range(3)
+        )
+    )
+    bodies = [await res.read() for res in results]
+    assert bodies[0] == bodies[1] == bodies[2]
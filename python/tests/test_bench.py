@@ -0,0 +1,36 @@
+import random
+
+import pytest
+from oes.interview.bench.simulate import SimulationStats, simulate_user
+from oes.interview.bench.suite import BenchmarkCase, get_cases
+from oes.interview.bench.synthetic import INTERVIEW_ID, make_synthetic_config
+from oes.interview.config.interview import interviews_context
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("resume", [False, True])
+async def test_simulate_user(resume: bool):
+    config = make_synthetic_config(steps=30, questions=30, asked=5, depth=2, people=2)
+    interview = config.get_interview(INTERVIEW_ID)
+    assert interview is not None
+
+    stats = SimulationStats()
+    token = interviews_context.set(config)
+    try:
+        state = await simulate_user(interview, random.Random(0), stats, resume=resume)
+    finally:
+        interviews_context.reset(token)
+
+    assert state.complete
+    assert len(state.data["people"]) == 2
+    assert stats.requests == len(state.answered_question_ids) + 1
+
+
+@pytest.mark.parametrize(
+    "case",
+    [case for case in get_cases() if case.name.startswith("engine.small")],
+    ids=lambda case: case.name,
+)
+def test_engine_case(case: BenchmarkCase):
+    with case.setup() as func:
+        func()
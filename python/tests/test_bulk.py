@@ -0,0 +1,124 @@
+import io
+
+import orjson
+import pytest
+from oes.interview.bulk import (
+    BulkResult,
+    BulkStatus,
+    RecordFormat,
+    dump_result,
+    read_records,
+    run_records,
+)
+from oes.interview.config.interview import InterviewConfig
+from oes.interview.response import ExitResult
+from oes.interview.serialization import converter
+
+
+@pytest.fixture
+def config() -> InterviewConfig:
+    return converter.structure(
+        {
+            "interviews": [
+                {
+                    "id": "bulk",
+                    "questions": [
+                        {
+                            "id": "name",
+                            "fields": [
+                                {"type": "text", "set": "name"},
+                                {"type": "text", "set": "nickname", "optional": True},
+                            ],
+                        },
+                        {
+                            "id": "color",
+                            "fields": [
+                                {
+                                    "type": "select",
+                                    "set": "color",
+                                    "options": [
+                                        {"value": "red"},
+                                        {"value": "blue"},
+                                    ],
+                                }
+                            ],
+                        },
+                        {
+                            "id": "agree",
+                            "fields": [{"type": "bool", "set": "agree"}],
+                        },
+                    ],
+                    "steps": [
+                        {"eval": ["name", "color", "agree"]},
+                        {"exit": "Must agree", "when": "not agree"},
+                    ],
+                }
+            ]
+        },
+        InterviewConfig,
+    )
+
+
+def test_read_records_csv():
+    file = io.StringIO("name,person.age\nA,1\nB,\n")
+    assert list(read_records(file, RecordFormat.csv)) == [
+        {"name": "A", "person.age": "1"},
+        {"name": "B", "person.age": None},
+    ]
+
+
+def test_read_records_jsonl():
+    file = io.StringIO('{"name": "A"}\n\n{"person": {"age": 1}}\n')
+    assert list(read_records(file, RecordFormat.jsonl)) == [
+        {"name": "A"},
+        {"person": {"age": 1}},
+    ]
+
+
+def test_run_records(config: InterviewConfig):
+    records = [
+        {"name": "A", "color": "blue", "agree": "yes"},
+        {"name": "B", "color": "red", "agree": "no"},
+        {"name": "C", "color": "red"},
+        {"name": "D", "color": "green", "agree": True},
+    ]
+
+    results = list(run_records(config, "bulk", records, chunk_size=3))
+
+    assert results == [
+        BulkResult(
+            BulkStatus.complete,
+            {"name": "A", "nickname": None, "color": "blue", "agree": True},
+        ),
+        BulkResult(
+            BulkStatus.exit,
+            {"name": "B", "nickname": None, "color": "red", "agree": False},
+            exit=ExitResult("Must agree"),
+        ),
+        BulkResult(
+            BulkStatus.needs_input,
+            {"name": "C", "nickname": None, "color": "red"},
+            question_id="agree",
+            missing=["agree"],
+            error="No value for agree",
+        ),
+        BulkResult(
+            BulkStatus.needs_input,
+            {"name": "D", "nickname": None},
+            question_id="color",
+            error="Not a valid option: green",
+        ),
+    ]
+
+
+def test_run_records_not_found(config: InterviewConfig):
+    with pytest.raises(LookupError):
+        list(run_records(config, "missing", [{}]))
+
+
+def test_dump_result():
+    result = BulkResult(BulkStatus.complete, {"name": "A"})
+    assert orjson.loads(dump_result(result)) == {
+        "status": "complete",
+        "data": {"name": "A"},
+    }
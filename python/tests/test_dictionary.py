@@ -0,0 +1,87 @@
+import random
+
+import pytest
+from oes.interview.bench.tokens import make_registration_state
+from oes.interview.dictionary import (
+    CompressionDictionary,
+    StateDictionaries,
+    main,
+    state_dictionaries_context,
+    train_dictionary,
+)
+from oes.interview.state import (
+    FORMAT_PACKED_DICT,
+    InterviewState,
+    InvalidStateError,
+    state_converter,
+)
+
+KEY = b"\0" * 32
+
+
+@pytest.fixture
+def dictionaries() -> StateDictionaries:
+    rng = random.Random(0)
+    samples = [make_registration_state(rng).pack(compress=False) for _ in range(50)]
+    dictionaries = StateDictionaries()
+    dictionaries.add(CompressionDictionary(train_dictionary(samples)), "registration")
+    return dictionaries
+
+
+def test_train_dictionary(dictionaries: StateDictionaries):
+    dictionary = dictionaries.get_for_interview("registration")
+    assert dictionary is not None
+    assert b'"first_name":' in dictionary.data
+    assert len(dictionary.data) <= 8192
+
+
+def test_pack_dictionary(dictionaries: StateDictionaries):
+    state = make_registration_state(random.Random(1))
+    packed = state.pack(dictionaries=dictionaries)
+    assert packed[0] == FORMAT_PACKED_DICT
+    assert len(packed) < len(state.pack(dictionaries=StateDictionaries()))
+    assert InterviewState.unpack(packed, dictionaries=dictionaries) == state
+
+
+def test_encrypt_dictionary_context(dictionaries: StateDictionaries):
+    state = make_registration_state(random.Random(1))
+    token = state_dictionaries_context.set(dictionaries)
+    try:
+        enc = state.encrypt(key=KEY)
+        assert InterviewState.decrypt(enc, key=KEY) == state
+    finally:
+        state_dictionaries_context.reset(token)
+
+    with pytest.raises(InvalidStateError):
+        InterviewState.decrypt(enc, key=KEY)
+
+
+def test_decrypt_without_dictionary(dictionaries: StateDictionaries):
+    state = make_registration_state(random.Random(1))
+    enc = state.encrypt(key=KEY, dictionaries=StateDictionaries())
+    assert InterviewState.decrypt(enc, key=KEY, dictionaries=dictionaries) == state
+
+
+def test_load_dictionaries(tmp_path):
+    (tmp_path / "registration.dict").write_bytes(b"current")
+    (tmp_path / "registration.2026-01-01.dict").write_bytes(b"old")
+
+    dictionaries = StateDictionaries.load(tmp_path)
+    current = dictionaries.get_for_interview("registration")
+    assert current is not None and current.data == b"current"
+    assert len(dictionaries.by_id) == 2
+    assert list(dictionaries.by_interview) == ["registration"]
+
+
+def test_main(tmp_path):
+    rng = random.Random(0)
+    samples = tmp_path / "samples.jsonl"
+    samples.write_bytes(
+        b"\n".join(
+            state_converter.dumps(make_registration_state(rng)) for _ in range(20)
+        )
+    )
+    output = tmp_path / "registration.dict"
+
+    main([str(samples), "-o", str(output)])
+    assert b'"last_name":' in output.read_bytes()
@@ -1,17 +1,27 @@
+import asyncio
+import functools
 from contextvars import Context
 from datetime import datetime, timedelta, timezone
 
 import pytest
 from attr import evolve
 from cattrs import BaseValidationError
+from oes.interview import process
 from oes.interview.config.interview import InterviewConfig, interviews_context
 from oes.interview.config.question_bank import QuestionBank, question_bank_context
 from oes.interview.config.step import StepResultStatus
+from oes.interview.cursor import get_cursor, get_cursor_index
+from oes.interview.observer import TimingObserver
 from oes.interview.parsing.location import Location
 from oes.interview.parsing.template import default_jinja2_env
 from oes.interview.process import (
+    AdvanceRequest,
+    InterviewError,
     InvalidStateError,
     advance_interview_state,
+    advance_interview_states,
+    get_ask_for_variable,
+    get_max_passes,
     get_question_for_variable,
     get_questions_for_variable,
     recursive_get_ask_for_variable,
@@ -23,6 +33,7 @@ from oes.template import jinja2_env_context
 
 
 def empty_context(func):
+    @functools.wraps(func)
     def wrapper(*a, **kw):
         context = Context()
         return context.run(func, *a, **kw)
@@ -262,6 +273,52 @@ def test_recursive_get_ask_for_variable_indexed_2(
     assert res.title == "q7"
 
 
+def test_get_ask_for_variable_circular(state: InterviewState):
+    bank = converter.structure(
+        {
+            "questions": [
+                {
+                    "id": "qa",
+                    "title": "{{ b }}",
+                    "fields": [{"type": "text", "set": "a"}],
+                },
+                {
+                    "id": "qb",
+                    "title": "{{ a }}",
+                    "fields": [{"type": "text", "set": "b"}],
+                },
+            ],
+        },
+        QuestionBank,
+    )
+
+    with pytest.raises(InterviewError, match="Circular"):
+        get_ask_for_variable(state, bank, Location.parse("a"))
+
+
+def test_get_ask_for_variable_max_depth(state: InterviewState):
+    bank = converter.structure(
+        {
+            "questions": [
+                {
+                    "id": f"q{i}",
+                    "title": f"{{{{ v{i + 1} }}}}" if i < 5 else "last",
+                    "fields": [{"type": "text", "set": f"v{i}"}],
+                }
+                for i in range(6)
+            ],
+        },
+        QuestionBank,
+    )
+
+    with pytest.raises(InterviewError, match="nested"):
+        get_ask_for_variable(state, bank, Location.parse("v0"), max_depth=3)
+
+    state, res = get_ask_for_variable(state, bank, Location.parse("v0"), max_depth=10)
+    assert res.title == "last"
+    assert state.question_id == "q5"
+
+
 @pytest.mark.asyncio
 @empty_context
 async def test_interview_1():
@@ -412,3 +469,362 @@ async def test_interview_3():
 
     state, res = await advance_interview_state(state, interview.question_bank, None)
     assert isinstance(res, ExitResult)
+
+
+@pytest.mark.asyncio
+@empty_context
+async def test_interview_resume():
+    jinja2_env_context.set(default_jinja2_env)
+    interviews = converter.structure(
+        {
+            "interviews": [
+                {
+                    "id": "int1",
+                    "questions": [
+                        {"id": "q1", "fields": [{"type": "text", "set": "a"}]},
+                        {"id": "q2", "fields": [{"type": "text", "set": "b"}]},
+                        {"id": "q3", "fields": [{"type": "text", "set": "c"}]},
+                    ],
+                    "steps": [
+                        {"ask": "q1", "when": "foo is defined"},
+                        {"set": "d", "value": "b ~ '!'"},
+                        {"ask": "q2"},
+                        {"set": "foo", "value": "'bar'"},
+                        {"set": "e", "value": "a ~ c", "when": "c is defined"},
+                        {"ask": "q3"},
+                    ],
+                }
+            ]
+        },
+        InterviewConfig,
+    )
+
+    interviews_context.set(interviews)
+    interview = interviews.get_interview("int1")
+    initial = InterviewState.create(
+        interview_id="int1",
+        interview_version="1",
+        submission_id="1",
+        expiration_date=datetime.now(tz=timezone.utc) + timedelta(seconds=30),
+        target_url="",
+    )
+
+    results = {}
+    for resume in (False, True):
+        state = initial
+        asked = []
+        responses = None
+        while not state.complete:
+            state, res = await advance_interview_state(
+                state, interview.question_bank, responses, resume=resume
+            )
+            asked.append(state.question_id)
+            responses = {"field_0": state.question_id}
+        results[resume] = (asked, state.data)
+
+    assert results[True] == results[False]
+    assert results[True][0] == ["q2", "q1", "q3", None]
+    assert results[True][1]["d"] == "q2!"
+    assert results[True][1]["e"] == "q1q3"
+
+
+def _make_set_interview(steps):
+    interviews = converter.structure(
+        {"interviews": [{"id": "int1", "steps": steps}]}, InterviewConfig
+    )
+    interviews_context.set(interviews)
+    interview = interviews.get_interview("int1")
+    state = InterviewState.create(
+        interview_id="int1",
+        interview_version="1",
+        submission_id="1",
+        expiration_date=datetime.now(tz=timezone.utc) + timedelta(seconds=30),
+        target_url="",
+    )
+    return interview, state
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("resume", [False, True])
+@empty_context
+async def test_interview_set_always_settles(resume):
+    jinja2_env_context.set(default_jinja2_env)
+    interview, state = _make_set_interview(
+        [
+            {"set": "a", "value": "1", "always": True},
+            {"set": "b", "value": "a + 1", "always": True},
+        ]
+    )
+
+    state, res = await advance_interview_state(
+        state, interview.question_bank, resume=resume, max_passes=5
+    )
+    assert res == StepResultStatus.completed
+    assert state.data == {"a": 1, "b": 2}
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("resume", [False, True])
+@empty_context
+async def test_interview_max_passes(resume):
+    jinja2_env_context.set(default_jinja2_env)
+    interview, state = _make_set_interview(
+        [
+            {"set": "a", "value": "0"},
+            {"set": "a", "value": "a + 1", "always": True},
+        ]
+    )
+
+    with pytest.raises(InterviewError, match="passes"):
+        await advance_interview_state(
+            state, interview.question_bank, resume=resume, max_passes=5
+        )
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("resume", [False, True])
+@empty_context
+async def test_interview_max_passes_default(resume):
+    jinja2_env_context.set(default_jinja2_env)
+    interview, state = _make_set_interview(
+        [
+            {"set": "a", "value": "0"},
+            {"set": "a", "value": "a + 1", "always": True},
+        ]
+    )
+
+    with pytest.raises(InterviewError, match=f"{get_max_passes(interview)} passes"):
+        await advance_interview_state(state, interview.question_bank, resume=resume)
+
+
+@pytest.mark.asyncio
+@empty_context
+async def test_interview_max_seconds():
+    jinja2_env_context.set(default_jinja2_env)
+    interview, state = _make_set_interview(
+        [
+            {"set": "a", "value": "0"},
+            {"set": "a", "value": "a + 1", "always": True},
+        ]
+    )
+
+    with pytest.raises(InterviewError, match="seconds"):
+        await advance_interview_state(
+            state, interview.question_bank, max_passes=1000000, max_seconds=0.0
+        )
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("resume", [False, True])
+@empty_context
+async def test_interview_cursor(resume):
+    jinja2_env_context.set(default_jinja2_env)
+    interviews = converter.structure(
+        {
+            "interviews": [
+                {
+                    "id": "int1",
+                    "questions": [
+                        {"id": "q1", "fields": [{"type": "text", "set": "a"}]},
+                        {"id": "q2", "fields": [{"type": "text", "set": "b"}]},
+                        {"id": "q3", "fields": [{"type": "text", "set": "c"}]},
+                    ],
+                    "steps": [
+                        {"set": "x", "value": "1"},
+                        {"ask": "q1"},
+                        {"ask": "q2", "when": "a == 'q1'"},
+                        {"set": "d", "value": "a ~ b"},
+                        {"ask": "q3"},
+                    ],
+                }
+            ]
+        },
+        InterviewConfig,
+    )
+    interviews_context.set(interviews)
+    interview = interviews.get_interview("int1")
+
+    results = {}
+    for cursor in (False, True):
+        state = InterviewState.create(
+            interview_id="int1",
+            interview_version="1",
+            submission_id="1",
+            expiration_date=datetime.now(tz=timezone.utc) + timedelta(seconds=30),
+            target_url="",
+        )
+        asked = []
+        responses = None
+        while not state.complete:
+            state, res = await advance_interview_state(
+                state, interview.question_bank, responses, resume=resume, cursor=cursor
+            )
+            asked.append((state.question_id, state.cursor and state.cursor.index))
+            responses = {"field_0": state.question_id}
+        results[cursor] = (asked, state.data)
+
+    assert [q for q, _ in results[True][0]] == ["q1", "q2", "q3", None]
+    assert [c for _, c in results[True][0]] == [1, 2, 4, None]
+    assert results[True][1] == results[False][1]
+
+
+@empty_context
+def test_cursor_index_changed_value():
+    jinja2_env_context.set(default_jinja2_env)
+    interview, state = _make_set_interview(
+        [{"set": "a", "value": "1"}, {"set": "b", "value": "a + 1"}, {"eval": "c"}]
+    )
+    state = evolve(state, data={"a": 1, "b": 2})
+
+    cursor = get_cursor(state, 2)
+    assert cursor is not None and cursor.index == 2
+    assert get_cursor_index(evolve(state, cursor=cursor)) == 2
+    assert get_cursor_index(evolve(state, cursor=cursor, data={"a": 2, "b": 2})) == 0
+
+
+@empty_context
+def test_cursor_index_changed_interview():
+    jinja2_env_context.set(default_jinja2_env)
+    _, state = _make_set_interview(
+        [{"set": "a", "value": "1"}, {"set": "b", "value": "2"}, {"eval": "c"}]
+    )
+    state = evolve(state, data={"a": 1, "b": 2})
+    cursor = get_cursor(state, 2)
+    assert cursor is not None
+
+    # reloaded with the same version and number of steps
+    _make_set_interview(
+        [{"set": "a", "value": "1"}, {"set": "b", "value": "3"}, {"eval": "c"}]
+    )
+    assert get_cursor_index(evolve(state, cursor=cursor)) == 0
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("resume", [False, True])
+@empty_context
+async def test_interview_compiled(resume):
+    jinja2_env_context.set(default_jinja2_env)
+    interviews = converter.structure(
+        {
+            "interviews": [
+                {
+                    "id": "int1",
+                    "questions": [
+                        {"id": "q1", "fields": [{"type": "text", "set": "a"}]},
+                        {"id": "q2", "fields": [{"type": "text", "set": "b"}]},
+                    ],
+                    "steps": [
+                        {"set": "x", "value": "1"},
+                        {
+                            "block": [
+                                {"ask": "q1"},
+                                {"set": "y", "value": "a ~ '!'", "always": True},
+                                {"exit": "Exit", "when": "a == 'stop'"},
+                            ],
+                            "when": "x == 1",
+                        },
+                        {"eval": ["b", 1]},
+                        {"ask": "q2", "when": "false"},
+                    ],
+                }
+            ]
+        },
+        InterviewConfig,
+    )
+    interviews_context.set(interviews)
+    interview = interviews.get_interview("int1")
+
+    results = {}
+    for compiled in (False, True):
+        state = InterviewState.create(
+            interview_id="int1",
+            interview_version="1",
+            submission_id="1",
+            expiration_date=datetime.now(tz=timezone.utc) + timedelta(seconds=30),
+            target_url="",
+        )
+        state, res1 = await advance_interview_state(
+            state, interview.question_bank, resume=resume, compiled=compiled
+        )
+        state, res2 = await advance_interview_state(
+            state,
+            interview.question_bank,
+            {"field_0": "x"},
+            resume=resume,
+            compiled=compiled,
+        )
+        results[compiled] = (res1, res2, state.data)
+
+    assert results[True] == results[False]
+    assert results[True][2] == {"x": 1, "a": "x", "y": "x!"}
+    assert isinstance(results[True][1], AskResult)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("compiled", [False, True])
+@empty_context
+async def test_interview_observer(compiled):
+    jinja2_env_context.set(default_jinja2_env)
+    interviews = converter.structure(
+        {
+            "interviews": [
+                {
+                    "id": "int1",
+                    "questions": [
+                        {"id": "q1", "fields": [{"type": "text", "set": "a"}]},
+                    ],
+                    "steps": [
+                        {"set": "x", "value": 1},
+                        {"eval": "a", "when": "x == 1"},
+                    ],
+                }
+            ]
+        },
+        InterviewConfig,
+    )
+    interviews_context.set(interviews)
+    interview = interviews.get_interview("int1")
+    state = InterviewState.create(
+        interview_id="int1", interview_version="1", target_url=""
+    )
+
+    observer = TimingObserver()
+    state, res = await advance_interview_state(
+        state, interview.question_bank, compiled=compiled, observer=observer
+    )
+
+    assert isinstance(res, AskResult)
+    assert observer.counts == {
+        "advance": 1,
+        "pass": 2,
+        "step": 3,
+        "condition": 1,
+        "undefined": 1,
+        "render": 1,
+    }
+    assert observer.slowest_step is not None
+    assert all(d >= 0 for d in observer.durations.values())
+
+
+@pytest.mark.asyncio
+@empty_context
+async def test_advance_interview_states_close(monkeypatch):
+    _, state = _make_set_interview([{"set": "a", "value": "1"}])
+    cancelled = []
+
+    async def advance(state, *args, **kwargs):
+        if state.submission_id == "2":
+            try:
+                await asyncio.Event().wait()
+            except asyncio.CancelledError:
+                cancelled.append(state)
+                raise
+        return state, StepResultStatus.completed
+
+    monkeypatch.setattr(process, "advance_interview_state", advance)
+    states = [state, evolve(state, submission_id="2")]
+    results = advance_interview_states([AdvanceRequest(s) for s in states])
+
+    assert await results.__anext__() == (state, StepResultStatus.completed)
+    await results.aclose()
+    assert cancelled == [states[1]]
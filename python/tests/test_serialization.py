@@ -1,7 +1,8 @@
 from collections.abc import Sequence
 
 import pytest
-from oes.interview.serialization import converter
+from oes.interview.config.interview import Interview
+from oes.interview.serialization import converter, warm_up_converters
 
 
 @pytest.mark.parametrize(
@@ -35,3 +36,25 @@ def test_structure_immutable_sequence():
     val = [1, 2, 3]
     res = converter.structure(val, Sequence[int])
     assert res == (1, 2, 3)
+
+
+def test_warm_up_converters():
+    interview = converter.structure(
+        {
+            "id": "warm_up",
+            "questions": [
+                {"id": "q1", "fields": [{"type": "text", "set": "name"}]},
+            ],
+            "steps": [{"ask": "q1"}],
+        },
+        Interview,
+    )
+    question = interview.question_bank.get_question("q1")
+    warm_up_converters([interview])
+
+    # the hook was generated and cached by the warm-up
+    dispatch = converter._structure_func.dispatch
+    hits = dispatch.cache_info().hits
+    dispatch(question.response_class)
+    assert dispatch.cache_info().hits == hits + 1
+    assert converter.structure({"field_0": "test"}, question.response_class)
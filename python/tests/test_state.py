@@ -1,7 +1,21 @@
+import base64
 from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
 
 import pytest
-from oes.interview.state import InterviewState
+from attrs import evolve
+from nacl.secret import SecretBox
+from oes.interview.state import (
+    FORMAT_PACKED,
+    FORMAT_PACKED_ZLIB,
+    TOKEN_SEPARATOR,
+    InterviewState,
+    InvalidStateError,
+    ResumeCursor,
+    StateHeader,
+    get_validated_state,
+    state_converter,
+)
 
 
 def test_state_encrypt_decrypt():
@@ -66,3 +80,138 @@ def test_state_dumps_default():
     enc = state.encrypt(key=b"\0" * 32, default=default)
     dec = InterviewState.decrypt(enc, key=b"\0" * 32)
     assert dec.data == {"obj": "test"}
+
+
+def test_state_template_context():
+    state = InterviewState.create(
+        interview_id="test",
+        interview_version="1",
+        target_url="http://test.com",
+        context={"a": 1, "b": 2},
+        data={"b": 3, "c": 4},
+    )
+
+    context = state.template_context
+    assert context == {"a": 1, "b": 2, "c": 4}
+    assert state.template_context is context
+    assert state.update_with_question("q1").template_context is context
+    assert evolve(state, data={}).template_context == {"a": 1, "b": 2}
+
+
+def test_state_template_context_not_serialized():
+    state = InterviewState.create(
+        interview_id="test",
+        interview_version="1",
+        target_url="http://test.com",
+        data={"a": 1},
+    )
+    state.template_context
+
+    assert "_template_context" not in state_converter.unstructure(state)
+    enc = state.encrypt(key=b"\0" * 32)
+    assert InterviewState.decrypt(enc, key=b"\0" * 32) == state
+
+
+def _make_full_state(**kwargs) -> InterviewState:
+    return InterviewState.create(
+        interview_id="test",
+        interview_version="1",
+        target_url="http://test.com",
+        context={"email": "test@example.com"},
+        data={"people": [{"name": "A", "age": 1}, {"name": "B", "age": 2}]},
+        **kwargs,
+    ).update_with_question("question_1")
+
+
+@pytest.mark.parametrize("compress", [True, False])
+def test_state_pack_unpack(compress):
+    state = evolve(
+        _make_full_state(),
+        answered_question_ids=frozenset(f"question_{i}" for i in range(20)),
+        cursor=ResumeCursor(12, "0123456789abcdef0123456789abcdef"),
+        complete=True,
+    )
+    packed = state.pack(compress=compress)
+    assert packed[0] == (FORMAT_PACKED_ZLIB if compress else FORMAT_PACKED)
+    assert InterviewState.unpack(packed) == state
+
+
+def test_state_pack_non_uuid_submission_id():
+    state = evolve(
+        _make_full_state(submission_id="submission-1"),
+        cursor=ResumeCursor(1, "not hex"),
+    )
+    assert InterviewState.unpack(state.pack()) == state
+
+
+def test_state_pack_smaller_than_json():
+    state = _make_full_state()
+    assert len(state.pack()) < len(state_converter.dumps(state))
+
+
+def _encrypt_legacy(state: InterviewState, key: bytes) -> str:
+    enc = SecretBox(key).encrypt(state_converter.dumps(state))
+    return base64.urlsafe_b64encode(enc).decode()
+
+
+def test_state_decrypt_json():
+    state = _make_full_state()
+    key = b"\0" * 32
+    legacy = _encrypt_legacy(state, key)
+    assert InterviewState.decrypt(legacy, key=key) == state
+
+
+def test_state_decrypt_packed_legacy():
+    state = _make_full_state()
+    key = b"\0" * 32
+    legacy = base64.urlsafe_b64encode(SecretBox(key).encrypt(state.pack())).decode()
+    assert InterviewState.decrypt(legacy, key=key) == state
+
+
+def test_state_unpack_invalid():
+    with pytest.raises(ValueError):
+        InterviewState.unpack(b"\xff")
+    with pytest.raises(ValueError):
+        InterviewState.unpack(_make_full_state().pack(compress=False)[:20])
+
+
+def test_state_header():
+    state = _make_full_state()
+    enc = state.encrypt(key=b"\0" * 32)
+    header = StateHeader.read(enc)
+    assert header == StateHeader(
+        state.interview_id, state.interview_version, state.expiration_date
+    )
+    assert StateHeader.read(_encrypt_legacy(state, b"\0" * 32)) is None
+
+
+def test_state_header_tampered():
+    state = _make_full_state()
+    key = b"\0" * 32
+    enc = state.encrypt(key=key)
+    _, _, enc_str = enc.partition(TOKEN_SEPARATOR)
+    header = StateHeader(
+        state.interview_id, "2", state.expiration_date + timedelta(days=1)
+    )
+    tampered = base64.urlsafe_b64encode(header.pack()).decode() + "." + enc_str
+    with pytest.raises(InvalidStateError):
+        InterviewState.decrypt(tampered, key=key)
+
+
+def test_get_validated_state_checks_header():
+    state = _make_full_state()
+    enc = state.encrypt(key=b"\0" * 32)
+    with patch.object(InterviewState, "decrypt") as decrypt:
+        with pytest.raises(InvalidStateError):
+            get_validated_state(enc, key=b"\0" * 32, current_version="2")
+        with pytest.raises(InvalidStateError):
+            get_validated_state(
+                enc, key=b"\0" * 32, now=state.expiration_date + timedelta(seconds=1)
+            )
+    decrypt.assert_not_called()
+    assert get_validated_state(enc, key=b"\0" * 32, current_version="1") == state
+
+
+def test_state_header_invalid():
+    with pytest.raises(InvalidStateError):
+        StateHeader.read("AAAA.AAAA")
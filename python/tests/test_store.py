@@ -0,0 +1,122 @@
+import base64
+import hashlib
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from attrs import evolve
+from oes.interview.response import create_state_response
+from oes.interview.state import InterviewState, InvalidStateError
+from oes.interview.store import (
+    HANDLE_PREFIX,
+    MemoryStateStore,
+    SQLiteStateStore,
+    is_state_handle,
+    load_state,
+    make_state_handle,
+    save_state,
+    verify_state_handle,
+)
+
+KEY = b"\0" * 32
+
+
+def _make_state(seconds: float = 30) -> InterviewState:
+    return InterviewState.create(
+        interview_id="test",
+        interview_version="1",
+        target_url="http://test.com",
+        expiration_date=datetime.now(tz=timezone.utc) + timedelta(seconds=seconds),
+        data={"a": 1},
+    )
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        yield MemoryStateStore()
+    else:
+        store = SQLiteStateStore(tmp_path / "states.db")
+        yield store
+        store.close()
+
+
+def test_state_handle():
+    handle, id = make_state_handle(KEY)
+    assert is_state_handle(handle)
+    assert len(handle) < 50
+    assert verify_state_handle(handle, KEY) == id
+    assert verify_state_handle(handle, b"\1" * 32) is None
+    assert verify_state_handle(handle[:-2] + "AA", KEY) is None
+
+
+def test_state_handle_not_signed_with_key():
+    handle, id = make_state_handle(KEY)
+    mac = hashlib.blake2b(id, key=KEY, digest_size=16, person=b"state-handle")
+    encoded = base64.urlsafe_b64encode(id + mac.digest()).rstrip(b"=")
+    assert verify_state_handle(HANDLE_PREFIX + encoded.decode(), KEY) is None
+
+
+@pytest.mark.asyncio
+async def test_save_load_state(store):
+    state = _make_state()
+    handle = await save_state(store, state, key=KEY)
+    assert await load_state(store, handle, key=KEY) == state
+
+
+@pytest.mark.asyncio
+async def test_load_state_expired(store):
+    state = _make_state(-1)
+    handle = await save_state(store, state, key=KEY)
+    with pytest.raises(InvalidStateError):
+        await load_state(store, handle, key=KEY)
+
+
+@pytest.mark.asyncio
+async def test_load_state_not_found(store):
+    handle, _ = make_state_handle(KEY)
+    with pytest.raises(InvalidStateError):
+        await load_state(store, handle, key=KEY)
+    with pytest.raises(InvalidStateError):
+        await load_state(None, handle, key=KEY)
+
+
+@pytest.mark.asyncio
+async def test_memory_store_lru():
+    store = MemoryStateStore(max_size=2)
+    expiration = datetime.now(tz=timezone.utc) + timedelta(seconds=30)
+    await store.put(b"1", b"a", expiration)
+    await store.put(b"2", b"b", expiration)
+    assert await store.get(b"1") == b"a"
+    await store.put(b"3", b"c", expiration)
+    assert await store.get(b"2") is None
+    assert await store.get(b"1") == b"a"
+    assert await store.get(b"3") == b"c"
+
+
+@pytest.mark.asyncio
+async def test_sqlite_store_purge(tmp_path):
+    store = SQLiteStateStore(tmp_path / "states.db", purge_interval=2)
+    now = datetime.now(tz=timezone.utc)
+    await store.put(b"1", b"a", now - timedelta(seconds=1))
+    await store.put(b"2", b"b", now + timedelta(seconds=30))
+    store.close()
+
+    store = SQLiteStateStore(tmp_path / "states.db")
+    assert await store.get(b"2") == b"b"
+    assert store._connection.execute("SELECT COUNT(*) FROM states").fetchone() == (1,)
+    store.close()
+
+
+@pytest.mark.asyncio
+async def test_create_state_response_handle(store):
+    state = _make_state()
+    handle = await save_state(store, state, key=KEY)
+    response = create_state_response(
+        state, key=KEY, update_url="/update", handle=handle
+    )
+    assert response.state == handle
+    assert await load_state(store, response.state, key=KEY) == state
+
+    complete = evolve(state, complete=True)
+    response = create_state_response(complete, key=KEY, handle=handle)
+    assert InterviewState.decrypt(response.state, key=KEY) == complete
@@ -0,0 +1,98 @@
+import base64
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from attrs import evolve
+from nacl.secret import SecretBox
+from oes.interview.dictionary import CompressionDictionary, StateDictionaries
+from oes.interview.request import InterviewStateRequestBody
+from oes.interview.state import InterviewState, InvalidStateError, state_converter
+from oes.interview.verify import VerifiedState, verify_state, verify_states
+
+KEY = b"\0" * 32
+
+
+def _make_state(**kwargs) -> InterviewState:
+    state = InterviewState.create(
+        interview_id="test",
+        interview_version="1",
+        target_url="http://test.com",
+        context={"email": "test@example.com"},
+        data={"name": "Test", "options": ["a", "b"]},
+    )
+    return evolve(state, **{"complete": True, **kwargs})
+
+
+def test_verify_state():
+    state = _make_state(answered_question_ids=frozenset(("a", "b")))
+    verified = verify_state(state.encrypt(key=KEY), key=KEY, current_version="1")
+    assert verified.data == state.data
+    assert verified.header.interview_id == "test"
+    assert verified.state == state
+
+
+def test_verify_state_json():
+    state = _make_state()
+    enc = SecretBox(KEY).encrypt(state_converter.dumps(state))
+    verified = verify_state(base64.urlsafe_b64encode(enc).decode(), key=KEY)
+    assert verified.data == state.data
+    assert verified.state == state
+
+
+def test_verify_state_dictionary():
+    state = _make_state(data={"value": "x" * 200})
+    dictionaries = StateDictionaries()
+    dictionaries.add(CompressionDictionary(b'"value":"xxxxxxxx'), "test")
+    enc = state.encrypt(key=KEY, dictionaries=dictionaries)
+    verified = verify_state(enc, key=KEY, dictionaries=dictionaries)
+    assert verified.state == state
+
+
+@pytest.mark.parametrize(
+    "state, kwargs",
+    [
+        (_make_state(complete=False), {}),
+        (_make_state(), {"current_version": "2"}),
+        (
+            _make_state(),
+            {"now": datetime.now(tz=timezone.utc) + timedelta(days=1)},
+        ),
+    ],
+)
+def test_verify_state_invalid(state: InterviewState, kwargs):
+    with pytest.raises(InvalidStateError):
+        verify_state(state.encrypt(key=KEY), key=KEY, **kwargs)
+
+
+def test_verify_states():
+    states = [_make_state(data={"i": i}) for i in range(5)]
+    tokens = [s.encrypt(key=KEY) for s in states]
+    tokens.insert(2, "invalid")
+
+    with ThreadPoolExecutor(2) as executor:
+        for results in (
+            verify_states(tokens, key=KEY),
+            verify_states(tokens, key=KEY, executor=executor),
+        ):
+            assert isinstance(results[2], InvalidStateError)
+            del results[2]
+            assert [r.data for r in results if isinstance(r, VerifiedState)] == [
+                {"i": i} for i in range(5)
+            ]
+
+
+def test_request_body_verify():
+    state = _make_state()
+    body = InterviewStateRequestBody(state.encrypt(key=KEY))
+    assert body.verify(key=KEY).data == state.data
+
+
+def test_verify_does_not_import_config():
+    code = (
+        "import sys, oes.interview.verify; "
+        "assert 'oes.interview.config' not in sys.modules"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True)